@@ -0,0 +1,33 @@
+"""Add event outbox
+
+Revision ID: 3d8e5b0c7a49
+Revises: 0a4c7e1f3b62
+Create Date: 2026-10-19 16:08:41.203518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d8e5b0c7a49'
+down_revision = '0a4c7e1f3b62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('event_outbox',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('event', sa.String(), nullable=False),
+    sa.Column('room', sa.String(), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_event_outbox_created_at'), 'event_outbox', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_event_outbox_created_at'), table_name='event_outbox')
+    op.drop_table('event_outbox')
@@ -0,0 +1,35 @@
+"""Assign outbox ids after the transaction id
+
+Revision ID: 5e2a9c4d7f18
+Revises: d4e7b1c9a256
+Create Date: 2026-10-20 09:12:40.118205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2a9c4d7f18'
+down_revision = 'd4e7b1c9a256'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # The relay tells a rolled back id from one still being committed by snapshot xmin;
+    # that needs every id to be allocated by a transaction that already has an xid
+    op.execute("""
+        CREATE FUNCTION event_outbox_next_id() RETURNS bigint LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_current_xact_id();
+            RETURN nextval('event_outbox_id_seq');
+        END
+        $$
+    """)
+    op.execute("ALTER TABLE event_outbox ALTER COLUMN id SET DEFAULT event_outbox_next_id()")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE event_outbox ALTER COLUMN id SET DEFAULT nextval('event_outbox_id_seq')")
+    op.execute("DROP FUNCTION event_outbox_next_id()")
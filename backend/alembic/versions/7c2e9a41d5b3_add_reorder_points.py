@@ -0,0 +1,42 @@
+"""Add reorder points
+
+Revision ID: 7c2e9a41d5b3
+Revises: 531007574ecc
+Create Date: 2026-10-19 09:12:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9a41d5b3'
+down_revision = '531007574ecc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('reorder_points',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('product_id', sa.String(), nullable=False),
+    sa.Column('warehouse_id', sa.String(), nullable=False),
+    sa.Column('location_id', sa.String(), nullable=False),
+    sa.Column('method', sa.String(), nullable=False),
+    sa.Column('history_days', sa.Integer(), nullable=False),
+    sa.Column('forecast_daily_demand', sa.Float(), nullable=False),
+    sa.Column('demand_std', sa.Float(), nullable=False),
+    sa.Column('lead_time_days', sa.Float(), nullable=False),
+    sa.Column('safety_stock', sa.Float(), nullable=False),
+    sa.Column('reorder_point', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['location_id'], ['locations.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['warehouse_id'], ['warehouses.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id', 'location_id', name='uq_reorder_points_product_location')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reorder_points')
@@ -0,0 +1,24 @@
+"""Add event outbox room index
+
+Revision ID: 8b1f4e2d6c53
+Revises: 3d8e5b0c7a49
+Create Date: 2026-10-19 17:21:12.480937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b1f4e2d6c53'
+down_revision = '3d8e5b0c7a49'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_event_outbox_room_id', 'event_outbox', ['room', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_event_outbox_room_id', table_name='event_outbox')
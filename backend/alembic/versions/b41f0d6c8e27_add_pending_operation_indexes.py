@@ -0,0 +1,52 @@
+"""Add partial indexes for pending operations
+
+Revision ID: b41f0d6c8e27
+Revises: 7c2e9a41d5b3
+Create Date: 2026-10-19 10:03:55.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41f0d6c8e27'
+down_revision = '7c2e9a41d5b3'
+branch_labels = None
+depends_on = None
+
+# (table, pending statuses, index name -> columns)
+PENDING_INDEXES = [
+    ('receipts', "status IN ('DRAFT', 'READY')", {
+        'ix_receipts_pending_schedule': ['schedule_date', 'id'],
+        'ix_receipts_pending_warehouse_schedule': ['warehouse_id', 'schedule_date', 'id'],
+    }),
+    ('deliveries', "status IN ('DRAFT', 'WAITING', 'READY')", {
+        'ix_deliveries_pending_schedule': ['schedule_date', 'id'],
+        'ix_deliveries_pending_warehouse_schedule': ['warehouse_id', 'schedule_date', 'id'],
+    }),
+    ('transfers', "status IN ('DRAFT', 'READY')", {
+        'ix_transfers_pending_schedule': ['schedule_date', 'id'],
+        'ix_transfers_pending_from_wh_schedule': ['from_warehouse_id', 'schedule_date', 'id'],
+        'ix_transfers_pending_to_wh_schedule': ['to_warehouse_id', 'schedule_date', 'id'],
+    }),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, where, indexes in PENDING_INDEXES:
+        # transfers is not part of the initial migration on every deployment
+        if not inspector.has_table(table):
+            continue
+        for name, columns in indexes.items():
+            op.create_index(name, table, columns, unique=False, postgresql_where=sa.text(where))
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, where, indexes in PENDING_INDEXES:
+        if not inspector.has_table(table):
+            continue
+        for name in indexes:
+            op.drop_index(name, table_name=table)
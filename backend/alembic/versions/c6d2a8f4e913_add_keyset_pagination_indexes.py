@@ -0,0 +1,39 @@
+"""Add keyset pagination indexes
+
+Revision ID: c6d2a8f4e913
+Revises: 8b1f4e2d6c53
+Create Date: 2026-10-19 19:42:08.615204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6d2a8f4e913'
+down_revision = '8b1f4e2d6c53'
+branch_labels = None
+depends_on = None
+
+# index name -> (table, columns): the sort keys of the paginated list endpoints
+KEYSET_INDEXES = {
+    'ix_products_name_id': ('products', ['name', 'id']),
+    'ix_receipts_created_id': ('receipts', ['created_at', 'id']),
+    'ix_deliveries_created_id': ('deliveries', ['created_at', 'id']),
+    'ix_transfers_created_id': ('transfers', ['created_at', 'id']),
+}
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, (table, columns) in KEYSET_INDEXES.items():
+        # transfers is not part of the initial migration on every deployment
+        if inspector.has_table(table):
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for name, (table, _) in KEYSET_INDEXES.items():
+        if inspector.has_table(table):
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,37 @@
+"""Add product imports
+
+Revision ID: d4e7b1c9a256
+Revises: c6d2a8f4e913
+Create Date: 2026-10-19 20:31:47.209384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e7b1c9a256'
+down_revision = 'c6d2a8f4e913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('product_imports',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('format', sa.String(), nullable=False),
+    sa.Column('total_rows', sa.Integer(), nullable=False),
+    sa.Column('inserted', sa.Integer(), nullable=False),
+    sa.Column('updated', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('elapsed_seconds', sa.Float(), nullable=False),
+    sa.Column('error_report', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_product_imports_created_at'), 'product_imports', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_imports_created_at'), table_name='product_imports')
+    op.drop_table('product_imports')
@@ -0,0 +1,29 @@
+"""Add data versions
+
+Revision ID: d93a6f2b7c10
+Revises: b41f0d6c8e27
+Create Date: 2026-10-19 11:27:08.553921
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93a6f2b7c10'
+down_revision = 'b41f0d6c8e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('data_versions',
+    sa.Column('scope', sa.String(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('scope')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('data_versions')
@@ -0,0 +1,49 @@
+"""Add reference counters
+
+Revision ID: e5b8c3a9f214
+Revises: d93a6f2b7c10
+Create Date: 2026-10-19 12:48:19.730145
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b8c3a9f214'
+down_revision = 'd93a6f2b7c10'
+branch_labels = None
+depends_on = None
+
+# Existing document tables and their reference type code
+DOCUMENT_TABLES = [
+    ('receipts', 'IN'),
+    ('deliveries', 'OUT'),
+    ('transfers', 'TR'),
+]
+
+
+def upgrade() -> None:
+    op.create_table('reference_counters',
+    sa.Column('warehouse_code', sa.String(), nullable=False),
+    sa.Column('doc_type', sa.String(), nullable=False),
+    sa.Column('last_value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('warehouse_code', 'doc_type')
+    )
+    
+    # Seed counters from the highest existing number per warehouse code and type
+    inspector = sa.inspect(op.get_bind())
+    for table, doc_type in DOCUMENT_TABLES:
+        if not inspector.has_table(table):
+            continue
+        op.execute(f"""
+            INSERT INTO reference_counters (warehouse_code, doc_type, last_value)
+            SELECT split_part(reference, '/', 1), '{doc_type}', max(split_part(reference, '/', 3)::bigint)
+            FROM {table}
+            WHERE reference ~ '^[^/]+/{doc_type}/[0-9]+$'
+            GROUP BY split_part(reference, '/', 1)
+        """)
+
+
+def downgrade() -> None:
+    op.drop_table('reference_counters')
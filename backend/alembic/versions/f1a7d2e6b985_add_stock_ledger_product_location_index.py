@@ -0,0 +1,30 @@
+"""Add stock ledger product/location index
+
+Revision ID: f1a7d2e6b985
+Revises: e5b8c3a9f214
+Create Date: 2026-10-19 13:35:44.281563
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a7d2e6b985'
+down_revision = 'e5b8c3a9f214'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_stock_ledger_product_location',
+        'stock_ledger',
+        ['product_id', 'location_id'],
+        unique=False,
+        postgresql_include=['quantity']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_stock_ledger_product_location', table_name='stock_ledger')
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, products, receipts, deliveries, warehouses, locations, dashboard, stock, movements, transfers
+from app.api.v1.endpoints import auth, products, receipts, deliveries, warehouses, locations, dashboard, stock, movements, transfers, batch
 
 api_router = APIRouter()
 
@@ -13,4 +13,4 @@ api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboar
 api_router.include_router(stock.router, prefix="/stock", tags=["stock"])
 api_router.include_router(movements.router, prefix="/movements", tags=["movements"])
 api_router.include_router(transfers.router, prefix="/transfers", tags=["transfers"])
-
+api_router.include_router(batch.router, prefix="/batch", tags=["batch"])
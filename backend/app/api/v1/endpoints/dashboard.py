@@ -1,23 +1,30 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select, literal, cast, String, tuple_, union_all
+from typing import Optional
 from datetime import datetime, date
-from app.core.database import get_db
+from app.core.read_routing import get_read_db
+from app.core.data_version import conditional_get
+from app.core.reference_cache import ReferenceCache, get_reference_data
 # TEMPORARILY COMMENTED OUT FOR TESTING - Authentication disabled
 # from app.core.dependencies import get_current_user
 # from app.models.user import User
 from app.models.product import Product
-from app.models.receipt import Receipt, ReceiptStatus
-from app.models.delivery import Delivery, DeliveryStatus
-from app.models.transfer import Transfer, TransferStatus
-from app.models.stock_ledger import StockLedger
+from app.models.receipt import Receipt, ReceiptStatus, PENDING_RECEIPT_STATUSES
+from app.models.delivery import Delivery, DeliveryStatus, PENDING_DELIVERY_STATUSES
+from app.models.transfer import Transfer, TransferStatus, PENDING_TRANSFER_STATUSES
 from app.schemas.dashboard import DashboardStats
+from app.utils.stock import low_stock_query
+from app.utils.pagination import encode_cursor, decode_cursor, decode_datetime
 
 router = APIRouter()
 
-@router.get("/stats")  # Remove response_model to return dict directly
+@router.get(
+    "/stats",
+    dependencies=[conditional_get("products", "receipts", "deliveries", "reorder_points", stock=True, daily=True)]
+)  # Remove response_model to return dict directly
 def get_dashboard_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
     today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -25,20 +32,13 @@ def get_dashboard_stats(
     # Total products
     total_products = db.query(Product).count()
     
-    # Low stock items (stock < 10) - simplified check
+    # Low stock items - products below their reorder point at any location
     low_stock_items = 0
     try:
-        from sqlalchemy import select
-        # Get all products with their total stock
-        products_with_stock = db.execute(
-            select(
-                StockLedger.product_id,
-                func.sum(StockLedger.quantity).label('total_stock')
-            ).group_by(StockLedger.product_id)
-        ).all()
-        
-        # Count products with stock < 10
-        low_stock_items = sum(1 for _, stock in products_with_stock if (stock or 0) < 10)
+        low_stock = low_stock_query().subquery()
+        low_stock_items = db.scalar(
+            select(func.count(func.distinct(low_stock.c.product_id)))
+        ) or 0
     except Exception as e:
         print(f"DEBUG: Error calculating low stock: {e}")
         low_stock_items = 0
@@ -103,46 +103,125 @@ def get_dashboard_stats(
 
 @router.get("/pending-operations")
 def get_pending_operations(
-    db: Session = Depends(get_db),
+    warehouse_id: Optional[str] = Query(None),
+    late: Optional[bool] = Query(None, description="true: only late, false: only on time"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_read_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    receipts = db.query(Receipt).filter(
-        Receipt.status.in_([ReceiptStatus.DRAFT, ReceiptStatus.READY])
-    ).limit(10).all()
+    """
+    Unified feed of pending receipts, deliveries and transfers ordered by schedule date.
+    Keyset paginated on (schedule_date, id): pass the returned `next_cursor` to get the next page.
+    Each branch is served by the partial pending-status indexes on its table.
+    """
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     
-    deliveries = db.query(Delivery).filter(
-        Delivery.status.in_([DeliveryStatus.DRAFT, DeliveryStatus.WAITING, DeliveryStatus.READY])
-    ).limit(10).all()
+    after = None
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor, 2)
+        after = (decode_datetime(cursor_date), cursor_id)
+    
+    def pending_branch(model, kind, statuses, partner, warehouse_filter):
+        query = select(
+            literal(kind).label('type'),
+            model.id,
+            model.reference,
+            cast(model.status, String).label('status'),
+            model.schedule_date,
+            partner.label('partner')
+        ).where(model.status.in_(statuses))
+        if warehouse_id:
+            query = query.where(warehouse_filter)
+        if late is True:
+            query = query.where(model.schedule_date < today_start)
+        elif late is False:
+            query = query.where(model.schedule_date >= today_start)
+        if after:
+            query = query.where(tuple_(model.schedule_date, model.id) > tuple_(*after))
+        # Limit each branch so it is a short range scan on its partial index
+        return query.order_by(model.schedule_date, model.id).limit(limit + 1)
+    
+    branches = [
+        pending_branch(
+            Receipt, "receipt", PENDING_RECEIPT_STATUSES, Receipt.receive_from,
+            Receipt.warehouse_id == warehouse_id
+        ),
+        pending_branch(
+            Delivery, "delivery", PENDING_DELIVERY_STATUSES, Delivery.delivery_address,
+            Delivery.warehouse_id == warehouse_id
+        ),
+        pending_branch(
+            Transfer, "transfer", PENDING_TRANSFER_STATUSES, Transfer.notes,
+            (Transfer.from_warehouse_id == warehouse_id) | (Transfer.to_warehouse_id == warehouse_id)
+        ),
+    ]
+    feed = union_all(*[branch.subquery().select() for branch in branches]).subquery()
+    rows = db.execute(
+        select(feed).order_by(feed.c.schedule_date, feed.c.id).limit(limit + 1)
+    ).all()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    status_enums = {
+        "receipt": ReceiptStatus,
+        "delivery": DeliveryStatus,
+        "transfer": TransferStatus,
+    }
     
     return {
-        "receipts": [
+        "items": [
             {
-                "id": r.id,
-                "reference": r.reference,
-                "receive_from": r.receive_from,
-                "status": r.status.value,
-                "schedule_date": r.schedule_date.isoformat()
+                "type": row.type,
+                "id": row.id,
+                "reference": row.reference,
+                "partner": row.partner,
+                "status": status_enums[row.type][row.status].value,
+                "schedule_date": row.schedule_date.isoformat(),
+                "is_late": row.schedule_date < today_start
             }
-            for r in receipts
+            for row in rows
         ],
-        "deliveries": [
-            {
-                "id": d.id,
-                "reference": d.reference,
-                "delivery_address": d.delivery_address,
-                "status": d.status.value,
-                "schedule_date": d.schedule_date.isoformat()
-            }
-            for d in deliveries
-        ]
+        "next_cursor": encode_cursor(rows[-1].schedule_date, rows[-1].id) if has_more else None
     }
 
 @router.get("/low-stock")
 def get_low_stock_items(
-    db: Session = Depends(get_db),
+    warehouse_id: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_read_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    # TODO: Implement proper low stock calculation
-    # This is a simplified version - should calculate actual stock per product/location
-    return []
+    """
+    Stock per product and location that is below its reorder point.
+    Reorder points come from the nightly forecast job (app.jobs.reorder_forecast);
+    pairs without one fall back to LOW_STOCK_THRESHOLD.
+    """
+    low_stock = low_stock_query(warehouse_id).subquery()
+    rows = db.execute(
+        select(low_stock)
+        .order_by((low_stock.c.quantity - low_stock.c.threshold).asc())
+        .limit(limit)
+    ).all()
+    
+    # Names come from the reference cache
+    refs.resolve(db, "products", {row.product_id for row in rows})
+    refs.resolve(db, "locations", {row.location_id for row in rows})
+    refs.resolve(db, "warehouses", {row.warehouse_id for row in rows})
+    return [
+        {
+            "product_id": row.product_id,
+            "product_name": refs.lookup("products", row.product_id),
+            "sku": refs.lookup("products", row.product_id, "sku"),
+            "location_id": row.location_id,
+            "location_name": refs.lookup("locations", row.location_id),
+            "warehouse_id": row.warehouse_id,
+            "warehouse_name": refs.lookup("warehouses", row.warehouse_id),
+            "current_stock": row.quantity or 0,
+            "reorder_point": row.reorder_point,
+            "threshold": row.threshold,
+        }
+        for row in rows
+    ]
 
@@ -1,129 +1,201 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from operator import itemgetter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy import insert, select
 from typing import List, Optional
 from datetime import datetime
-from app.core.database import get_db
+from collections import defaultdict
+import uuid
+from app.core.database import get_db, get_async_db
+from app.core.dependencies import get_default_user_id, get_default_user_id_async
 # TEMPORARILY COMMENTED OUT FOR TESTING - Authentication disabled
 # from app.core.dependencies import get_current_user
 # from app.models.user import User
-from app.models.delivery import Delivery, DeliveryStatus
+from app.models.delivery import Delivery, DeliveryStatus, DeliveryItem
 from app.models.stock_ledger import StockLedger, TransactionType
 from app.models.product import Product
-from app.schemas.delivery import DeliveryCreate, DeliveryResponse
-from app.utils.reference_generator import generate_delivery_reference
-from app.websocket.handlers import emit_stock_update, emit_delivery_created, emit_low_stock_alert
+from app.schemas.delivery import DeliveryCreate, DeliveryBulkCreate, DeliveryResponse
+from app.schemas.bulk import BulkCreateResponse, BatchValidateRequest, BatchValidateResponse
+from app.models.warehouse import Warehouse
+from app.utils.reference_generator import reserve_references_async, DELIVERY_DOC_TYPE
+from app.utils.responses import orjson_response
+from app.core.reference_cache import ReferenceCache, get_reference_data
+from app.utils.fieldsets import name_of, requested_fields, includes_items, header_query, fetch_documents, only_fields
+from app.utils.pagination import TOTAL_COUNT_PATTERN, keyset_page, split_page, set_total_count
+from app.utils.bulk import (
+    BulkReferenceData, insufficient_stock_errors, assign_references, bulk_response,
+    batch_should_commit, batch_validate_response
+)
+from app.utils.stock import (
+    get_low_stock_thresholds, get_low_stock_thresholds_async, get_stock_levels, get_stock_levels_async
+)
+from app.websocket.events import record_event, record_low_stock_alert, record_stock_update
 
 router = APIRouter()
 
+# Everything the response needs, loaded up front: many-to-ones are joined into the
+# document query and items (with their products) come from one extra SELECT ... IN
+DELIVERY_LOAD_OPTIONS = (
+    joinedload(Delivery.warehouse),
+    joinedload(Delivery.location),
+    joinedload(Delivery.responsible_user),
+    selectinload(Delivery.items).joinedload(DeliveryItem.product),
+)
+
+# Response fields as SQL expressions for ?fields= / ?include=items (see app/utils/fieldsets.py)
+DELIVERY_FIELDS = {
+    "id": Delivery.id,
+    "reference": Delivery.reference,
+    "delivery_address": Delivery.delivery_address,
+    "warehouse_id": Delivery.warehouse_id,
+    "warehouse_name": name_of("warehouses", Delivery.warehouse_id),
+    "location_id": Delivery.location_id,
+    "location_name": name_of("locations", Delivery.location_id),
+    "schedule_date": Delivery.schedule_date,
+    "operation_type": Delivery.operation_type,
+    "status": Delivery.status,
+    "responsible": Delivery.responsible,
+    "responsible_name": name_of("users", Delivery.responsible, "full_name"),
+    "created_at": Delivery.created_at,
+}
+
+DELIVERY_ITEM_FIELDS = {
+    "id": DeliveryItem.id,
+    "product_id": DeliveryItem.product_id,
+    "product_name": name_of("products", DeliveryItem.product_id),
+    "quantity": DeliveryItem.quantity,
+}
+
+def _delivery_rows(db: Session, refs: ReferenceCache, query, fields: Optional[str], include: Optional[str]) -> List[dict]:
+    """Run a header query built from DELIVERY_FIELDS and attach items if requested"""
+    return fetch_documents(
+        db, refs, query, DELIVERY_FIELDS, DELIVERY_ITEM_FIELDS, DeliveryItem.delivery_id, includes_items(fields, include),
+        order_by=DeliveryItem.created_at
+    )
+
+async def _get_delivery_with_details_async(db: AsyncSession, delivery_id: str, for_update: bool = False):
+    # populate_existing: refresh a delivery already in the session (e.g. after commit)
+    query = (
+        select(Delivery).options(*DELIVERY_LOAD_OPTIONS).where(Delivery.id == delivery_id)
+        .execution_options(populate_existing=True)
+    )
+    if for_update:
+        # Row lock held until commit, as in the batch validate, so concurrent validations run one after the other
+        query = query.with_for_update(of=Delivery)
+    return await db.scalar(query)
+
+def _delivery_to_dict(delivery: Delivery) -> dict:
+    """DeliveryResponse as a plain dict (relationships must be loaded, see DELIVERY_LOAD_OPTIONS)"""
+    return {
+        "id": delivery.id,
+        "reference": delivery.reference,
+        "delivery_address": delivery.delivery_address,
+        "warehouse_id": delivery.warehouse_id,
+        "warehouse_name": delivery.warehouse.name if delivery.warehouse else None,
+        "location_id": delivery.location_id,
+        "location_name": delivery.location.name if delivery.location else None,
+        "schedule_date": delivery.schedule_date,
+        "operation_type": delivery.operation_type,
+        "status": delivery.status,
+        "responsible": delivery.responsible,
+        "responsible_name": delivery.responsible_user.full_name if delivery.responsible_user else None,
+        "items": [
+            {
+                "id": item.id,
+                "product_id": item.product_id,
+                "product_name": item.product.name if item.product else None,
+                "quantity": item.quantity
+            }
+            for item in delivery.items
+        ],
+        "created_at": delivery.created_at
+    }
+
 @router.get("", response_model=List[DeliveryResponse])
 def get_deliveries(
+    response: Response,
     status: Optional[str] = Query(None),
     warehouse_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page (instead of skip)"),
+    total: Optional[str] = Query(None, pattern=TOTAL_COUNT_PATTERN, description="Set X-Total-Count: estimate or exact"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields; defaults to all"),
+    include: Optional[str] = Query(None, description="`items` to include document lines; default only without ?fields="),
     db: Session = Depends(get_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    query = db.query(Delivery)
+    names = requested_fields(fields, DELIVERY_FIELDS)
+    # Newest first, keyset paginated on (created_at, id)
+    query = header_query(DELIVERY_FIELDS, names + [name for name in ("created_at",) if name not in names])
     
     if status:
-        query = query.filter(Delivery.status == status)
+        query = query.where(Delivery.status == status)
     if warehouse_id:
-        query = query.filter(Delivery.warehouse_id == warehouse_id)
+        query = query.where(Delivery.warehouse_id == warehouse_id)
     if search:
-        query = query.filter(
+        query = query.where(
             (Delivery.reference.ilike(f"%{search}%")) |
             (Delivery.delivery_address.ilike(f"%{search}%"))
         )
     
-    deliveries = query.order_by(Delivery.created_at.desc()).offset(skip).limit(limit).all()
+    if total:
+        set_total_count(response, db, query, total)
+    query = keyset_page(query, (Delivery.created_at, Delivery.id), cursor, skip, limit, descending=True)
+    deliveries = split_page(_delivery_rows(db, refs, query, fields, include), limit, itemgetter("created_at", "id"), response)
     
-    # Add related data
-    result = []
-    for delivery in deliveries:
-        delivery_dict = {
-            **delivery.__dict__,
-            "warehouse_name": delivery.warehouse.name if delivery.warehouse else None,
-            "location_name": delivery.location.name if delivery.location else None,
-            "responsible_name": delivery.responsible_user.full_name if delivery.responsible_user else None,
-            "items": [
-                {
-                    **item.__dict__,
-                    "product_name": item.product.name if item.product else None
-                }
-                for item in delivery.items
-            ]
-        }
-        result.append(delivery_dict)
-    
-    return result
+    return orjson_response(only_fields(deliveries, names), response)
 
 @router.get("/{delivery_id}", response_model=DeliveryResponse)
 def get_delivery(
     delivery_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields; defaults to all"),
+    include: Optional[str] = Query(None, description="`items` to include document lines; default only without ?fields="),
     db: Session = Depends(get_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    delivery = db.query(Delivery).filter(Delivery.id == delivery_id).first()
-    if not delivery:
+    query = header_query(DELIVERY_FIELDS, requested_fields(fields, DELIVERY_FIELDS)).where(Delivery.id == delivery_id)
+    deliveries = _delivery_rows(db, refs, query, fields, include)
+    if not deliveries:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Delivery not found"
         )
     
-    delivery_dict = {
-        **delivery.__dict__,
-        "warehouse_name": delivery.warehouse.name if delivery.warehouse else None,
-        "location_name": delivery.location.name if delivery.location else None,
-        "responsible_name": delivery.responsible_user.full_name if delivery.responsible_user else None,
-        "items": [
-            {
-                **item.__dict__,
-                "product_name": item.product.name if item.product else None
-            }
-            for item in delivery.items
-        ]
-    }
-    return delivery_dict
+    return orjson_response(deliveries[0])
 
 @router.post("", response_model=DeliveryResponse, status_code=status.HTTP_201_CREATED)
 async def create_delivery(
     delivery_data: DeliveryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    print(f"DEBUG: Received delivery data: {delivery_data.model_dump()}")
-    print(f"DEBUG: Products: {delivery_data.products}")
-    print(f"DEBUG: Location ID: {delivery_data.location_id}")
+    # Check stock availability for all products in one grouped query
+    stock_levels = await get_stock_levels_async(
+        db, [(item_data.product_id, delivery_data.location_id) for item_data in delivery_data.products]
+    )
+    short_items = [
+        item_data for item_data in delivery_data.products
+        if stock_levels[(item_data.product_id, delivery_data.location_id)] < item_data.quantity
+    ]
     
-    # Check stock availability
-    out_of_stock = []
-    for item_data in delivery_data.products:
-        print(f"DEBUG: Checking stock for product {item_data.product_id} at location {delivery_data.location_id}")
-        # Get current stock for this product and location
-        # Use explicit select with scalar_subquery for SQLAlchemy 2.0
-        from sqlalchemy import select
-        stock_query = select(func.sum(StockLedger.quantity)).where(
-            StockLedger.product_id == item_data.product_id,
-            StockLedger.location_id == delivery_data.location_id
-        )
-        stock = db.scalar(stock_query) or 0
-        print(f"DEBUG: Product {item_data.product_id} - Available stock: {stock}, Requested: {item_data.quantity}")
-        
-        if stock < item_data.quantity:
-            print(f"DEBUG: Insufficient stock for product {item_data.product_id}")
-            product = db.query(Product).filter(Product.id == item_data.product_id).first()
-            out_of_stock.append({
+    if short_items:
+        product_names = dict((await db.execute(
+            select(Product.id, Product.name).where(Product.id.in_({item_data.product_id for item_data in short_items}))
+        )).all())
+        out_of_stock = [
+            {
                 "product_id": item_data.product_id,
-                "product_name": product.name if product else "Unknown",
+                "product_name": product_names.get(item_data.product_id, "Unknown"),
                 "requested_quantity": item_data.quantity,
-                "available_quantity": stock
-            })
-    
-    if out_of_stock:
-        print(f"DEBUG: Out of stock items detected: {out_of_stock}")
+                "available_quantity": stock_levels[(item_data.product_id, delivery_data.location_id)]
+            }
+            for item_data in short_items
+        ]
         # Format error message with product details
         error_details = []
         for item in out_of_stock:
@@ -139,36 +211,14 @@ async def create_delivery(
             }
         )
     
-    # Generate reference
-    reference = generate_delivery_reference(db=db)
-    
-    # Determine status
-    delivery_status = DeliveryStatus.DRAFT
-    
     # TEMPORARY: Get a default user for responsible field since auth is disabled
-    from app.models.user import User
-    default_user = db.query(User).first()
-    responsible_id = default_user.id if default_user else None
-    
-    print(f"DEBUG: Found default user: {default_user}, ID: {responsible_id}")
-    
-    if not responsible_id:
-        # Create a dummy user if none exists
-        import uuid
-        responsible_id = str(uuid.uuid4())
-        print(f"DEBUG: Creating new dummy user with ID: {responsible_id}")
-        dummy_user = User(
-            id=responsible_id,
-            email="system@example.com",
-            full_name="System User",
-            hashed_password="dummy"
-        )
-        db.add(dummy_user)
-        db.commit()
-        db.refresh(dummy_user)
-        responsible_id = dummy_user.id
+    responsible_id = await get_default_user_id_async(db)
     
-    print(f"DEBUG: Creating delivery with responsible_id: {responsible_id}")
+    # Generate reference from the shipping warehouse's code, last before the insert:
+    # the counter row stays locked until this transaction commits
+    warehouse = await db.get(Warehouse, delivery_data.warehouse_id)
+    warehouse_code = warehouse.short_code if warehouse else "WH"
+    reference = (await reserve_references_async(db, warehouse_code, DELIVERY_DOC_TYPE))[0]
     
     # Create delivery
     delivery = Delivery(
@@ -178,15 +228,14 @@ async def create_delivery(
         location_id=delivery_data.location_id,
         schedule_date=delivery_data.schedule_date,
         operation_type=delivery_data.operation_type,
-        status=delivery_status,
+        status=DeliveryStatus.DRAFT,
         responsible=responsible_id
     )
     
     db.add(delivery)
-    db.flush()
+    await db.flush()
     
     # Add delivery items
-    from app.models.delivery import DeliveryItem
     for item_data in delivery_data.products:
         item = DeliveryItem(
             delivery_id=delivery.id,
@@ -195,40 +244,197 @@ async def create_delivery(
         )
         db.add(item)
     
-    db.commit()
-    db.refresh(delivery)
+    # Socket.IO event goes out once the delivery is committed
+    record_event(db, "delivery:created", {"id": delivery.id, "reference": delivery.reference}, delivery.warehouse_id)
     
-    # Emit Socket.IO event (non-blocking)
-    try:
-        await emit_delivery_created({
-            "id": delivery.id,
-            "reference": delivery.reference
-        }, delivery.warehouse_id)
-    except:
-        pass  # Don't fail if Socket.IO is not available
+    await db.commit()
+    delivery = await _get_delivery_with_details_async(db, delivery.id)
     
-    delivery_dict = {
-        **delivery.__dict__,
-        "warehouse_name": delivery.warehouse.name if delivery.warehouse else None,
-        "location_name": delivery.location.name if delivery.location else None,
-        "responsible_name": delivery.responsible_user.full_name if delivery.responsible_user else None,
-        "items": [
+    return orjson_response(_delivery_to_dict(delivery), status_code=status.HTTP_201_CREATED)
+
+@router.post("/bulk", response_model=BulkCreateResponse)
+def create_deliveries_bulk(
+    bulk_data: DeliveryBulkCreate,
+    db: Session = Depends(get_db),
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    """
+    Create up to 1,000 deliveries in one transaction.
+    All documents are validated up front (references and stock availability, checked
+    with one grouped stock query); invalid ones are reported as failed and the rest are
+    inserted with multi-row inserts using a pre-allocated block of references.
+    """
+    documents = bulk_data.documents
+    reference_data = BulkReferenceData(
+        db,
+        warehouse_ids={doc.warehouse_id for doc in documents},
+        location_ids={doc.location_id for doc in documents},
+        product_ids={item.product_id for doc in documents for item in doc.products}
+    )
+    stock_levels = get_stock_levels(
+        db, {(item.product_id, doc.location_id) for doc in documents for item in doc.products}
+    )
+    
+    results = []
+    valid = []
+    for index, doc in enumerate(documents):
+        errors = reference_data.errors(
+            warehouse_ids=[doc.warehouse_id],
+            location_ids=[doc.location_id],
+            product_ids=[item.product_id for item in doc.products]
+        )
+        if not errors:
+            requested = defaultdict(float)
+            for item in doc.products:
+                requested[(item.product_id, doc.location_id)] += item.quantity
+            errors = insufficient_stock_errors(requested, stock_levels, reference_data.product_names)
+        result = {"index": index, "success": not errors, "errors": errors}
+        results.append(result)
+        if not errors:
+            valid.append((doc, result))
+    
+    if valid:
+        responsible_id = get_default_user_id(db)
+        delivery_rows = []
+        item_rows = []
+        assigned = assign_references(
+            db, valid, DELIVERY_DOC_TYPE,
+            lambda doc: reference_data.warehouses[doc.warehouse_id].short_code
+        )
+        for doc, result, reference in assigned:
+            delivery_id = str(uuid.uuid4())
+            delivery_rows.append({
+                "id": delivery_id,
+                "reference": reference,
+                "delivery_address": doc.delivery_address,
+                "warehouse_id": doc.warehouse_id,
+                "location_id": doc.location_id,
+                "schedule_date": doc.schedule_date,
+                "operation_type": doc.operation_type,
+                "status": DeliveryStatus.DRAFT,
+                "responsible": responsible_id,
+            })
+            item_rows.extend(
+                {
+                    "delivery_id": delivery_id,
+                    "product_id": item.product_id,
+                    "quantity": item.quantity,
+                }
+                for item in doc.products
+            )
+            result.update(id=delivery_id, reference=reference)
+            record_event(db, "delivery:created", {"id": delivery_id, "reference": reference}, doc.warehouse_id)
+        
+        db.execute(insert(Delivery), delivery_rows)
+        db.execute(insert(DeliveryItem), item_rows)
+        db.commit()
+    
+    return bulk_response(results)
+
+@router.post("/validate", response_model=BatchValidateResponse)
+def validate_deliveries_batch(
+    batch: BatchValidateRequest,
+    db: Session = Depends(get_db),
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    """
+    Validate many deliveries at once.
+    Stock for every (product, location) in the batch is read with one grouped query and
+    demand is netted across documents in request order, so two deliveries cannot both
+    consume the same units. All ledger rows are written with one multi-row insert and a
+    single commit. `mode` selects "partial" or "all_or_nothing" failure semantics.
+    """
+    ids = list(dict.fromkeys(batch.ids))
+    deliveries = {
+        delivery.id: delivery
+        for delivery in db.scalars(
+            select(Delivery)
+            .where(Delivery.id.in_(ids))
+            .options(selectinload(Delivery.items).joinedload(DeliveryItem.product))
+            .with_for_update(of=Delivery)
+        )
+    }
+    available = get_stock_levels(
+        db,
+        {(item.product_id, delivery.location_id) for delivery in deliveries.values() for item in delivery.items}
+    )
+    
+    results = []
+    ledger_rows = []
+    validated = []
+    for delivery_id in ids:
+        delivery = deliveries.get(delivery_id)
+        if not delivery:
+            results.append({"id": delivery_id, "success": False, "errors": ["Delivery not found"]})
+            continue
+        if delivery.status != DeliveryStatus.READY:
+            results.append({
+                "id": delivery_id,
+                "reference": delivery.reference,
+                "success": False,
+                "errors": [f"Delivery must be in Ready status. Current status: {delivery.status}"]
+            })
+            continue
+        
+        requested = defaultdict(float)
+        product_names = {}
+        for item in delivery.items:
+            requested[(item.product_id, delivery.location_id)] += item.quantity
+            product_names[item.product_id] = item.product.name if item.product else "Unknown"
+        errors = insufficient_stock_errors(requested, available, product_names)
+        if errors:
+            results.append({"id": delivery_id, "reference": delivery.reference, "success": False, "errors": errors})
+            continue
+        
+        # Net this delivery's demand so later documents in the batch see the remaining stock
+        for pair, quantity in requested.items():
+            available[pair] -= quantity
+        ledger_rows.extend(
             {
-                **item.__dict__,
-                "product_name": item.product.name if item.product else None
+                "product_id": item.product_id,
+                "warehouse_id": delivery.warehouse_id,
+                "location_id": delivery.location_id,
+                "quantity": -item.quantity,  # Negative for deliveries
+                "transaction_type": TransactionType.DELIVERY,
+                "reference": delivery.reference,
             }
             for item in delivery.items
-        ]
-    }
-    return delivery_dict
+        )
+        validated.append(delivery)
+        results.append({"id": delivery_id, "reference": delivery.reference, "success": True, "errors": []})
+    
+    if not batch_should_commit(results, batch.mode):
+        db.rollback()
+        return batch_validate_response(results, batch.mode)
+    
+    validated_at = datetime.utcnow()
+    validated_by = get_default_user_id(db)
+    for delivery in validated:
+        delivery.status = DeliveryStatus.DONE
+        delivery.validated_at = validated_at
+        delivery.validated_by = validated_by
+    if ledger_rows:
+        db.execute(insert(StockLedger), ledger_rows)
+    
+    # Real-time updates (batched per warehouse) and low stock alerts go out after the commit
+    for row in ledger_rows:
+        record_stock_update(db, row["product_id"], row["location_id"], row["warehouse_id"], row["quantity"])
+    touched = {(row["product_id"], row["location_id"]): row["warehouse_id"] for row in ledger_rows}
+    thresholds = get_low_stock_thresholds(db, touched)
+    for (product_id, location_id), warehouse_id in touched.items():
+        if available[(product_id, location_id)] < thresholds[(product_id, location_id)]:
+            record_low_stock_alert(db, product_id, warehouse_id, available[(product_id, location_id)])
+    db.commit()
+    
+    return batch_validate_response(results, batch.mode)
 
 @router.post("/{delivery_id}/validate", response_model=DeliveryResponse)
 async def validate_delivery(
     delivery_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    delivery = db.query(Delivery).filter(Delivery.id == delivery_id).first()
+    delivery = await _get_delivery_with_details_async(db, delivery_id, for_update=True)
     if not delivery:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -242,15 +448,11 @@ async def validate_delivery(
         )
     
     # Check stock availability again
-    from sqlalchemy import func, select
+    pairs = [(item.product_id, delivery.location_id) for item in delivery.items]
+    stock_levels = await get_stock_levels_async(db, pairs)
     out_of_stock = []
     for item in delivery.items:
-        stock_query = select(func.sum(StockLedger.quantity)).where(
-            StockLedger.product_id == item.product_id,
-            StockLedger.location_id == delivery.location_id
-        )
-        stock = db.scalar(stock_query) or 0
-        
+        stock = stock_levels[(item.product_id, delivery.location_id)]
         if stock < item.quantity:
             out_of_stock.append({
                 "product_id": item.product_id,
@@ -268,9 +470,10 @@ async def validate_delivery(
             }
         )
     
-    # Update stock for each item
+    # Create stock ledger entries (negative quantity for deliveries) and track what remains;
+    # real-time updates and alerts are sent after the commit
+    remaining_stock = dict(stock_levels)
     for item in delivery.items:
-        # Create stock ledger entry (negative quantity for deliveries)
         stock_entry = StockLedger(
             product_id=item.product_id,
             warehouse_id=delivery.warehouse_id,
@@ -280,61 +483,22 @@ async def validate_delivery(
             reference=delivery.reference
         )
         db.add(stock_entry)
-        
-        # Check if stock is low after delivery
-        remaining_stock_query = select(func.sum(StockLedger.quantity)).where(
-            StockLedger.product_id == item.product_id,
-            StockLedger.location_id == delivery.location_id
-        )
-        remaining_stock = db.scalar(remaining_stock_query) or 0
-        
-        # Emit low stock alert if stock is below threshold (e.g., 10)
-        if remaining_stock < 10:
-            try:
-                await emit_low_stock_alert(
-                    product_id=item.product_id,
-                    warehouse_id=delivery.warehouse_id,
-                    current_stock=remaining_stock
-                )
-            except:
-                pass  # Don't fail if Socket.IO is not available
-        
-        # Emit real-time update via Socket.IO (non-blocking)
-        try:
-            await emit_stock_update(
-                product_id=item.product_id,
-                location_id=delivery.location_id,
-                warehouse_id=delivery.warehouse_id,
-                quantity=-item.quantity
-            )
-        except:
-            pass  # Don't fail if Socket.IO is not available
+        record_stock_update(db, item.product_id, delivery.location_id, delivery.warehouse_id, -item.quantity)
+        remaining_stock[(item.product_id, delivery.location_id)] -= item.quantity
+    
+    # Low stock alerts for products now below their reorder point
+    thresholds = await get_low_stock_thresholds_async(db, pairs)
+    for (product_id, location_id), remaining in remaining_stock.items():
+        if remaining < thresholds[(product_id, location_id)]:
+            record_low_stock_alert(db, product_id, delivery.warehouse_id, remaining)
     
     delivery.status = DeliveryStatus.DONE
     delivery.validated_at = datetime.utcnow()
     
     # TEMPORARY: Get a default user for validated_by field
-    from app.models.user import User
-    default_user = db.query(User).first()
-    delivery.validated_by = default_user.id if default_user else None
+    delivery.validated_by = await get_default_user_id_async(db)
     
-    db.commit()
-    db.refresh(delivery)
+    await db.commit()
+    delivery = await _get_delivery_with_details_async(db, delivery.id)
     
-    # return get_delivery(delivery.id, db, current_user)  # TEMPORARILY COMMENTED OUT
-    delivery = db.query(Delivery).filter(Delivery.id == delivery_id).first()
-    delivery_dict = {
-        **delivery.__dict__,
-        "warehouse_name": delivery.warehouse.name if delivery.warehouse else None,
-        "location_name": delivery.location.name if delivery.location else None,
-        "responsible_name": delivery.responsible_user.full_name if delivery.responsible_user else None,
-        "items": [
-            {
-                **item.__dict__,
-                "product_name": item.product.name if item.product else None
-            }
-            for item in delivery.items
-        ]
-    }
-    return delivery_dict
-
+    return orjson_response(_delivery_to_dict(delivery))
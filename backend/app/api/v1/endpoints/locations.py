@@ -2,6 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.core.database import get_db
+from app.core.data_version import conditional_get
+from app.core.read_routing import get_read_db
+from app.core.reference_cache import ReferenceCache, get_reference_data
 # TEMPORARILY COMMENTED OUT FOR TESTING - Authentication disabled
 # from app.core.dependencies import get_current_user
 # from app.models.user import User
@@ -10,10 +13,11 @@ from app.schemas.warehouse import LocationCreate, LocationUpdate, LocationRespon
 
 router = APIRouter()
 
-@router.get("", response_model=List[LocationResponse])
+@router.get("", response_model=List[LocationResponse], dependencies=[conditional_get("locations", "warehouses")])
 def get_locations(
     warehouse_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
     query = db.query(Location)
@@ -28,16 +32,17 @@ def get_locations(
     for location in locations:
         location_dict = {
             **location.__dict__,
-            "warehouse_name": location.warehouse.name if location.warehouse else None
+            "warehouse_name": refs.lookup("warehouses", location.warehouse_id)
         }
         result.append(location_dict)
     
     return result
 
-@router.get("/{location_id}", response_model=LocationResponse)
+@router.get("/{location_id}", response_model=LocationResponse, dependencies=[conditional_get("locations", "warehouses")])
 def get_location(
     location_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
     location = db.query(Location).filter(Location.id == location_id).first()
@@ -49,7 +54,7 @@ def get_location(
     
     location_dict = {
         **location.__dict__,
-        "warehouse_name": location.warehouse.name if location.warehouse else None
+        "warehouse_name": refs.lookup("warehouses", location.warehouse_id)
     }
     return location_dict
 
@@ -3,13 +3,12 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select, or_
 from typing import List, Optional
 from datetime import datetime, date
-from app.core.database import get_db
+from app.core.read_routing import get_read_db
+from app.core.reference_cache import ReferenceCache, get_reference_data
 # TEMPORARILY COMMENTED OUT FOR TESTING - Authentication disabled
 # from app.core.dependencies import get_current_user
 # from app.models.user import User
 from app.models.stock_ledger import StockLedger, TransactionType
-from app.models.warehouse import Location, Warehouse
-from app.models.product import Product
 from app.models.receipt import Receipt
 from app.models.delivery import Delivery
 
@@ -26,7 +25,8 @@ def get_movements(
     date_to: Optional[date] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
     """
@@ -74,36 +74,12 @@ def get_movements(
     
     movements = db.scalars(query).all()
     
-    # Get all related data in one go to avoid N+1 queries
-    location_ids = list(set(m.location_id for m in movements))
-    product_ids = list(set(m.product_id for m in movements))
-    warehouse_ids = list(set(m.warehouse_id for m in movements))
+    # Locations, products and warehouses come from the reference cache
+    refs.resolve(db, "locations", {m.location_id for m in movements})
+    refs.resolve(db, "products", {m.product_id for m in movements})
+    refs.resolve(db, "warehouses", {m.warehouse_id for m in movements})
     references = list(set(m.reference for m in movements))
     
-    # Fetch locations
-    locations_dict = {}
-    if location_ids:
-        locations = db.scalars(
-            select(Location).where(Location.id.in_(location_ids))
-        ).all()
-        locations_dict = {loc.id: loc for loc in locations}
-    
-    # Fetch products
-    products_dict = {}
-    if product_ids:
-        products = db.scalars(
-            select(Product).where(Product.id.in_(product_ids))
-        ).all()
-        products_dict = {prod.id: prod for prod in products}
-    
-    # Fetch warehouses
-    warehouses_dict = {}
-    if warehouse_ids:
-        warehouses = db.scalars(
-            select(Warehouse).where(Warehouse.id.in_(warehouse_ids))
-        ).all()
-        warehouses_dict = {wh.id: wh for wh in warehouses}
-    
     # Fetch receipts and deliveries for contact information
     receipts_dict = {}
     deliveries_dict = {}
@@ -123,9 +99,9 @@ def get_movements(
     # Build response with related data
     result = []
     for movement in movements:
-        location = locations_dict.get(movement.location_id)
-        product = products_dict.get(movement.product_id)
-        warehouse = warehouses_dict.get(movement.warehouse_id)
+        location = refs.get("locations", movement.location_id)
+        product = refs.get("products", movement.product_id)
+        warehouse = refs.get("warehouses", movement.warehouse_id)
         
         # Get contact information from receipt or delivery
         contact = None
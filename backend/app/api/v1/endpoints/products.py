@@ -1,21 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from tempfile import SpooledTemporaryFile
 from typing import List, Optional
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.core.data_version import conditional_get
+from app.core.product_search import product_index, SEARCH_LIMIT
+from app.core.read_routing import get_read_db
+from app.core.reference_cache import ReferenceCache, get_reference_data
 # TEMPORARILY COMMENTED OUT FOR TESTING - Authentication disabled
 # from app.core.dependencies import get_current_user
 # from app.models.user import User
 from app.models.product import Product, ProductCategory
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse
+from app.models.product_import import ProductImport
+from app.schemas.product import (
+    ProductCreate, ProductUpdate, ProductResponse, ProductImportResponse, ProductLookupRequest, ProductLookupResponse
+)
+from app.utils.product_import import import_format, import_products
+from app.utils.pagination import TOTAL_COUNT_PATTERN, keyset_page, split_page, set_total_count
 
 router = APIRouter()
 
-@router.get("", response_model=List[ProductResponse])
+@router.get("", response_model=List[ProductResponse], dependencies=[conditional_get("products")])
 def get_products(
+    response: Response,
     search: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page (instead of skip)"),
+    total: Optional[str] = Query(None, pattern=TOTAL_COUNT_PATTERN, description="Set X-Total-Count: estimate or exact"),
+    db: Session = Depends(get_read_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
     query = db.query(Product)
@@ -26,25 +42,56 @@ def get_products(
             (Product.sku.ilike(f"%{search}%"))
         )
     
-    products = query.offset(skip).limit(limit).all()
-    return products
+    if total:
+        set_total_count(response, db, query.statement, total)
+    # By name, keyset paginated on (name, id)
+    products = keyset_page(query, (Product.name, Product.id), cursor, skip, limit).all()
+    return split_page(products, limit, lambda product: (product.name, product.id), response)
 
-@router.get("/search", response_model=List[ProductResponse])
+@router.get("/search", response_model=List[ProductResponse], dependencies=[conditional_get("products")])
 def search_products(
     q: str = Query(..., min_length=1),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    refs: ReferenceCache = Depends(get_reference_data),  # Keeps the search index current
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    # Ranked ids from the in-memory index, then the rows by primary key
+    product_ids = product_index.search(q, SEARCH_LIMIT)
+    if not product_ids:
+        return []
+    products = {product.id: product for product in db.query(Product).filter(Product.id.in_(product_ids))}
+    return [products[product_id] for product_id in product_ids if product_id in products]
+
+@router.post("/lookup", response_model=ProductLookupResponse)
+def lookup_products(
+    lookup: ProductLookupRequest,
+    db: Session = Depends(get_read_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    products = db.query(Product).filter(
-        (Product.name.ilike(f"%{q}%")) |
-        (Product.sku.ilike(f"%{q}%"))
-    ).limit(20).all()
-    return products
+    """Many products by id and/or SKU in one query (primary key and sku index), e.g. for a document's lines"""
+    conditions = []
+    if lookup.ids:
+        conditions.append(Product.id.in_(set(lookup.ids)))
+    if lookup.skus:
+        conditions.append(Product.sku.in_(set(lookup.skus)))
+    found = db.query(Product).filter(or_(*conditions)).all()
+    by_id = {product.id: product for product in found}
+    by_sku = {product.sku: product for product in found}
 
-@router.get("/{product_id}", response_model=ProductResponse)
+    products = {}  # Ordered by first request position, without duplicates
+    for product in [by_id.get(id_) for id_ in lookup.ids] + [by_sku.get(sku) for sku in lookup.skus]:
+        if product is not None:
+            products.setdefault(product.id, product)
+    return {
+        "products": list(products.values()),
+        "missing_ids": [id_ for id_ in dict.fromkeys(lookup.ids) if id_ not in by_id],
+        "missing_skus": [sku for sku in dict.fromkeys(lookup.skus) if sku not in by_sku],
+    }
+
+@router.get("/{product_id}", response_model=ProductResponse, dependencies=[conditional_get("products")])
 def get_product(
     product_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
     product = db.query(Product).filter(Product.id == product_id).first()
@@ -90,8 +137,76 @@ def create_product(
     db.add(product)
     db.commit()
     db.refresh(product)
+    product_index.upsert([product])
     return product
 
+def _run_import(source, file_format: str) -> ProductImport:
+    db = SessionLocal()
+    try:
+        return import_products(db, source, file_format)
+    finally:
+        db.close()
+
+@router.post("/bulk", response_model=ProductImportResponse)
+async def bulk_import_products(
+    request: Request,
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    """
+    Create or update products from a CSV (text/csv, header line required) or NDJSON
+    (application/x-ndjson) body, matched on sku. Invalid rows are skipped and listed in
+    the error report at error_report_url.
+    """
+    file_format = import_format(request.headers.get("content-type"))
+    # Spool the body instead of holding it in memory; COPY then reads it from the start
+    source = SpooledTemporaryFile(max_size=settings.PRODUCT_IMPORT_SPOOL_BYTES)
+    try:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.PRODUCT_IMPORT_MAX_BYTES:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Import files are limited to {settings.PRODUCT_IMPORT_MAX_BYTES} bytes"
+                )
+            source.write(chunk)
+        source.seek(0)
+        record = await run_in_threadpool(_run_import, source, file_format)
+    finally:
+        source.close()
+
+    return {
+        "id": record.id,
+        "format": record.format,
+        "total_rows": record.total_rows,
+        "inserted": record.inserted,
+        "updated": record.updated,
+        "failed": record.failed,
+        "elapsed_seconds": record.elapsed_seconds,
+        "rows_per_second": record.total_rows / record.elapsed_seconds if record.elapsed_seconds else 0.0,
+        "error_report_url": str(request.url_for("get_product_import_errors", import_id=record.id))
+        if record.error_report else None,
+    }
+
+@router.get("/bulk/{import_id}/errors", response_class=Response)
+def get_product_import_errors(
+    import_id: str,
+    db: Session = Depends(get_db),
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    """The rows skipped by an import, as CSV (row, sku, error)"""
+    product_import = db.query(ProductImport).filter(ProductImport.id == import_id).first()
+    if not product_import:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import not found"
+        )
+    return Response(
+        content=product_import.error_report or "row,sku,error\n",
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="product-import-{import_id}-errors.csv"'}
+    )
+
 @router.put("/{product_id}", response_model=ProductResponse)
 def update_product(
     product_id: str,
@@ -131,4 +246,5 @@ def update_product(
     
     db.commit()
     db.refresh(product)
+    product_index.upsert([product])
     return product
@@ -1,127 +1,180 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from operator import itemgetter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload, joinedload
 from typing import List, Optional
 from datetime import datetime
-from app.core.database import get_db
+import uuid
+from app.core.database import get_db, get_async_db
+from app.core.dependencies import get_default_user_id, get_default_user_id_async
 # TEMPORARILY COMMENTED OUT FOR TESTING - Authentication disabled
 # from app.core.dependencies import get_current_user
 # from app.models.user import User
-from app.models.receipt import Receipt, ReceiptStatus
+from app.models.receipt import Receipt, ReceiptStatus, ReceiptItem
 from app.models.stock_ledger import StockLedger, TransactionType
-from app.schemas.receipt import ReceiptCreate, ReceiptResponse
-from app.utils.reference_generator import generate_receipt_reference
-from app.websocket.handlers import emit_stock_update, emit_receipt_created
-from sqlalchemy import func
+from app.schemas.receipt import ReceiptCreate, ReceiptBulkCreate, ReceiptResponse
+from app.schemas.bulk import BulkCreateResponse, BatchValidateRequest, BatchValidateResponse
+from app.models.warehouse import Warehouse
+from app.utils.reference_generator import reserve_references_async, RECEIPT_DOC_TYPE
+from app.utils.responses import orjson_response
+from app.core.reference_cache import ReferenceCache, get_reference_data
+from app.utils.fieldsets import name_of, requested_fields, includes_items, header_query, fetch_documents, only_fields
+from app.utils.pagination import TOTAL_COUNT_PATTERN, keyset_page, split_page, set_total_count
+from app.utils.bulk import BulkReferenceData, assign_references, bulk_response, batch_should_commit, batch_validate_response
+from app.websocket.events import record_event, record_stock_update
+from sqlalchemy import func, insert, select
 
 router = APIRouter()
 
+# Everything the response needs, loaded up front: many-to-ones are joined into the
+# document query and items (with their products) come from one extra SELECT ... IN
+RECEIPT_LOAD_OPTIONS = (
+    joinedload(Receipt.warehouse),
+    joinedload(Receipt.location),
+    joinedload(Receipt.responsible_user),
+    selectinload(Receipt.items).joinedload(ReceiptItem.product),
+)
+
+# Response fields as SQL expressions for ?fields= / ?include=items (see app/utils/fieldsets.py)
+RECEIPT_FIELDS = {
+    "id": Receipt.id,
+    "reference": Receipt.reference,
+    "receive_from": Receipt.receive_from,
+    "warehouse_id": Receipt.warehouse_id,
+    "warehouse_name": name_of("warehouses", Receipt.warehouse_id),
+    "location_id": Receipt.location_id,
+    "location_name": name_of("locations", Receipt.location_id),
+    "schedule_date": Receipt.schedule_date,
+    "status": Receipt.status,
+    "responsible": Receipt.responsible,
+    "responsible_name": name_of("users", Receipt.responsible, "full_name"),
+    "created_at": Receipt.created_at,
+}
+
+RECEIPT_ITEM_FIELDS = {
+    "id": ReceiptItem.id,
+    "product_id": ReceiptItem.product_id,
+    "product_name": name_of("products", ReceiptItem.product_id),
+    "quantity": ReceiptItem.quantity,
+    "unit_cost": ReceiptItem.unit_cost,
+}
+
+def _receipt_rows(db: Session, refs: ReferenceCache, query, fields: Optional[str], include: Optional[str]) -> List[dict]:
+    """Run a header query built from RECEIPT_FIELDS and attach items if requested"""
+    return fetch_documents(
+        db, refs, query, RECEIPT_FIELDS, RECEIPT_ITEM_FIELDS, ReceiptItem.receipt_id, includes_items(fields, include),
+        order_by=ReceiptItem.created_at
+    )
+
+async def _get_receipt_with_details_async(db: AsyncSession, receipt_id: str, for_update: bool = False):
+    # populate_existing: refresh a receipt already in the session (e.g. after commit)
+    query = (
+        select(Receipt).options(*RECEIPT_LOAD_OPTIONS).where(Receipt.id == receipt_id)
+        .execution_options(populate_existing=True)
+    )
+    if for_update:
+        # Row lock held until commit, as in the batch validate, so concurrent validations run one after the other
+        query = query.with_for_update(of=Receipt)
+    return await db.scalar(query)
+
+def _receipt_to_dict(receipt: Receipt) -> dict:
+    """ReceiptResponse as a plain dict (relationships must be loaded, see RECEIPT_LOAD_OPTIONS)"""
+    return {
+        "id": receipt.id,
+        "reference": receipt.reference,
+        "receive_from": receipt.receive_from,
+        "warehouse_id": receipt.warehouse_id,
+        "warehouse_name": receipt.warehouse.name if receipt.warehouse else None,
+        "location_id": receipt.location_id,
+        "location_name": receipt.location.name if receipt.location else None,
+        "schedule_date": receipt.schedule_date,
+        "status": receipt.status,
+        "responsible": receipt.responsible,
+        "responsible_name": receipt.responsible_user.full_name if receipt.responsible_user else None,
+        "items": [
+            {
+                "id": item.id,
+                "product_id": item.product_id,
+                "product_name": item.product.name if item.product else None,
+                "quantity": item.quantity,
+                "unit_cost": item.unit_cost
+            }
+            for item in receipt.items
+        ],
+        "created_at": receipt.created_at
+    }
+
 @router.get("", response_model=List[ReceiptResponse])
 def get_receipts(
+    response: Response,
     status: Optional[str] = Query(None),
     warehouse_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page (instead of skip)"),
+    total: Optional[str] = Query(None, pattern=TOTAL_COUNT_PATTERN, description="Set X-Total-Count: estimate or exact"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields; defaults to all"),
+    include: Optional[str] = Query(None, description="`items` to include document lines; default only without ?fields="),
     db: Session = Depends(get_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    query = db.query(Receipt)
+    names = requested_fields(fields, RECEIPT_FIELDS)
+    # Newest first, keyset paginated on (created_at, id)
+    query = header_query(RECEIPT_FIELDS, names + [name for name in ("created_at",) if name not in names])
     
     if status:
-        query = query.filter(Receipt.status == status)
+        query = query.where(Receipt.status == status)
     if warehouse_id:
-        query = query.filter(Receipt.warehouse_id == warehouse_id)
+        query = query.where(Receipt.warehouse_id == warehouse_id)
     if search:
-        query = query.filter(
+        query = query.where(
             (Receipt.reference.ilike(f"%{search}%")) |
             (Receipt.receive_from.ilike(f"%{search}%"))
         )
     
-    receipts = query.order_by(Receipt.created_at.desc()).offset(skip).limit(limit).all()
-    
-    # Add related data
-    result = []
-    for receipt in receipts:
-        receipt_dict = {
-            **receipt.__dict__,
-            "warehouse_name": receipt.warehouse.name if receipt.warehouse else None,
-            "location_name": receipt.location.name if receipt.location else None,
-            "responsible_name": receipt.responsible_user.full_name if receipt.responsible_user else None,
-            "items": [
-                {
-                    **item.__dict__,
-                    "product_name": item.product.name if item.product else None
-                }
-                for item in receipt.items
-            ]
-        }
-        result.append(receipt_dict)
+    if total:
+        set_total_count(response, db, query, total)
+    query = keyset_page(query, (Receipt.created_at, Receipt.id), cursor, skip, limit, descending=True)
+    receipts = split_page(_receipt_rows(db, refs, query, fields, include), limit, itemgetter("created_at", "id"), response)
     
-    return result
+    return orjson_response(only_fields(receipts, names), response)
 
 @router.get("/{receipt_id}", response_model=ReceiptResponse)
 def get_receipt(
     receipt_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields; defaults to all"),
+    include: Optional[str] = Query(None, description="`items` to include document lines; default only without ?fields="),
     db: Session = Depends(get_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    receipt = db.query(Receipt).filter(Receipt.id == receipt_id).first()
-    if not receipt:
+    query = header_query(RECEIPT_FIELDS, requested_fields(fields, RECEIPT_FIELDS)).where(Receipt.id == receipt_id)
+    receipts = _receipt_rows(db, refs, query, fields, include)
+    if not receipts:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Receipt not found"
         )
     
-    receipt_dict = {
-        **receipt.__dict__,
-        "warehouse_name": receipt.warehouse.name if receipt.warehouse else None,
-        "location_name": receipt.location.name if receipt.location else None,
-        "responsible_name": receipt.responsible_user.full_name if receipt.responsible_user else None,
-        "items": [
-            {
-                **item.__dict__,
-                "product_name": item.product.name if item.product else None
-            }
-            for item in receipt.items
-        ]
-    }
-    return receipt_dict
+    return orjson_response(receipts[0])
 
 @router.post("", response_model=ReceiptResponse, status_code=status.HTTP_201_CREATED)
 async def create_receipt(
     receipt_data: ReceiptCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    # Generate reference
-    reference = generate_receipt_reference(db=db)
-    
     # TEMPORARY: Get a default user for responsible field since auth is disabled
-    from app.models.user import User
-    default_user = db.query(User).first()
-    responsible_id = default_user.id if default_user else None
+    responsible_id = await get_default_user_id_async(db)
+    
+    # Generate reference from the receiving warehouse's code, last before the insert:
+    # the counter row stays locked until this transaction commits
+    warehouse = await db.get(Warehouse, receipt_data.warehouse_id)
+    warehouse_code = warehouse.short_code if warehouse else "WH"
+    reference = (await reserve_references_async(db, warehouse_code, RECEIPT_DOC_TYPE))[0]
     
-    print(f"DEBUG: Found default user: {default_user}, ID: {responsible_id}")
-
-    if not responsible_id:
-        # Create a dummy user if none exists
-        import uuid
-        responsible_id = str(uuid.uuid4())
-        print(f"DEBUG: Creating new dummy user with ID: {responsible_id}")
-        dummy_user = User(
-            id=responsible_id,
-            email="system@example.com",
-            full_name="System User",
-            hashed_password="dummy"
-        )
-        db.add(dummy_user)
-        db.commit() # Commit the user first to ensure it exists
-        db.refresh(dummy_user)
-        responsible_id = dummy_user.id
-        print(f"DEBUG: Dummy user committed. ID: {responsible_id}")
-
-    print(f"DEBUG: Creating receipt with responsible_id: {responsible_id}")
-
     # Create receipt
     receipt = Receipt(
         reference=reference,
@@ -134,10 +187,9 @@ async def create_receipt(
     )
     
     db.add(receipt)
-    db.flush()
+    await db.flush()
     
     # Add receipt items
-    from app.models.receipt import ReceiptItem
     for item_data in receipt_data.products:
         item = ReceiptItem(
             receipt_id=receipt.id,
@@ -147,40 +199,165 @@ async def create_receipt(
         )
         db.add(item)
     
-    db.commit()
-    db.refresh(receipt)
-    
-    # Emit Socket.IO event (non-blocking)
-    try:
-        await emit_receipt_created({
-            "id": receipt.id,
-            "reference": receipt.reference
-        }, receipt.warehouse_id)
-    except:
-        pass  # Don't fail if Socket.IO is not available
-    
-    receipt_dict = {
-        **receipt.__dict__,
-        "warehouse_name": receipt.warehouse.name if receipt.warehouse else None,
-        "location_name": receipt.location.name if receipt.location else None,
-        "responsible_name": receipt.responsible_user.full_name if receipt.responsible_user else None,
-        "items": [
+    # Socket.IO event goes out once the receipt is committed
+    record_event(db, "receipt:created", {"id": receipt.id, "reference": receipt.reference}, receipt.warehouse_id)
+    
+    await db.commit()
+    receipt = await _get_receipt_with_details_async(db, receipt.id)
+    
+    return orjson_response(_receipt_to_dict(receipt), status_code=status.HTTP_201_CREATED)
+
+@router.post("/bulk", response_model=BulkCreateResponse)
+def create_receipts_bulk(
+    bulk_data: ReceiptBulkCreate,
+    db: Session = Depends(get_db),
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    """
+    Create up to 1,000 receipts in one transaction.
+    All documents are validated up front; those referencing unknown warehouses, locations
+    or products are reported as failed and the rest are inserted with multi-row inserts
+    using a pre-allocated block of references.
+    """
+    documents = bulk_data.documents
+    reference_data = BulkReferenceData(
+        db,
+        warehouse_ids={doc.warehouse_id for doc in documents},
+        location_ids={doc.location_id for doc in documents},
+        product_ids={item.product_id for doc in documents for item in doc.products}
+    )
+    
+    results = []
+    valid = []
+    for index, doc in enumerate(documents):
+        errors = reference_data.errors(
+            warehouse_ids=[doc.warehouse_id],
+            location_ids=[doc.location_id],
+            product_ids=[item.product_id for item in doc.products]
+        )
+        result = {"index": index, "success": not errors, "errors": errors}
+        results.append(result)
+        if not errors:
+            valid.append((doc, result))
+    
+    if valid:
+        responsible_id = get_default_user_id(db)
+        receipt_rows = []
+        item_rows = []
+        assigned = assign_references(
+            db, valid, RECEIPT_DOC_TYPE,
+            lambda doc: reference_data.warehouses[doc.warehouse_id].short_code
+        )
+        for doc, result, reference in assigned:
+            receipt_id = str(uuid.uuid4())
+            receipt_rows.append({
+                "id": receipt_id,
+                "reference": reference,
+                "receive_from": doc.receive_from,
+                "warehouse_id": doc.warehouse_id,
+                "location_id": doc.location_id,
+                "schedule_date": doc.schedule_date,
+                "status": ReceiptStatus.DRAFT,
+                "responsible": responsible_id,
+            })
+            item_rows.extend(
+                {
+                    "receipt_id": receipt_id,
+                    "product_id": item.product_id,
+                    "quantity": item.quantity,
+                    "unit_cost": item.unit_cost,
+                }
+                for item in doc.products
+            )
+            result.update(id=receipt_id, reference=reference)
+            record_event(db, "receipt:created", {"id": receipt_id, "reference": reference}, doc.warehouse_id)
+        
+        db.execute(insert(Receipt), receipt_rows)
+        db.execute(insert(ReceiptItem), item_rows)
+        db.commit()
+    
+    return bulk_response(results)
+
+@router.post("/validate", response_model=BatchValidateResponse)
+def validate_receipts_batch(
+    batch: BatchValidateRequest,
+    db: Session = Depends(get_db),
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    """
+    Validate many receipts at once.
+    Documents and items are loaded in two queries, all ledger rows are written with one
+    multi-row insert and a single commit. `mode` decides whether documents that pass are
+    committed when others fail ("partial") or nothing is ("all_or_nothing").
+    """
+    ids = list(dict.fromkeys(batch.ids))
+    receipts = {
+        receipt.id: receipt
+        for receipt in db.scalars(
+            select(Receipt)
+            .where(Receipt.id.in_(ids))
+            .options(selectinload(Receipt.items))
+            .with_for_update()
+        )
+    }
+    
+    results = []
+    ledger_rows = []
+    validated = []
+    for receipt_id in ids:
+        receipt = receipts.get(receipt_id)
+        if not receipt:
+            results.append({"id": receipt_id, "success": False, "errors": ["Receipt not found"]})
+            continue
+        if receipt.status != ReceiptStatus.READY:
+            results.append({
+                "id": receipt_id,
+                "reference": receipt.reference,
+                "success": False,
+                "errors": [f"Receipt must be in Ready status. Current status: {receipt.status}"]
+            })
+            continue
+        
+        ledger_rows.extend(
             {
-                **item.__dict__,
-                "product_name": item.product.name if item.product else None
+                "product_id": item.product_id,
+                "warehouse_id": receipt.warehouse_id,
+                "location_id": receipt.location_id,
+                "quantity": item.quantity,  # Positive for receipts
+                "transaction_type": TransactionType.RECEIPT,
+                "reference": receipt.reference,
             }
             for item in receipt.items
-        ]
-    }
-    return receipt_dict
+        )
+        validated.append(receipt)
+        results.append({"id": receipt_id, "reference": receipt.reference, "success": True, "errors": []})
+    
+    if not batch_should_commit(results, batch.mode):
+        db.rollback()
+        return batch_validate_response(results, batch.mode)
+    
+    validated_at = datetime.utcnow()
+    validated_by = get_default_user_id(db)
+    for receipt in validated:
+        receipt.status = ReceiptStatus.DONE
+        receipt.validated_at = validated_at
+        receipt.validated_by = validated_by
+    if ledger_rows:
+        db.execute(insert(StockLedger), ledger_rows)
+    # Real-time updates go out in one batch per warehouse after the commit
+    for row in ledger_rows:
+        record_stock_update(db, row["product_id"], row["location_id"], row["warehouse_id"], row["quantity"])
+    db.commit()
+    
+    return batch_validate_response(results, batch.mode)
 
 @router.post("/{receipt_id}/validate", response_model=ReceiptResponse)
 async def validate_receipt(
     receipt_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    receipt = db.query(Receipt).filter(Receipt.id == receipt_id).first()
+    receipt = await _get_receipt_with_details_async(db, receipt_id, for_update=True)
     if not receipt:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -193,9 +370,8 @@ async def validate_receipt(
             detail=f"Receipt must be in Ready status. Current status: {receipt.status}"
         )
     
-    # Update stock for each item
+    # Create a stock ledger entry for each item (real-time updates are sent after the commit)
     for item in receipt.items:
-        # Create stock ledger entry
         stock_entry = StockLedger(
             product_id=item.product_id,
             warehouse_id=receipt.warehouse_id,
@@ -205,48 +381,15 @@ async def validate_receipt(
             reference=receipt.reference
         )
         db.add(stock_entry)
-        
-        # Emit real-time update via Socket.IO (non-blocking)
-        try:
-            await emit_stock_update(
-                product_id=item.product_id,
-                location_id=receipt.location_id,
-                warehouse_id=receipt.warehouse_id,
-                quantity=item.quantity
-            )
-        except:
-            pass  # Don't fail if Socket.IO is not available
+        record_stock_update(db, item.product_id, receipt.location_id, receipt.warehouse_id, item.quantity)
     
     receipt.status = ReceiptStatus.DONE
     receipt.validated_at = datetime.utcnow()
     
     # TEMPORARY: Get a default user for validated_by field
-    from app.models.user import User
-    default_user = db.query(User).first()
-    receipt.validated_by = default_user.id if default_user else None
-    
-    if not receipt.validated_by:
-         # This should technically not happen if create_receipt worked, 
-         # but to be safe in dev environment:
-         pass 
-
-    db.commit()
-    db.refresh(receipt)
+    receipt.validated_by = await get_default_user_id_async(db)
     
-    # return get_receipt(receipt.id, db, current_user)  # TEMPORARILY COMMENTED OUT
-    receipt = db.query(Receipt).filter(Receipt.id == receipt_id).first()
-    receipt_dict = {
-        **receipt.__dict__,
-        "warehouse_name": receipt.warehouse.name if receipt.warehouse else None,
-        "location_name": receipt.location.name if receipt.location else None,
-        "responsible_name": receipt.responsible_user.full_name if receipt.responsible_user else None,
-        "items": [
-            {
-                **item.__dict__,
-                "product_name": item.product.name if item.product else None
-            }
-            for item in receipt.items
-        ]
-    }
-    return receipt_dict
-
+    await db.commit()
+    receipt = await _get_receipt_with_details_async(db, receipt.id)
+    
+    return orjson_response(_receipt_to_dict(receipt))
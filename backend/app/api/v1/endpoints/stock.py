@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query, Body
 from sqlalchemy.orm import Session
 from sqlalchemy import func, select
 from typing import List, Optional
-from pydantic import BaseModel
+from collections import defaultdict
+from pydantic import BaseModel, Field
 from app.core.database import get_db
+from app.core.data_version import conditional_get
+from app.core.read_routing import get_read_db
+from app.core.reference_cache import ReferenceCache, get_reference_data
 # TEMPORARILY COMMENTED OUT FOR TESTING - Authentication disabled
 # from app.core.dependencies import get_current_user
 # from app.models.user import User
 from app.models.product import Product
 from app.models.stock_ledger import StockLedger, TransactionType
-from app.models.warehouse import Location, Warehouse
+from app.models.warehouse import Location
+from app.utils.responses import orjson_response
+from app.utils.stock import get_stock_levels
+from app.websocket.events import record_stock_update
+from app.websocket.handlers import warehouse_room
+from app.websocket.replay import (
+    is_covered, oldest_outbox_id_query, outbox_changes_query, outbox_frame, relay_cursor_query
+)
 
 router = APIRouter()
 
@@ -17,12 +28,21 @@ class StockUpdateRequest(BaseModel):
     quantity: float
     reason: Optional[str] = None
 
-@router.get("")
+class StockLookupPair(BaseModel):
+    product_id: str
+    location_id: str
+
+class StockLookupRequest(BaseModel):
+    pairs: List[StockLookupPair] = Field(..., min_length=1, max_length=1000)
+
+@router.get("", dependencies=[conditional_get("products", "locations", "warehouses", stock=True)])
 def get_stock(
+    response: Response,
     search: Optional[str] = Query(None),
     location_id: Optional[str] = Query(None),
     warehouse_id: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
     # Use SQLAlchemy 2.0 syntax with select()
@@ -46,30 +66,20 @@ def get_stock(
     if warehouse_id:
         stock_query = stock_query.where(StockLedger.warehouse_id == warehouse_id)
     
-    # Get all locations if filtering by warehouse
-    locations_query = select(Location)
-    if warehouse_id:
-        locations_query = locations_query.where(Location.warehouse_id == warehouse_id)
-    if location_id:
-        locations_query = locations_query.where(Location.id == location_id)
-    
-    locations = db.scalars(locations_query).all()
-    location_dict = {loc.id: loc for loc in locations}
-    
-    # Get warehouses
-    warehouses_query = select(Warehouse)
-    if warehouse_id:
-        warehouses_query = warehouses_query.where(Warehouse.id == warehouse_id)
-    warehouses = db.scalars(warehouses_query).all()
-    warehouse_dict = {wh.id: wh for wh in warehouses}
+    # Locations, warehouses and products come from the reference cache (current as of the ETag)
+    location_dict = {
+        loc.id: loc for loc in refs.values("locations")
+        if (not warehouse_id or loc.warehouse_id == warehouse_id) and (not location_id or loc.id == location_id)
+    }
     
-    # Get products (with optional search filter)
-    products_query = select(Product)
+    # Get products (with optional search filter, case-insensitive like the ilike it replaces)
+    products = refs.values("products")
     if search:
-        products_query = products_query.where(
-            (Product.name.ilike(f"%{search}%")) | (Product.sku.ilike(f"%{search}%"))
-        )
-    products = db.scalars(products_query).all()
+        needle = search.lower()
+        products = [
+            product for product in products
+            if needle in product.name.lower() or needle in product.sku.lower()
+        ]
     
     # Execute stock query
     stock_results = db.execute(stock_query).all()
@@ -85,6 +95,11 @@ def get_stock(
             }
         stock_dict[key]['quantity'] += result.quantity or 0
     
+    # Same, grouped by product so each product only visits its own locations
+    stock_by_product = defaultdict(dict)
+    for (prod_id, loc_id), stock_info in stock_dict.items():
+        stock_by_product[prod_id][loc_id] = stock_info
+    
     # Build stock data list
     stock_data = []
     
@@ -96,15 +111,15 @@ def get_stock(
         for product in products:
             if product.id in product_ids_with_stock:
                 # Get all locations for this product that match filters
-                for loc_id, stock_info in stock_dict.items():
-                    if loc_id[0] == product.id and loc_id[1] in location_dict:
-                        location = location_dict[loc_id[1]]
-                        warehouse = warehouse_dict.get(stock_info['warehouse_id'])
+                for loc_id, stock_info in stock_by_product[product.id].items():
+                    if loc_id in location_dict:
+                        location = location_dict[loc_id]
+                        warehouse = refs.get("warehouses", stock_info['warehouse_id'])
                         stock_data.append({
                             "product": product.name,
                             "sku": product.sku,
                             "product_id": product.id,
-                            "location_id": loc_id[1],
+                            "location_id": loc_id,
                             "location": location.name,
                             "warehouse_id": location.warehouse_id,
                             "warehouse": warehouse.name if warehouse else None,
@@ -116,17 +131,14 @@ def get_stock(
         # Show all products with their stock across all locations
         for product in products:
             # Get all locations where this product has stock
-            product_stock_locations = {
-                loc_id: info for (prod_id, loc_id), info in stock_dict.items()
-                if prod_id == product.id
-            }
+            product_stock_locations = stock_by_product.get(product.id)
             
             if product_stock_locations:
                 # Add entries for each location
                 for loc_id, stock_info in product_stock_locations.items():
                     if loc_id in location_dict:
                         location = location_dict[loc_id]
-                        warehouse = warehouse_dict.get(stock_info['warehouse_id'])
+                        warehouse = refs.get("warehouses", stock_info['warehouse_id'])
                         stock_data.append({
                             "product": product.name,
                             "sku": product.sku,
@@ -154,7 +166,80 @@ def get_stock(
                     "freeToUse": 0,
                 })
     
-    return stock_data
+    # Plain dicts and floats only: encode with orjson directly, keeping the ETag header
+    return orjson_response(stock_data, response)
+
+@router.post("/lookup")
+def lookup_stock(
+    lookup: StockLookupRequest,
+    db: Session = Depends(get_read_db),
+    refs: ReferenceCache = Depends(get_reference_data),
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    """
+    On-hand stock for many (product_id, location_id) pairs in one grouped query on the
+    covering ledger index, in request order and shaped like GET /stock rows. Unknown
+    products or locations come back with null names and 0 on hand.
+    """
+    pairs = list(dict.fromkeys((pair.product_id, pair.location_id) for pair in lookup.pairs))
+    levels = get_stock_levels(db, pairs)
+    refs.resolve(db, "products", {product_id for product_id, _ in pairs})
+    refs.resolve(db, "locations", {location_id for _, location_id in pairs})
+
+    stock_data = []
+    for product_id, location_id in pairs:
+        product = refs.get("products", product_id)
+        location = refs.get("locations", location_id)
+        warehouse_id = location.warehouse_id if location else None
+        quantity = levels[(product_id, location_id)] or 0
+        stock_data.append({
+            "product": product.name if product else None,
+            "sku": product.sku if product else None,
+            "product_id": product_id,
+            "location_id": location_id,
+            "location": location.name if location else None,
+            "warehouse_id": warehouse_id,
+            "warehouse": refs.lookup("warehouses", warehouse_id),
+            "perUnitCost": (product.unit_cost or 0) if product else 0,
+            "onHand": quantity,
+            "freeToUse": quantity,
+        })
+    return orjson_response(stock_data)
+
+@router.get("/changes")
+def get_stock_changes(
+    warehouse_id: str = Query(...),
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    db: Session = Depends(get_read_db),
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    """
+    Real-time events for a warehouse after seq `since`, for clients catching up after a
+    disconnect. `resync` is true when some of them are no longer kept; reload /stock then.
+    Page with `since=last_seq` while `has_more` is true. Events the relay has not sent
+    yet are left out (see app/websocket/replay.py), so a later poll returns them in order.
+    """
+    oldest_id = db.scalar(oldest_outbox_id_query())
+    if not is_covered(oldest_id, since):
+        return {
+            "warehouse_id": warehouse_id,
+            "events": [],
+            "last_seq": since,
+            "has_more": False,
+            "resync": True
+        }
+    
+    through = db.scalar(relay_cursor_query()) or 0
+    rows = db.execute(outbox_changes_query(warehouse_room(warehouse_id), since, through, limit + 1)).all()
+    frames = [outbox_frame(row) for row in rows[:limit]]
+    return {
+        "warehouse_id": warehouse_id,
+        "events": [{"seq": seq, "event": event, "data": payload} for seq, event, payload in frames],
+        "last_seq": frames[-1][0] if frames else since,
+        "has_more": len(rows) > limit,
+        "resync": False
+    }
 
 @router.put("/{product_id}/{location_id}")
 def update_stock(
@@ -210,13 +295,10 @@ def update_stock(
             reference=adjustment_ref
         )
         db.add(adjustment)
+        # Real-time update goes out after the commit
+        record_stock_update(db, product_id, location_id, location.warehouse_id, difference)
         db.commit()
         db.refresh(adjustment)
-        
-        # Emit Socket.IO event for real-time update (non-blocking)
-        # Note: This is a synchronous endpoint, so Socket.IO emit would need to be handled separately
-        # For now, we'll skip the real-time update in this endpoint
-        # Real-time updates are already handled in receipt/delivery validation endpoints
     
     return {
         "message": "Stock updated successfully",
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, select
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from operator import itemgetter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy import select, insert
 from typing import List, Optional
 from datetime import datetime
-from app.core.database import get_db
+from collections import defaultdict
+import uuid
+from app.core.database import get_db, get_async_db
+from app.core.dependencies import get_default_user_id, get_default_user_id_async
 # TEMPORARILY COMMENTED OUT FOR TESTING - Authentication disabled
 # from app.core.dependencies import get_current_user
 # from app.models.user import User
@@ -11,98 +16,175 @@ from app.models.transfer import Transfer, TransferStatus, TransferItem
 from app.models.stock_ledger import StockLedger, TransactionType
 from app.models.product import Product
 from app.models.warehouse import Location, Warehouse
-from app.schemas.transfer import TransferCreate, TransferResponse
-from app.utils.reference_generator import generate_transfer_reference
-from app.websocket.handlers import emit_stock_update
+from app.schemas.transfer import TransferCreate, TransferBulkCreate, TransferResponse
+from app.schemas.bulk import BulkCreateResponse, BatchValidateRequest, BatchValidateResponse
+from app.utils.reference_generator import reserve_references_async, TRANSFER_DOC_TYPE
+from app.utils.responses import orjson_response
+from app.core.reference_cache import ReferenceCache, get_reference_data
+from app.utils.fieldsets import name_of, requested_fields, includes_items, header_query, fetch_documents, only_fields
+from app.utils.pagination import TOTAL_COUNT_PATTERN, keyset_page, split_page, set_total_count
+from app.utils.bulk import (
+    BulkReferenceData, insufficient_stock_errors, assign_references, bulk_response,
+    batch_should_commit, batch_validate_response
+)
+from app.utils.stock import get_stock_levels, get_stock_levels_async
+from app.websocket.events import record_event, record_stock_update
 
 router = APIRouter()
 
+# Everything the response needs, loaded up front: many-to-ones are joined into the
+# document query and items (with their products) come from one extra SELECT ... IN
+TRANSFER_LOAD_OPTIONS = (
+    joinedload(Transfer.from_warehouse),
+    joinedload(Transfer.from_location),
+    joinedload(Transfer.to_warehouse),
+    joinedload(Transfer.to_location),
+    joinedload(Transfer.responsible_user),
+    selectinload(Transfer.items).joinedload(TransferItem.product),
+)
+
+# Response fields as SQL expressions for ?fields= / ?include=items (see app/utils/fieldsets.py)
+TRANSFER_FIELDS = {
+    "id": Transfer.id,
+    "reference": Transfer.reference,
+    "from_warehouse_id": Transfer.from_warehouse_id,
+    "from_warehouse_name": name_of("warehouses", Transfer.from_warehouse_id),
+    "from_location_id": Transfer.from_location_id,
+    "from_location_name": name_of("locations", Transfer.from_location_id),
+    "to_warehouse_id": Transfer.to_warehouse_id,
+    "to_warehouse_name": name_of("warehouses", Transfer.to_warehouse_id),
+    "to_location_id": Transfer.to_location_id,
+    "to_location_name": name_of("locations", Transfer.to_location_id),
+    "schedule_date": Transfer.schedule_date,
+    "status": Transfer.status,
+    "responsible": Transfer.responsible,
+    "responsible_name": name_of("users", Transfer.responsible, "full_name"),
+    "notes": Transfer.notes,
+    "created_at": Transfer.created_at,
+}
+
+TRANSFER_ITEM_FIELDS = {
+    "id": TransferItem.id,
+    "product_id": TransferItem.product_id,
+    "product_name": name_of("products", TransferItem.product_id),
+    "quantity": TransferItem.quantity,
+}
+
+def _transfer_rows(db: Session, refs: ReferenceCache, query, fields: Optional[str], include: Optional[str]) -> List[dict]:
+    """Run a header query built from TRANSFER_FIELDS and attach items if requested"""
+    return fetch_documents(
+        db, refs, query, TRANSFER_FIELDS, TRANSFER_ITEM_FIELDS, TransferItem.transfer_id, includes_items(fields, include),
+        order_by=TransferItem.created_at
+    )
+
+async def _get_transfer_with_details_async(db: AsyncSession, transfer_id: str, for_update: bool = False):
+    # populate_existing: refresh a transfer already in the session (e.g. after commit)
+    query = (
+        select(Transfer).options(*TRANSFER_LOAD_OPTIONS).where(Transfer.id == transfer_id)
+        .execution_options(populate_existing=True)
+    )
+    if for_update:
+        # Row lock held until commit, as in the batch validate, so concurrent validations run one after the other
+        query = query.with_for_update(of=Transfer)
+    return await db.scalar(query)
+
+def _transfer_to_dict(transfer: Transfer) -> dict:
+    """TransferResponse as a plain dict (relationships must be loaded, see TRANSFER_LOAD_OPTIONS)"""
+    return {
+        "id": transfer.id,
+        "reference": transfer.reference,
+        "from_warehouse_id": transfer.from_warehouse_id,
+        "from_warehouse_name": transfer.from_warehouse.name if transfer.from_warehouse else None,
+        "from_location_id": transfer.from_location_id,
+        "from_location_name": transfer.from_location.name if transfer.from_location else None,
+        "to_warehouse_id": transfer.to_warehouse_id,
+        "to_warehouse_name": transfer.to_warehouse.name if transfer.to_warehouse else None,
+        "to_location_id": transfer.to_location_id,
+        "to_location_name": transfer.to_location.name if transfer.to_location else None,
+        "schedule_date": transfer.schedule_date,
+        "status": transfer.status,
+        "responsible": transfer.responsible,
+        "responsible_name": transfer.responsible_user.full_name if transfer.responsible_user else None,
+        "notes": transfer.notes,
+        "items": [
+            {
+                "id": item.id,
+                "product_id": item.product_id,
+                "product_name": item.product.name if item.product else None,
+                "quantity": item.quantity
+            }
+            for item in transfer.items
+        ],
+        "created_at": transfer.created_at
+    }
+
 @router.get("", response_model=List[TransferResponse])
 def get_transfers(
+    response: Response,
     status: Optional[str] = Query(None),
     warehouse_id: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page (instead of skip)"),
+    total: Optional[str] = Query(None, pattern=TOTAL_COUNT_PATTERN, description="Set X-Total-Count: estimate or exact"),
+    fields: Optional[str] = Query(None, description="Comma-separated response fields; defaults to all"),
+    include: Optional[str] = Query(None, description="`items` to include document lines; default only without ?fields="),
     db: Session = Depends(get_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    query = db.query(Transfer)
+    names = requested_fields(fields, TRANSFER_FIELDS)
+    # Newest first, keyset paginated on (created_at, id)
+    query = header_query(TRANSFER_FIELDS, names + [name for name in ("created_at",) if name not in names])
     
     if status:
         try:
             status_enum = TransferStatus(status)
-            query = query.filter(Transfer.status == status_enum)
+            query = query.where(Transfer.status == status_enum)
         except ValueError:
             pass
     if warehouse_id:
-        query = query.filter(
+        query = query.where(
             (Transfer.from_warehouse_id == warehouse_id) | 
             (Transfer.to_warehouse_id == warehouse_id)
         )
     if search:
-        query = query.filter(
+        query = query.where(
             (Transfer.reference.ilike(f"%{search}%")) |
             (Transfer.notes.ilike(f"%{search}%"))
         )
     
-    transfers = query.order_by(Transfer.created_at.desc()).offset(skip).limit(limit).all()
-    
-    result = []
-    for transfer in transfers:
-        transfer_dict = {
-            **transfer.__dict__,
-            "from_warehouse_name": transfer.from_warehouse.name if transfer.from_warehouse else None,
-            "from_location_name": transfer.from_location.name if transfer.from_location else None,
-            "to_warehouse_name": transfer.to_warehouse.name if transfer.to_warehouse else None,
-            "to_location_name": transfer.to_location.name if transfer.to_location else None,
-            "responsible_name": transfer.responsible_user.full_name if transfer.responsible_user else None,
-            "items": [
-                {
-                    **item.__dict__,
-                    "product_name": item.product.name if item.product else None
-                }
-                for item in transfer.items
-            ]
-        }
-        result.append(transfer_dict)
+    if total:
+        set_total_count(response, db, query, total)
+    query = keyset_page(query, (Transfer.created_at, Transfer.id), cursor, skip, limit, descending=True)
+    transfers = split_page(_transfer_rows(db, refs, query, fields, include), limit, itemgetter("created_at", "id"), response)
     
-    return result
+    return orjson_response(only_fields(transfers, names), response)
 
 @router.get("/{transfer_id}", response_model=TransferResponse)
 def get_transfer(
     transfer_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated response fields; defaults to all"),
+    include: Optional[str] = Query(None, description="`items` to include document lines; default only without ?fields="),
     db: Session = Depends(get_db),
+    refs: ReferenceCache = Depends(get_reference_data),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    transfer = db.query(Transfer).filter(Transfer.id == transfer_id).first()
-    if not transfer:
+    query = header_query(TRANSFER_FIELDS, requested_fields(fields, TRANSFER_FIELDS)).where(Transfer.id == transfer_id)
+    transfers = _transfer_rows(db, refs, query, fields, include)
+    if not transfers:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Transfer not found"
         )
     
-    transfer_dict = {
-        **transfer.__dict__,
-        "from_warehouse_name": transfer.from_warehouse.name if transfer.from_warehouse else None,
-        "from_location_name": transfer.from_location.name if transfer.from_location else None,
-        "to_warehouse_name": transfer.to_warehouse.name if transfer.to_warehouse else None,
-        "to_location_name": transfer.to_location.name if transfer.to_location else None,
-        "responsible_name": transfer.responsible_user.full_name if transfer.responsible_user else None,
-        "items": [
-            {
-                **item.__dict__,
-                "product_name": item.product.name if item.product else None
-            }
-            for item in transfer.items
-        ]
-    }
-    return transfer_dict
+    return orjson_response(transfers[0])
 
 @router.post("", response_model=TransferResponse, status_code=status.HTTP_201_CREATED)
 async def create_transfer(
     transfer_data: TransferCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
     # Validate that from and to locations are different
@@ -113,39 +195,42 @@ async def create_transfer(
         )
     
     # Validate warehouses and locations exist
-    from_location = db.query(Location).filter(Location.id == transfer_data.from_location_id).first()
+    from_location = await db.get(Location, transfer_data.from_location_id, options=[joinedload(Location.warehouse)])
     if not from_location:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="From location not found"
         )
     
-    to_location = db.query(Location).filter(Location.id == transfer_data.to_location_id).first()
+    to_location = await db.get(Location, transfer_data.to_location_id)
     if not to_location:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="To location not found"
         )
     
-    # Check stock availability at from_location
-    out_of_stock = []
-    for item_data in transfer_data.products:
-        stock_query = select(func.sum(StockLedger.quantity)).where(
-            StockLedger.product_id == item_data.product_id,
-            StockLedger.location_id == transfer_data.from_location_id
-        )
-        stock = db.scalar(stock_query) or 0
-        
-        if stock < item_data.quantity:
-            product = db.query(Product).filter(Product.id == item_data.product_id).first()
-            out_of_stock.append({
+    # Check stock availability at from_location for all products in one grouped query
+    stock_levels = await get_stock_levels_async(
+        db, [(item_data.product_id, transfer_data.from_location_id) for item_data in transfer_data.products]
+    )
+    short_items = [
+        item_data for item_data in transfer_data.products
+        if stock_levels[(item_data.product_id, transfer_data.from_location_id)] < item_data.quantity
+    ]
+    
+    if short_items:
+        product_names = dict((await db.execute(
+            select(Product.id, Product.name).where(Product.id.in_({item_data.product_id for item_data in short_items}))
+        )).all())
+        out_of_stock = [
+            {
                 "product_id": item_data.product_id,
-                "product_name": product.name if product else "Unknown",
+                "product_name": product_names.get(item_data.product_id, "Unknown"),
                 "requested_quantity": item_data.quantity,
-                "available_quantity": stock
-            })
-    
-    if out_of_stock:
+                "available_quantity": stock_levels[(item_data.product_id, transfer_data.from_location_id)]
+            }
+            for item_data in short_items
+        ]
         error_details = []
         for item in out_of_stock:
             error_details.append(
@@ -160,28 +245,12 @@ async def create_transfer(
             }
         )
     
-    # Generate reference
-    warehouse_code = from_location.warehouse.short_code if from_location.warehouse else "WH"
-    reference = generate_transfer_reference(warehouse_code=warehouse_code, db=db)
-    
     # TEMPORARY: Get a default user for responsible field since auth is disabled
-    from app.models.user import User
-    default_user = db.query(User).first()
-    responsible_id = default_user.id if default_user else None
+    responsible_id = await get_default_user_id_async(db)
     
-    if not responsible_id:
-        import uuid
-        responsible_id = str(uuid.uuid4())
-        dummy_user = User(
-            id=responsible_id,
-            email="system@example.com",
-            full_name="System User",
-            hashed_password="dummy"
-        )
-        db.add(dummy_user)
-        db.commit()
-        db.refresh(dummy_user)
-        responsible_id = dummy_user.id
+    # Generate reference last before the insert: the counter row stays locked until this transaction commits
+    warehouse_code = from_location.warehouse.short_code if from_location.warehouse else "WH"
+    reference = (await reserve_references_async(db, warehouse_code, TRANSFER_DOC_TYPE))[0]
     
     # Create transfer
     transfer = Transfer(
@@ -197,7 +266,7 @@ async def create_transfer(
     )
     
     db.add(transfer)
-    db.flush()
+    await db.flush()
     
     # Add transfer items
     for item_data in transfer_data.products:
@@ -208,43 +277,210 @@ async def create_transfer(
         )
         db.add(item)
     
-    db.commit()
-    db.refresh(transfer)
+    # Socket.IO event goes out once the transfer is committed
+    record_event(db, "transfer:created", {"id": transfer.id, "reference": transfer.reference}, transfer.from_warehouse_id)
     
-    # Emit Socket.IO event (non-blocking)
-    try:
-        from app.websocket.handlers import emit_transfer_created
-        await emit_transfer_created({
-            "id": transfer.id,
-            "reference": transfer.reference
-        }, transfer.from_warehouse_id)
-    except:
-        pass
+    await db.commit()
+    transfer = await _get_transfer_with_details_async(db, transfer.id)
     
-    transfer_dict = {
-        **transfer.__dict__,
-        "from_warehouse_name": transfer.from_warehouse.name if transfer.from_warehouse else None,
-        "from_location_name": transfer.from_location.name if transfer.from_location else None,
-        "to_warehouse_name": transfer.to_warehouse.name if transfer.to_warehouse else None,
-        "to_location_name": transfer.to_location.name if transfer.to_location else None,
-        "responsible_name": transfer.responsible_user.full_name if transfer.responsible_user else None,
-        "items": [
-            {
-                **item.__dict__,
-                "product_name": item.product.name if item.product else None
-            }
-            for item in transfer.items
-        ]
+    return orjson_response(_transfer_to_dict(transfer), status_code=status.HTTP_201_CREATED)
+
+@router.post("/bulk", response_model=BulkCreateResponse)
+def create_transfers_bulk(
+    bulk_data: TransferBulkCreate,
+    db: Session = Depends(get_db),
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    """
+    Create up to 1,000 transfers in one transaction.
+    All documents are validated up front (references and stock at the source location,
+    checked with one grouped stock query); invalid ones are reported as failed and the
+    rest are inserted with multi-row inserts using pre-allocated blocks of references.
+    """
+    documents = bulk_data.documents
+    reference_data = BulkReferenceData(
+        db,
+        warehouse_ids={wh_id for doc in documents for wh_id in (doc.from_warehouse_id, doc.to_warehouse_id)},
+        location_ids={loc_id for doc in documents for loc_id in (doc.from_location_id, doc.to_location_id)},
+        product_ids={item.product_id for doc in documents for item in doc.products}
+    )
+    stock_levels = get_stock_levels(
+        db, {(item.product_id, doc.from_location_id) for doc in documents for item in doc.products}
+    )
+    
+    results = []
+    valid = []
+    for index, doc in enumerate(documents):
+        if doc.from_location_id == doc.to_location_id:
+            errors = ["From and to locations must be different"]
+        else:
+            errors = reference_data.errors(
+                warehouse_ids=[doc.from_warehouse_id, doc.to_warehouse_id],
+                location_ids=[doc.from_location_id, doc.to_location_id],
+                product_ids=[item.product_id for item in doc.products]
+            )
+        if not errors:
+            requested = defaultdict(float)
+            for item in doc.products:
+                requested[(item.product_id, doc.from_location_id)] += item.quantity
+            errors = insufficient_stock_errors(requested, stock_levels, reference_data.product_names)
+        result = {"index": index, "success": not errors, "errors": errors}
+        results.append(result)
+        if not errors:
+            valid.append((doc, result))
+    
+    if valid:
+        responsible_id = get_default_user_id(db)
+        transfer_rows = []
+        item_rows = []
+        # References use the source location's warehouse code, like single creates
+        assigned = assign_references(
+            db, valid, TRANSFER_DOC_TYPE,
+            lambda doc: (
+                reference_data.locations[doc.from_location_id].warehouse.short_code
+                if reference_data.locations[doc.from_location_id].warehouse else "WH"
+            )
+        )
+        for doc, result, reference in assigned:
+            transfer_id = str(uuid.uuid4())
+            transfer_rows.append({
+                "id": transfer_id,
+                "reference": reference,
+                "from_warehouse_id": doc.from_warehouse_id,
+                "from_location_id": doc.from_location_id,
+                "to_warehouse_id": doc.to_warehouse_id,
+                "to_location_id": doc.to_location_id,
+                "schedule_date": doc.schedule_date,
+                "status": TransferStatus.DRAFT,
+                "responsible": responsible_id,
+                "notes": doc.notes,
+            })
+            item_rows.extend(
+                {
+                    "transfer_id": transfer_id,
+                    "product_id": item.product_id,
+                    "quantity": item.quantity,
+                }
+                for item in doc.products
+            )
+            result.update(id=transfer_id, reference=reference)
+            record_event(db, "transfer:created", {"id": transfer_id, "reference": reference}, doc.from_warehouse_id)
+        
+        db.execute(insert(Transfer), transfer_rows)
+        db.execute(insert(TransferItem), item_rows)
+        db.commit()
+    
+    return bulk_response(results)
+
+@router.post("/validate", response_model=BatchValidateResponse)
+def validate_transfers_batch(
+    batch: BatchValidateRequest,
+    db: Session = Depends(get_db),
+    # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
+):
+    """
+    Validate many transfers at once.
+    Stock for every source and destination (product, location) is read with one grouped
+    query and netted across documents in request order: stock moved out of a location
+    is no longer available to later transfers, stock moved in becomes available. All
+    ledger rows are written with one multi-row insert and a single commit. `mode`
+    selects "partial" or "all_or_nothing" failure semantics.
+    """
+    ids = list(dict.fromkeys(batch.ids))
+    transfers = {
+        transfer.id: transfer
+        for transfer in db.scalars(
+            select(Transfer)
+            .where(Transfer.id.in_(ids))
+            .options(selectinload(Transfer.items).joinedload(TransferItem.product))
+            .with_for_update(of=Transfer)
+        )
     }
-    return transfer_dict
+    available = get_stock_levels(
+        db,
+        {
+            (item.product_id, location_id)
+            for transfer in transfers.values()
+            for item in transfer.items
+            for location_id in (transfer.from_location_id, transfer.to_location_id)
+        }
+    )
+    
+    results = []
+    ledger_rows = []
+    validated = []
+    for transfer_id in ids:
+        transfer = transfers.get(transfer_id)
+        if not transfer:
+            results.append({"id": transfer_id, "success": False, "errors": ["Transfer not found"]})
+            continue
+        if transfer.status == TransferStatus.DONE:
+            results.append({
+                "id": transfer_id,
+                "reference": transfer.reference,
+                "success": False,
+                "errors": ["Transfer is already completed"]
+            })
+            continue
+        
+        requested = defaultdict(float)
+        product_names = {}
+        for item in transfer.items:
+            requested[(item.product_id, transfer.from_location_id)] += item.quantity
+            product_names[item.product_id] = item.product.name if item.product else "Unknown"
+        errors = insufficient_stock_errors(requested, available, product_names)
+        if errors:
+            results.append({"id": transfer_id, "reference": transfer.reference, "success": False, "errors": errors})
+            continue
+        
+        for item in transfer.items:
+            available[(item.product_id, transfer.from_location_id)] -= item.quantity
+            available[(item.product_id, transfer.to_location_id)] += item.quantity
+            ledger_rows.append({
+                "product_id": item.product_id,
+                "warehouse_id": transfer.from_warehouse_id,
+                "location_id": transfer.from_location_id,
+                "quantity": -item.quantity,  # Negative for outgoing
+                "transaction_type": TransactionType.TRANSFER,
+                "reference": transfer.reference,
+            })
+            ledger_rows.append({
+                "product_id": item.product_id,
+                "warehouse_id": transfer.to_warehouse_id,
+                "location_id": transfer.to_location_id,
+                "quantity": item.quantity,  # Positive for incoming
+                "transaction_type": TransactionType.TRANSFER,
+                "reference": transfer.reference,
+            })
+        validated.append(transfer)
+        results.append({"id": transfer_id, "reference": transfer.reference, "success": True, "errors": []})
+    
+    if not batch_should_commit(results, batch.mode):
+        db.rollback()
+        return batch_validate_response(results, batch.mode)
+    
+    validated_at = datetime.utcnow()
+    validated_by = get_default_user_id(db)
+    for transfer in validated:
+        transfer.status = TransferStatus.DONE
+        transfer.validated_at = validated_at
+        transfer.validated_by = validated_by
+    if ledger_rows:
+        db.execute(insert(StockLedger), ledger_rows)
+    # Real-time updates go out in one batch per warehouse after the commit
+    for row in ledger_rows:
+        record_stock_update(db, row["product_id"], row["location_id"], row["warehouse_id"], row["quantity"])
+    db.commit()
+    
+    return batch_validate_response(results, batch.mode)
 
 @router.post("/{transfer_id}/validate", response_model=TransferResponse)
 async def validate_transfer(
     transfer_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
-    transfer = db.query(Transfer).filter(Transfer.id == transfer_id).first()
+    transfer = await _get_transfer_with_details_async(db, transfer_id, for_update=True)
     if not transfer:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -259,14 +495,12 @@ async def validate_transfer(
         )
     
     # Check stock availability again
+    stock_levels = await get_stock_levels_async(
+        db, [(item.product_id, transfer.from_location_id) for item in transfer.items]
+    )
     out_of_stock = []
     for item in transfer.items:
-        stock_query = select(func.sum(StockLedger.quantity)).where(
-            StockLedger.product_id == item.product_id,
-            StockLedger.location_id == transfer.from_location_id
-        )
-        stock = db.scalar(stock_query) or 0
-        
+        stock = stock_levels[(item.product_id, transfer.from_location_id)]
         if stock < item.quantity:
             out_of_stock.append({
                 "product_id": item.product_id,
@@ -284,7 +518,7 @@ async def validate_transfer(
             }
         )
     
-    # Create stock ledger entries for each item
+    # Create stock ledger entries for each item (real-time updates are sent after the commit)
     for item in transfer.items:
         # Negative entry from source location
         from_entry = StockLedger(
@@ -307,50 +541,17 @@ async def validate_transfer(
             reference=transfer.reference
         )
         db.add(to_entry)
-        
-        # Emit real-time updates via Socket.IO (non-blocking)
-        try:
-            await emit_stock_update(
-                product_id=item.product_id,
-                location_id=transfer.from_location_id,
-                warehouse_id=transfer.from_warehouse_id,
-                quantity=-item.quantity
-            )
-            await emit_stock_update(
-                product_id=item.product_id,
-                location_id=transfer.to_location_id,
-                warehouse_id=transfer.to_warehouse_id,
-                quantity=item.quantity
-            )
-        except:
-            pass
+        record_stock_update(db, item.product_id, transfer.from_location_id, transfer.from_warehouse_id, -item.quantity)
+        record_stock_update(db, item.product_id, transfer.to_location_id, transfer.to_warehouse_id, item.quantity)
     
     # Update transfer status
     transfer.status = TransferStatus.DONE
     transfer.validated_at = datetime.utcnow()
     
     # TEMPORARY: Get a default user for validated_by field
-    from app.models.user import User
-    default_user = db.query(User).first()
-    transfer.validated_by = default_user.id if default_user else None
+    transfer.validated_by = await get_default_user_id_async(db)
     
-    db.commit()
-    db.refresh(transfer)
+    await db.commit()
+    transfer = await _get_transfer_with_details_async(db, transfer.id)
     
-    transfer_dict = {
-        **transfer.__dict__,
-        "from_warehouse_name": transfer.from_warehouse.name if transfer.from_warehouse else None,
-        "from_location_name": transfer.from_location.name if transfer.from_location else None,
-        "to_warehouse_name": transfer.to_warehouse.name if transfer.to_warehouse else None,
-        "to_location_name": transfer.to_location.name if transfer.to_location else None,
-        "responsible_name": transfer.responsible_user.full_name if transfer.responsible_user else None,
-        "items": [
-            {
-                **item.__dict__,
-                "product_name": item.product.name if item.product else None
-            }
-            for item in transfer.items
-        ]
-    }
-    return transfer_dict
-
+    return orjson_response(_transfer_to_dict(transfer))
@@ -2,6 +2,8 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 from app.core.database import get_db
+from app.core.data_version import conditional_get
+from app.core.read_routing import get_read_db
 # TEMPORARILY COMMENTED OUT FOR TESTING - Authentication disabled
 # from app.core.dependencies import get_current_user
 # from app.models.user import User
@@ -10,18 +12,18 @@ from app.schemas.warehouse import WarehouseCreate, WarehouseUpdate, WarehouseRes
 
 router = APIRouter()
 
-@router.get("", response_model=List[WarehouseResponse])
+@router.get("", response_model=List[WarehouseResponse], dependencies=[conditional_get("warehouses")])
 def get_warehouses(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
     warehouses = db.query(Warehouse).all()
     return warehouses
 
-@router.get("/{warehouse_id}", response_model=WarehouseResponse)
+@router.get("/{warehouse_id}", response_model=WarehouseResponse, dependencies=[conditional_get("warehouses")])
 def get_warehouse(
     warehouse_id: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     # current_user: User = Depends(get_current_user)  # TEMPORARILY COMMENTED OUT FOR TESTING
 ):
     warehouse = db.query(Warehouse).filter(Warehouse.id == warehouse_id).first()
@@ -0,0 +1,172 @@
+"""
+Data versions for conditional GETs.
+
+Every committed write bumps a version row per scope it touched: one scope per table,
+except stock_ledger which is versioned per warehouse ("stock_ledger:<warehouse_id>").
+Read endpoints derive an ETag from the versions of the scopes they depend on and answer
+304 Not Modified before running their query when the client's If-None-Match matches.
+"""
+import hashlib
+from datetime import datetime
+from typing import Iterable
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import event, select, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.read_routing import get_read_db
+from app.models.data_version import DataVersion
+
+STOCK_SCOPE = "stock_ledger"
+# Bumped when a stock write cannot be attributed to a warehouse
+STOCK_ALL_SCOPE = f"{STOCK_SCOPE}:all"
+
+# Tables whose writes bump a version; item tables bump their document's scope
+VERSIONED_TABLES = {
+    "products": "products",
+    "product_categories": "product_categories",
+    "warehouses": "warehouses",
+    "locations": "locations",
+    "users": "users",
+    "receipts": "receipts",
+    "receipt_items": "receipts",
+    "deliveries": "deliveries",
+    "delivery_items": "deliveries",
+    "transfers": "transfers",
+    "transfer_items": "transfers",
+    "reorder_points": "reorder_points",
+}
+
+_PENDING_SCOPES_KEY = "data_version_scopes"
+# Scopes bumped by the transaction being committed, for after_commit listeners (reference_cache.py)
+COMMITTED_SCOPES_KEY = "data_version_committed_scopes"
+
+def stock_scope(warehouse_id: str) -> str:
+    return f"{STOCK_SCOPE}:{warehouse_id}"
+
+def _scopes_for_row(table_name: str, warehouse_id: str = None) -> set:
+    if table_name == STOCK_SCOPE:
+        return {stock_scope(warehouse_id) if warehouse_id else STOCK_ALL_SCOPE}
+    scope = VERSIONED_TABLES.get(table_name)
+    return {scope} if scope else set()
+
+@event.listens_for(Session, "before_flush")
+def _collect_flush_scopes(session, flush_context, instances):
+    scopes = session.info.setdefault(_PENDING_SCOPES_KEY, set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table_name = getattr(obj, "__tablename__", None)
+        scopes |= _scopes_for_row(table_name, getattr(obj, "warehouse_id", None))
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement_scopes(orm_execute_state):
+    """Bulk insert/update/delete statements bypass the flush, so collect their scopes here"""
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is None:
+        return
+    scopes = orm_execute_state.session.info.setdefault(_PENDING_SCOPES_KEY, set())
+    params = orm_execute_state.parameters
+    rows = params if isinstance(params, list) else [params or {}]
+    if table.name == STOCK_SCOPE and orm_execute_state.is_insert:
+        for row in rows:
+            scopes |= _scopes_for_row(table.name, row.get("warehouse_id"))
+    else:
+        scopes |= _scopes_for_row(table.name)
+
+def touch_scopes(session: Session, *scopes: str):
+    """Bump `scopes` on commit, for writes the ORM events never see (raw SQL, COPY)"""
+    session.info.setdefault(_PENDING_SCOPES_KEY, set()).update(scopes)
+
+@event.listens_for(Session, "before_commit")
+def _bump_on_commit(session):
+    # Flush first so pending objects are collected, then bump as late as possible:
+    # the version rows stay locked only until COMMIT
+    session.flush()
+    scopes = session.info.pop(_PENDING_SCOPES_KEY, None)
+    if scopes:
+        bump_versions(session.connection(), scopes)
+        session.info[COMMITTED_SCOPES_KEY] = scopes
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_PENDING_SCOPES_KEY, None)
+    session.info.pop(COMMITTED_SCOPES_KEY, None)
+
+def bump_versions(connection, scopes: Iterable[str]):
+    """
+    Increment the version of every scope in one upsert (sorted to keep lock order stable).
+
+    The upsert row-locks each version row until COMMIT, so concurrent transactions that
+    write the same scope (a table, or one warehouse's stock) queue on it, each waiting
+    for the one ahead to commit. This is accepted: the bump is the last statement before
+    COMMIT, so a writer holds the lock only for its commit's WAL flush. It also keeps the
+    bump atomic with the data. A bump after commit could be lost in a crash, leaving old
+    ETags valid over new data and getting 304s for stale bodies.
+    """
+    now = datetime.utcnow()
+    stmt = pg_insert(DataVersion).values([
+        {"scope": scope, "version": 1, "updated_at": now}
+        for scope in sorted(scopes)
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DataVersion.scope],
+        set_={"version": DataVersion.version + 1, "updated_at": now}
+    )
+    connection.execute(stmt)
+
+def get_versions(db: Session, scopes: Iterable[str] = (), prefixes: Iterable[str] = ()) -> dict:
+    """Current versions of the given scopes and of every scope starting with one of `prefixes`"""
+    scopes, prefixes = list(scopes), list(prefixes)
+    conditions = [DataVersion.scope.startswith(prefix) for prefix in prefixes]
+    if scopes:
+        conditions.append(DataVersion.scope.in_(scopes))
+    if not conditions:
+        return {}
+    rows = db.execute(select(DataVersion.scope, DataVersion.version).where(or_(*conditions))).all()
+    return {row.scope: row.version for row in rows}
+
+def compute_etag(versions: dict, *extra) -> str:
+    digest = hashlib.sha1(repr((sorted(versions.items()), extra)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison as used for If-None-Match"""
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+def conditional_get(*scopes: str, stock: bool = False, daily: bool = False):
+    """
+    Route dependency that sets an ETag from the data versions of `scopes` and raises
+    304 Not Modified when If-None-Match matches, so the endpoint body never runs.
+    stock=True adds the stock ledger scope of the `warehouse_id` query param (or all
+    warehouses); daily=True makes the tag change at midnight for date-relative data.
+    Versions are read through get_read_db, the same session read-only endpoints use, so
+    the tag never describes newer data than the replica returns.
+    """
+    def check_etag(request: Request, response: Response, db: Session = Depends(get_read_db)):
+        scope_list, prefixes = list(scopes), []
+        if stock:
+            warehouse_id = request.query_params.get("warehouse_id")
+            if warehouse_id:
+                scope_list += [stock_scope(warehouse_id), STOCK_ALL_SCOPE]
+            else:
+                prefixes.append(f"{STOCK_SCOPE}:")
+        
+        extra = [request.url.path, request.url.query]
+        if daily:
+            extra.append(datetime.utcnow().date().isoformat())
+        versions = get_versions(db, scope_list, prefixes)
+        request.state.data_versions = versions  # Lets the reference cache skip its own version check
+        etag = compute_etag(versions, *extra)
+        
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise HTTPException(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag}
+            )
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+    
+    return Depends(check_etag)
@@ -1,10 +1,14 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.db_metrics import TimedAsyncAdaptedQueuePool, TimedQueuePool, instrument_engine
 
 engine = create_engine(
     settings.DATABASE_URL,
+    poolclass=TimedQueuePool,  # Pool checkout wait per request (db_metrics.py)
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20
@@ -12,6 +16,53 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read replica (DATABASE_READ_URL) for read-only endpoints, see app/core/read_routing.py;
+# without one, reads go to the primary engine
+read_engine = create_engine(
+    settings.DATABASE_READ_URL,
+    poolclass=TimedQueuePool,
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20
+) if settings.DATABASE_READ_URL else engine
+
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+def async_database_url(url: str):
+    """
+    DATABASE_URL for the asyncpg driver. libpq-only query options are translated
+    (sslmode -> ssl) or dropped, since asyncpg rejects unknown connect arguments.
+    """
+    url = make_url(url)
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+    if sslmode and "ssl" not in query:
+        query["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg", query=query)
+
+# Async engine for the async endpoints, so their queries don't block the event loop
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    poolclass=TimedAsyncAdaptedQueuePool,
+    pool_pre_ping=True,
+    pool_size=10,
+    max_overflow=20
+)
+
+instrument_engine(engine)
+if read_engine is not engine:
+    instrument_engine(read_engine)
+instrument_engine(async_engine.sync_engine)
+
+# expire_on_commit=False: attribute access after commit must not trigger implicit IO
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db():
@@ -21,3 +72,6 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,160 @@
+"""
+Per-request database metrics: statement count, total DB time, slowest statement and
+time spent waiting for a pooled connection.
+
+DbMetricsMiddleware samples DB_METRICS_SAMPLE_RATE of HTTP requests. For a sampled
+request it puts a RequestDbMetrics in a context variable, which follows the request into
+the threadpool (sync get_db sessions, SessionLocal in middleware) and into the greenlets
+that run async sessions, so the engine hooks below add to it from either kind of
+session. Unsampled requests leave the variable empty and the hooks return immediately.
+
+Results go out as a Server-Timing header (db, db-slowest, db-pool; visible in the
+browser's network panel) and as one JSON log line per request on the
+"stockmaster.db_metrics" logger.
+"""
+import logging
+import random
+import sys
+import time
+from contextvars import ContextVar
+from typing import Optional
+import orjson
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.core.config import settings
+
+SERVER_TIMING_HEADER = b"server-timing"
+_START_TIMES_KEY = "db_metrics_start_times"
+
+logger = logging.getLogger("stockmaster.db_metrics")
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+class RequestDbMetrics:
+    __slots__ = ("statements", "db_seconds", "slowest_seconds", "slowest_statement", "pool_wait_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self.pool_wait_seconds = 0.0
+
+    def record_statement(self, statement: str, seconds: float):
+        self.statements += 1
+        self.db_seconds += seconds
+        if seconds >= self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.statements} statements", '
+            f"db-slowest;dur={self.slowest_seconds * 1000:.2f}, "
+            f"db-pool;dur={self.pool_wait_seconds * 1000:.2f}"
+        )
+
+    def log_record(self, method: str, path: str, status_code: Optional[int], seconds: float) -> dict:
+        slowest = self.slowest_statement
+        if slowest is not None:
+            slowest = " ".join(slowest.split())[:settings.DB_METRICS_STATEMENT_CHARS]
+        return {
+            "event": "db_metrics",
+            "method": method,
+            "path": path,
+            "status": status_code,
+            "duration_ms": round(seconds * 1000, 2),
+            "db_statements": self.statements,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "db_slowest_ms": round(self.slowest_seconds * 1000, 2),
+            "db_slowest_statement": slowest,
+            "db_pool_wait_ms": round(self.pool_wait_seconds * 1000, 2),
+        }
+
+_current: ContextVar[Optional[RequestDbMetrics]] = ContextVar("db_metrics", default=None)
+
+def current_metrics() -> Optional[RequestDbMetrics]:
+    """Metrics of the request being handled, or None when it is not sampled"""
+    return _current.get()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault(_START_TIMES_KEY, []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    metrics = _current.get()
+    start_times = conn.info.get(_START_TIMES_KEY)
+    if metrics is not None and start_times:
+        metrics.record_statement(statement, time.perf_counter() - start_times.pop())
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute; count it here instead
+    connection = exception_context.connection
+    start_times = connection.info.get(_START_TIMES_KEY) if connection is not None else None
+    if start_times:
+        metrics = _current.get()
+        elapsed = time.perf_counter() - start_times.pop()
+        if metrics is not None:
+            metrics.record_statement(exception_context.statement or "", elapsed)
+
+def instrument_engine(sync_engine):
+    """Attach the statement hooks to an Engine (for an AsyncEngine, pass its .sync_engine)"""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+class _TimedCheckout:
+    """Times _do_get: waiting for a free connection, or opening a new one"""
+
+    def _do_get(self):
+        metrics = _current.get()
+        if metrics is None:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.pool_wait_seconds += time.perf_counter() - start
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+class DbMetricsMiddleware:
+    """Pure ASGI middleware, so the context variable is set in the task that runs the endpoint"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= settings.DB_METRICS_SAMPLE_RATE:
+            return await self.app(scope, receive, send)
+
+        metrics = RequestDbMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        status_code = None
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (SERVER_TIMING_HEADER, metrics.server_timing().encode())]
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            logger.info(orjson.dumps(
+                metrics.log_record(scope["method"], scope["path"], status_code, time.perf_counter() - started)
+            ).decode())
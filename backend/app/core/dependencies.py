@@ -1,5 +1,7 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.security import decode_access_token
@@ -37,3 +39,36 @@ def get_current_user(
     
     return user
 
+
+def get_default_user_id(db: Session) -> str:
+    """
+    TEMPORARY: responsible user for documents while authentication is disabled.
+    Uses the first user, creating a system user if the table is empty.
+    """
+    user_id = db.scalar(select(User.id).limit(1))
+    if user_id:
+        return user_id
+    
+    dummy_user = User(
+        email="system@example.com",
+        full_name="System User",
+        hashed_password="dummy"
+    )
+    db.add(dummy_user)
+    db.flush()
+    return dummy_user.id
+
+async def get_default_user_id_async(db: AsyncSession) -> str:
+    """get_default_user_id for the async endpoints"""
+    user_id = await db.scalar(select(User.id).limit(1))
+    if user_id:
+        return user_id
+    
+    dummy_user = User(
+        email="system@example.com",
+        full_name="System User",
+        hashed_password="dummy"
+    )
+    db.add(dummy_user)
+    await db.flush()
+    return dummy_user.id
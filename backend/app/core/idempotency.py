@@ -0,0 +1,241 @@
+"""
+Idempotency-Key support for create, validate and stock adjust endpoints.
+
+The first request with a key claims it with a single INSERT ... ON CONFLICT statement
+(no locks held while the endpoint runs), the endpoint's response is stored under the key,
+and retries with the same key get the stored response replayed without the endpoint - and
+so the stock ledger - being touched again. Expired keys are removed by a periodic sweeper.
+
+Keys are scoped per caller: the user of a valid bearer token, otherwise the client
+address. The same key from two callers never collides. Keyed bodies are hashed while
+they are spooled (to a temp file past IDEMPOTENCY_SPOOL_BYTES), so a keyed
+POST /products/bulk upload is not held in memory.
+"""
+import asyncio
+import hashlib
+import json
+import re
+from tempfile import SpooledTemporaryFile
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, or_, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.security import decode_access_token
+from app.models.idempotency_key import IdempotencyKey
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAY_CHUNK_BYTES = 64 * 1024
+SWEEP_BATCH_SIZE = 10000
+
+# (method, path) of the endpoints that honour Idempotency-Key
+IDEMPOTENT_ROUTES = [
+    ("POST", re.compile(r"^/api/v1/(receipts|deliveries|transfers|products|warehouses|locations)(/bulk)?/?$")),
+    ("POST", re.compile(r"^/api/v1/(receipts|deliveries|transfers)(/[^/]+)?/validate/?$")),
+    ("PUT", re.compile(r"^/api/v1/stock/[^/]+/[^/]+/?$")),
+]
+
+CLAIMED, REPLAY, IN_PROGRESS, MISMATCH = "claimed", "replay", "in_progress", "mismatch"
+
+def is_idempotent_route(method: str, path: str) -> bool:
+    return any(method == route_method and pattern.match(path) for route_method, pattern in IDEMPOTENT_ROUTES)
+
+def client_scope(scope) -> str:
+    """Namespace for a request's keys: the authenticated user, else the client address"""
+    authorization = dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        payload = decode_access_token(token)
+        if payload and payload.get("sub"):
+            return f"user:{payload['sub']}"
+    client = scope.get("client")
+    return f"client:{client[0] if client else 'unknown'}"
+
+def claim_key(key: str, fingerprint: str):
+    """
+    Claim `key` for this request. Returns (outcome, stored row or None).
+    A key can be taken over when it has expired or its owner never finished (lock timeout).
+    """
+    now = datetime.utcnow()
+    stale_before = now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT_SECONDS)
+    values = {
+        "key": key,
+        "fingerprint": fingerprint,
+        "status": "in_progress",
+        "response_status": None,
+        "response_content_type": None,
+        "response_body": None,
+        "created_at": now,
+        "expires_at": now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+    }
+    stmt = pg_insert(IdempotencyKey).values(**values).on_conflict_do_update(
+        index_elements=[IdempotencyKey.key],
+        set_={name: value for name, value in values.items() if name != "key"},
+        where=or_(
+            IdempotencyKey.expires_at < now,
+            and_(IdempotencyKey.status == "in_progress", IdempotencyKey.created_at < stale_before)
+        )
+    ).returning(IdempotencyKey.key)
+    
+    db = SessionLocal()
+    try:
+        claimed = db.execute(stmt).scalar()
+        db.commit()
+        if claimed:
+            return CLAIMED, None
+        stored = db.scalar(select(IdempotencyKey).where(IdempotencyKey.key == key))
+        if stored is None:
+            # Swept between the two statements - the caller may simply retry
+            return IN_PROGRESS, None
+        if stored.fingerprint != fingerprint:
+            return MISMATCH, stored
+        if stored.status != "completed":
+            return IN_PROGRESS, stored
+        return REPLAY, stored
+    finally:
+        db.close()
+
+def store_response(key: str, status_code: int, content_type: str, body: bytes):
+    db = SessionLocal()
+    try:
+        stored = db.get(IdempotencyKey, key)
+        if stored:
+            stored.status = "completed"
+            stored.response_status = status_code
+            stored.response_content_type = content_type
+            stored.response_body = body
+            db.commit()
+    finally:
+        db.close()
+
+def release_key(key: str):
+    """Forget a key whose request failed with a server error so a retry can run again"""
+    db = SessionLocal()
+    try:
+        db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key))
+        db.commit()
+    finally:
+        db.close()
+
+def sweep_expired_keys() -> int:
+    """Delete expired keys in batches. Returns the number of rows removed."""
+    db = SessionLocal()
+    removed = 0
+    try:
+        while True:
+            expired = select(IdempotencyKey.key).where(
+                IdempotencyKey.expires_at < datetime.utcnow()
+            ).limit(SWEEP_BATCH_SIZE).scalar_subquery()
+            result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.key.in_(expired)))
+            db.commit()
+            removed += result.rowcount
+            if result.rowcount < SWEEP_BATCH_SIZE:
+                return removed
+    finally:
+        db.close()
+
+async def run_sweeper():
+    """Background task: sweep expired keys every IDEMPOTENCY_SWEEP_INTERVAL_SECONDS"""
+    while True:
+        try:
+            await run_in_threadpool(sweep_expired_keys)
+        except Exception as e:
+            print(f"Idempotency sweeper error: {e}")
+        await asyncio.sleep(settings.IDEMPOTENCY_SWEEP_INTERVAL_SECONDS)
+
+async def _send_json(send, status_code: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class IdempotencyMiddleware:
+    """
+    Pure ASGI middleware (the request body must be read here and replayed to the app,
+    which BaseHTTPMiddleware does not support).
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not is_idempotent_route(scope["method"], scope["path"]):
+            return await self.app(scope, receive, send)
+        key = dict(scope["headers"]).get(IDEMPOTENCY_HEADER)
+        if not key:
+            return await self.app(scope, receive, send)
+        key = f"{client_scope(scope)}:{key.decode('latin-1')}"
+        
+        # Hash the body while spooling it, so it can be fingerprinted and then replayed to the endpoint
+        body = SpooledTemporaryFile(max_size=settings.IDEMPOTENCY_SPOOL_BYTES)
+        try:
+            digest = hashlib.sha256(b"\n".join([scope["method"].encode(), scope["path"].encode(), b""]))
+            size = 0
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                if size > settings.PRODUCT_IMPORT_MAX_BYTES:  # The largest body any keyed route accepts
+                    limit = settings.PRODUCT_IMPORT_MAX_BYTES
+                    return await _send_json(send, 413, f"Request bodies are limited to {limit} bytes")
+                digest.update(chunk)
+                body.write(chunk)
+                if not message.get("more_body"):
+                    break
+            body.seek(0)
+            await self._handle(scope, receive, send, key, digest.hexdigest(), body, size)
+        finally:
+            body.close()
+    
+    async def _handle(self, scope, receive, send, key: str, fingerprint: str, body, size: int):
+        outcome, stored = await run_in_threadpool(claim_key, key, fingerprint)
+        if outcome == MISMATCH:
+            return await _send_json(send, 422, "Idempotency-Key was already used with a different request")
+        if outcome == IN_PROGRESS:
+            return await _send_json(send, 409, "A request with this Idempotency-Key is still in progress")
+        if outcome == REPLAY:
+            headers = [(b"content-length", str(len(stored.response_body or b"")).encode()), (b"idempotent-replayed", b"true")]
+            if stored.response_content_type:
+                headers.append((b"content-type", stored.response_content_type.encode()))
+            await send({"type": "http.response.start", "status": stored.response_status, "headers": headers})
+            await send({"type": "http.response.body", "body": stored.response_body or b""})
+            return
+        
+        body_sent = False
+        
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                chunk = body.read(REPLAY_CHUNK_BYTES)
+                body_sent = body.tell() >= size
+                return {"type": "http.request", "body": chunk, "more_body": not body_sent}
+            return await receive()
+        
+        response = {"status": 500, "content_type": None, "body": []}
+        
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["content_type"] = dict(message.get("headers", [])).get(b"content-type", b"").decode() or None
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+        
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await run_in_threadpool(release_key, key)
+            raise
+        
+        if response["status"] >= 500:
+            await run_in_threadpool(release_key, key)
+        else:
+            await run_in_threadpool(
+                store_response, key, response["status"], response["content_type"], b"".join(response["body"])
+            )
@@ -0,0 +1,194 @@
+"""
+In-memory product search index for /products/search (autocomplete).
+
+Fed by the reference cache: rebuilt whenever the cache does a full load of products
+(startup, hourly backstop) and updated for every product row it re-reads or drops as
+deleted, plus directly by the create/update endpoints in this worker. Matching is case-insensitive on SKU and
+name. Results are ranked by tier, then by name length and name within the last tier:
+
+    0. SKU equals the query
+    1. SKU starts with the query (in SKU order)
+    2. A word of the name starts with the query (in word order)
+    3. SKU or name contains the query (queries of 3+ characters only)
+
+Prefix tiers are served from sorted key lists with bisect. For the substring tier, a
+rebuild numbers products in rank order, so the postings of the query's rarest trigram
+are already ranked and the scan stops after `limit` verified matches. Products added
+or renamed since the last rebuild are checked separately and merged in. Postings are
+not cleaned up when a product is renamed; stale entries fail verification.
+"""
+import bisect
+import re
+import threading
+from array import array
+from heapq import nsmallest
+from typing import Iterable, List
+from app.core.reference_cache import reference_cache
+
+SEARCH_LIMIT = 20
+# Incremental loads larger than this (bulk imports) rebuild the index instead: each
+# upsert inserts into the sorted key lists, so many of them cost more than one rebuild
+REBUILD_THRESHOLD = 5000
+_WORD_SPLIT = re.compile(r"[^\w]+")
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _words(name: str) -> set:
+    return {word for word in _WORD_SPLIT.split(name) if word}
+
+class ProductSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.doc_of = {}  # Product id -> doc number
+        self.product_ids = []  # Doc number -> product id
+        self.names = []  # Doc number -> lowercased name
+        self.skus = []  # Doc number -> lowercased SKU
+        self.sort_keys = []  # Doc number -> (len(name), name), order within the substring tier
+        self.postings = {}  # Trigram -> docs whose SKU or name contained it, ascending
+        self.unranked = set()  # Docs added or renamed since the last rebuild (out of rank order)
+        self.sku_keys, self.sku_docs = [], array("I")  # Sorted SKUs and their docs
+        self.word_keys, self.word_docs = [], array("I")  # Sorted name words and their docs
+
+    def __len__(self):
+        return len(self.doc_of)
+
+    def rebuild(self, rows: Iterable):
+        """Replace the index with `rows` (anything with id, name and sku)"""
+        with self._lock:
+            self._reset()
+            sku_entries, word_entries = [], []
+            ranked = sorted(
+                ((row.id, row.name.lower(), row.sku.lower()) for row in rows),
+                key=lambda entry: (len(entry[1]), entry[1])
+            )
+            for product_id, name, sku in ranked:
+                doc = self._new_doc(product_id, name, sku)
+                sku_entries.append((self.skus[doc], doc))
+                word_entries.extend((word, doc) for word in _words(self.names[doc]))
+            sku_entries.sort()
+            word_entries.sort()
+            self.sku_keys = [key for key, _ in sku_entries]
+            self.sku_docs = array("I", (doc for _, doc in sku_entries))
+            self.word_keys = [key for key, _ in word_entries]
+            self.word_docs = array("I", (doc for _, doc in word_entries))
+
+    def upsert(self, rows: Iterable):
+        """Add new products and re-index changed ones"""
+        with self._lock:
+            for row in rows:
+                doc = self.doc_of.get(row.id)
+                name, sku = row.name.lower(), row.sku.lower()
+                if doc is None:
+                    doc = self._new_doc(row.id, name, sku)
+                else:
+                    if name == self.names[doc] and sku == self.skus[doc]:
+                        continue
+                    self._remove_key(self.sku_keys, self.sku_docs, self.skus[doc], doc)
+                    for word in _words(self.names[doc]):
+                        self._remove_key(self.word_keys, self.word_docs, word, doc)
+                    self._set_text(doc, name, sku)
+                self.unranked.add(doc)
+                self._insert_key(self.sku_keys, self.sku_docs, self.skus[doc], doc)
+                for word in _words(self.names[doc]):
+                    self._insert_key(self.word_keys, self.word_docs, word, doc)
+
+    def remove(self, product_ids: Iterable[str]):
+        """Take deleted products out of the index (their postings fail verification)"""
+        with self._lock:
+            for product_id in product_ids:
+                doc = self.doc_of.pop(product_id, None)
+                if doc is None:
+                    continue
+                self._remove_key(self.sku_keys, self.sku_docs, self.skus[doc], doc)
+                for word in _words(self.names[doc]):
+                    self._remove_key(self.word_keys, self.word_docs, word, doc)
+                self.names[doc] = self.skus[doc] = ""
+                self.unranked.discard(doc)
+
+    def apply(self, rows: list, full: bool):
+        """Reference cache listener for the products scope"""
+        if full:
+            self.rebuild(rows)
+        elif len(rows) > REBUILD_THRESHOLD:
+            self.rebuild(reference_cache.values("products"))
+        else:
+            self.upsert(rows)
+
+    def _new_doc(self, product_id: str, name: str, sku: str) -> int:
+        """Append a doc; name and sku are lowercased already"""
+        doc = len(self.product_ids)
+        self.doc_of[product_id] = doc
+        self.product_ids.append(product_id)
+        self.names.append(None)
+        self.skus.append(None)
+        self.sort_keys.append(None)
+        self._set_text(doc, name, sku)
+        return doc
+
+    def _set_text(self, doc: int, name: str, sku: str):
+        self.names[doc] = name
+        self.skus[doc] = sku
+        self.sort_keys[doc] = (len(name), name)
+        for gram in _trigrams(name) | _trigrams(sku):
+            posting = self.postings.get(gram)
+            if posting is None:
+                posting = self.postings[gram] = array("I")
+            posting.append(doc)
+
+    @staticmethod
+    def _insert_key(keys: list, docs: array, key: str, doc: int):
+        position = bisect.bisect_right(keys, key)
+        keys.insert(position, key)
+        docs.insert(position, doc)
+
+    @staticmethod
+    def _remove_key(keys: list, docs: array, key: str, doc: int):
+        position = bisect.bisect_left(keys, key)
+        while position < len(keys) and keys[position] == key:
+            if docs[position] == doc:
+                del keys[position]
+                del docs[position]
+                return
+            position += 1
+
+    def _take_prefixed(self, keys: list, docs: array, q: str, found: dict, limit: int):
+        position = bisect.bisect_left(keys, q)
+        while len(found) < limit and position < len(keys) and keys[position].startswith(q):
+            found.setdefault(docs[position])
+            position += 1
+
+    def search(self, q: str, limit: int = SEARCH_LIMIT) -> List[str]:
+        """Ids of the best matching products, best first"""
+        q = q.strip().lower()
+        if not q:
+            return []
+        with self._lock:
+            found = {}  # Ordered set of docs
+            self._take_prefixed(self.sku_keys, self.sku_docs, q, found, limit)
+            self._take_prefixed(self.word_keys, self.word_docs, q, found, limit)
+            if len(found) < limit and len(q) >= 3:
+                found.update(dict.fromkeys(self._substring_matches(q, found, limit - len(found))))
+            return [self.product_ids[doc] for doc in found]
+
+    def _substring_matches(self, q: str, found: dict, limit: int) -> list:
+        postings = [self.postings.get(gram) for gram in _trigrams(q)]
+        if not all(postings):
+            return []
+        names, skus, unranked = self.names, self.skus, self.unranked
+        matches = []
+        for doc in min(postings, key=len):
+            if doc not in found and doc not in unranked and (q in names[doc] or q in skus[doc]):
+                matches.append(doc)
+                if len(matches) == limit:
+                    break
+        if unranked:
+            matches += [doc for doc in unranked if doc not in found and (q in names[doc] or q in skus[doc])]
+            matches = nsmallest(limit, matches, key=self.sort_keys.__getitem__)
+        return matches
+
+product_index = ProductSearchIndex()
+reference_cache.subscribe("products", product_index.apply, on_remove=product_index.remove)
@@ -0,0 +1,68 @@
+"""
+Read-replica routing with read-your-writes.
+
+Read-only endpoints take their session from get_read_db, which uses the replica in
+DATABASE_READ_URL when one is configured. A client that has just written is sent to
+the primary instead, so it does not read its own change back from a lagging replica.
+After every successful write request, ReadAfterWriteMiddleware sets a cookie holding the
+time until which that client's reads stay on the primary
+(READ_AFTER_WRITE_PRIMARY_SECONDS). The cookie is kept by the client, so this works
+across workers and hosts. Clients that do not keep cookies, such as integration scripts,
+can send `X-Read-Primary: true` instead.
+"""
+import re
+import time
+from fastapi import Request
+from app.core.config import settings
+from app.core.database import ReadSessionLocal, SessionLocal, engine, read_engine
+
+PRIMARY_UNTIL_COOKIE = "db_primary_until"
+READ_PRIMARY_HEADER = "x-read-primary"
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# POST endpoints that only read, so they don't pin the client to the primary
+READ_ONLY_ROUTES = re.compile(r"^/api/v1/(batch|products/lookup|stock/lookup)/?$")
+
+def replica_configured() -> bool:
+    return read_engine is not engine
+
+def reads_from_primary(request: Request) -> bool:
+    """True when this request must see the primary: no replica, or the client wrote recently"""
+    if not replica_configured() or request.headers.get(READ_PRIMARY_HEADER, "").lower() == "true":
+        return True
+    try:
+        return float(request.cookies.get(PRIMARY_UNTIL_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def get_read_db(request: Request):
+    """Route dependency for read-only endpoints: a replica session unless reads_from_primary()"""
+    db = SessionLocal() if reads_from_primary(request) else ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _primary_cookie() -> bytes:
+    seconds = settings.READ_AFTER_WRITE_PRIMARY_SECONDS
+    until = int(time.time()) + seconds
+    return f"{PRIMARY_UNTIL_COOKIE}={until}; Max-Age={seconds}; Path=/; HttpOnly; SameSite=Lax".encode()
+
+class ReadAfterWriteMiddleware:
+    """Pure ASGI middleware: marks clients whose write succeeded (status < 400) as primary readers"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http" or not replica_configured()
+            or scope["method"] in SAFE_METHODS or READ_ONLY_ROUTES.match(scope["path"])
+        ):
+            return await self.app(scope, receive, send)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", _primary_cookie())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
@@ -0,0 +1,210 @@
+"""
+Process-wide cache of reference data: warehouses, locations, products and users.
+
+Read endpoints resolve display names (warehouse.name, location.name, product.name/sku,
+user.full_name) from memory instead of joining or lazy-loading them. Each table is
+loaded in bulk once and then kept current through its data version (data_version.py):
+when a version has moved, only rows with updated_at inside the last
+REFERENCE_CACHE_OVERLAP_SECONDS of the previous load are fetched again. The overlap
+covers transactions that stamped updated_at before a load but committed after it.
+
+Versions are re-checked at most every REFERENCE_CACHE_CHECK_INTERVAL_SECONDS, right
+after a commit in this process touched one of the tables, and whenever conditional_get
+already read them for the request (so a response always matches its ETag). Ids that are
+still unknown (rows created by another worker a moment ago) are fetched on demand, and
+everything is reloaded every REFERENCE_CACHE_FULL_RELOAD_SECONDS as a backstop.
+
+Rows deleted through a session in this process are dropped when it commits. An
+incremental load cannot see rows deleted elsewhere, so it also counts the table and
+falls back to a full load when the cache holds more rows than the table does.
+"""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+from fastapi import Depends, Request
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db
+from app.core.data_version import COMMITTED_SCOPES_KEY
+from app.models.data_version import DataVersion
+from app.models.product import Product
+from app.models.user import User
+from app.models.warehouse import Location, Warehouse
+
+# Data version scope -> (model, cached columns besides id)
+REFERENCE_TABLES = {
+    "warehouses": (Warehouse, ("name", "short_code")),
+    "locations": (Location, ("name", "short_code", "warehouse_id")),
+    "products": (Product, ("name", "sku", "unit_of_measure", "unit_cost", "category_id")),
+    "users": (User, ("full_name", "email")),
+}
+
+# Session.info key: (scope, id) of reference rows deleted by the transaction being committed
+_DELETED_ROWS_KEY = "reference_cache_deleted_rows"
+
+# Tags cache queries so statement counters can tell them from the endpoint's own
+CACHE_EXECUTION_OPTIONS = {"reference_cache": True}
+
+class ReferenceCache:
+    def __init__(self):
+        self.rows = {scope: {} for scope in REFERENCE_TABLES}
+        self.versions = {}  # Data version each scope was last loaded at
+        self.loaded_at = {}  # utcnow() when each scope's last load started (updated_at is app-stamped too)
+        self.full_loaded_at = {}  # time.monotonic() of each scope's last full load
+        self.checked_at = None
+        self.stale = set()
+        self.listeners = defaultdict(list)
+        self.removal_listeners = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, scope: str, listener, on_remove=None):
+        """
+        Call listener(rows, full) with the rows of every load of `scope` (full: all rows),
+        and on_remove(ids) with the ids of rows dropped as deleted outside a full load
+        """
+        self.listeners[scope].append(listener)
+        if on_remove is not None:
+            self.removal_listeners[scope].append(on_remove)
+
+    def _notify(self, scope: str, rows: list, full: bool):
+        for listener in self.listeners[scope]:
+            listener(rows, full)
+
+    def _query(self, scope: str):
+        model, columns = REFERENCE_TABLES[scope]
+        return select(model.id, *[getattr(model, column) for column in columns]).execution_options(
+            **CACHE_EXECUTION_OPTIONS
+        )
+
+    def _load(self, db: Session, scope: str, version: int):
+        model, _ = REFERENCE_TABLES[scope]
+        started_at = datetime.utcnow()
+        full = (
+            scope not in self.loaded_at
+            or time.monotonic() - self.full_loaded_at[scope] >= settings.REFERENCE_CACHE_FULL_RELOAD_SECONDS
+        )
+        if not full:
+            since = self.loaded_at[scope] - timedelta(seconds=settings.REFERENCE_CACHE_OVERLAP_SECONDS)
+            rows = db.execute(self._query(scope).where(model.updated_at >= since)).all()
+            self.rows[scope].update((row.id, row) for row in rows)
+            # Some cached row no longer exists (deleted by another worker or outside the app)
+            full = len(self.rows[scope]) > db.execute(
+                select(func.count()).select_from(model).execution_options(**CACHE_EXECUTION_OPTIONS)
+            ).scalar_one()
+        if full:
+            rows = db.execute(self._query(scope)).all()
+            self.rows[scope] = {row.id: row for row in rows}
+            self.full_loaded_at[scope] = time.monotonic()
+        self._notify(scope, rows, full)
+        self.loaded_at[scope] = started_at
+        self.versions[scope] = version
+
+    def _needs_load(self, scope: str, version: int) -> bool:
+        return (
+            scope not in self.loaded_at
+            or self.versions.get(scope) != version
+            or time.monotonic() - self.full_loaded_at[scope] >= settings.REFERENCE_CACHE_FULL_RELOAD_SECONDS
+        )
+
+    def refresh(self, db: Session, known_versions: Optional[dict] = None):
+        """
+        Bring every scope up to date. `known_versions` (from conditional_get) are used as
+        is; otherwise versions are read when the check interval has passed or a local
+        commit marked a scope stale.
+        """
+        versions = {scope: version for scope, version in (known_versions or {}).items() if scope in REFERENCE_TABLES}
+        due = (
+            self.checked_at is None or self.stale
+            or time.monotonic() - self.checked_at >= settings.REFERENCE_CACHE_CHECK_INTERVAL_SECONDS
+        )
+        if not due and not any(self._needs_load(scope, version) for scope, version in versions.items()):
+            return
+        with self._lock:
+            if due:
+                self.stale.clear()
+                self.checked_at = time.monotonic()
+                read = dict(db.execute(
+                    select(DataVersion.scope, DataVersion.version)
+                    .where(DataVersion.scope.in_(REFERENCE_TABLES))
+                    .execution_options(**CACHE_EXECUTION_OPTIONS)
+                ).all())
+                versions = {scope: read.get(scope, 0) for scope in REFERENCE_TABLES}
+            for scope, version in versions.items():
+                if self._needs_load(scope, version):
+                    self._load(db, scope, version)
+
+    def mark_stale(self, scopes: Iterable[str]):
+        self.stale |= set(scopes) & REFERENCE_TABLES.keys()
+
+    def resolve(self, db: Session, scope: str, ids: Iterable[str]):
+        """Fetch ids not in the cache yet (created since the last refresh) in one query"""
+        model, _ = REFERENCE_TABLES[scope]
+        missing = {id_ for id_ in ids if id_ is not None and id_ not in self.rows[scope]}
+        if not missing:
+            return
+        with self._lock:
+            loaded = db.execute(self._query(scope).where(model.id.in_(missing))).all()
+            self.rows[scope].update((row.id, row) for row in loaded)
+            self._notify(scope, loaded, False)
+
+    def remove(self, scope: str, ids: Iterable[str]):
+        """Drop deleted rows"""
+        with self._lock:
+            removed = [id_ for id_ in ids if self.rows[scope].pop(id_, None) is not None]
+            if removed:
+                for on_remove in self.removal_listeners[scope]:
+                    on_remove(removed)
+
+    def get(self, scope: str, id_: Optional[str]):
+        return self.rows[scope].get(id_)
+
+    def lookup(self, scope: str, id_: Optional[str], attribute: str = "name", default=None):
+        row = self.rows[scope].get(id_)
+        return getattr(row, attribute) if row is not None else default
+
+    def values(self, scope: str) -> list:
+        return list(self.rows[scope].values())
+
+reference_cache = ReferenceCache()
+
+_SCOPE_OF_MODEL = {model: scope for scope, (model, _) in REFERENCE_TABLES.items()}
+
+@event.listens_for(Session, "after_flush")
+def _collect_deleted_rows(session, flush_context):
+    for obj in session.deleted:
+        scope = _SCOPE_OF_MODEL.get(type(obj))
+        if scope:
+            session.info.setdefault(_DELETED_ROWS_KEY, set()).add((scope, obj.id))
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed_scopes_stale(session):
+    scopes = session.info.pop(COMMITTED_SCOPES_KEY, None)
+    if scopes:
+        reference_cache.mark_stale(scopes)
+    deleted = session.info.pop(_DELETED_ROWS_KEY, None)
+    if deleted:
+        by_scope = defaultdict(list)
+        for scope, id_ in deleted:
+            by_scope[scope].append(id_)
+        for scope, ids in by_scope.items():
+            reference_cache.remove(scope, ids)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_deleted_rows(session):
+    session.info.pop(_DELETED_ROWS_KEY, None)
+
+def get_reference_data(request: Request, db: Session = Depends(get_db)) -> ReferenceCache:
+    """Route dependency: the reference cache, current as of this request's data versions"""
+    reference_cache.refresh(db, getattr(request.state, "data_versions", None))
+    return reference_cache
+
+def warm_reference_cache():
+    """Load every table up front so the first requests don't pay for it"""
+    db = SessionLocal()
+    try:
+        reference_cache.refresh(db)
+    finally:
+        db.close()
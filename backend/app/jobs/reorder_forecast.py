@@ -0,0 +1,227 @@
+"""
+Nightly demand forecast and reorder point computation.
+
+Demand is taken from DELIVERY rows of the stock ledger, bucketed per day for every
+(product, location) pair. Products with delivery history are split into contiguous
+product id ranges, and each range is handled end to end by one worker process: it
+loads that range's (series x days) demand matrix with one grouped query, computes the
+forecasts with vectorized numpy operations and replaces the range's rows in the
+reorder_points table (where the low stock logic reads them) in its own transaction.
+Nothing but the range bounds and a row count crosses the process boundary.
+
+Run with:
+    python -m app.jobs.reorder_forecast [--workers N] [--method ema|sma]
+"""
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Date, and_, cast, delete, func, insert, select, true
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+import app.core.data_version  # noqa: F401 - registers the data version write listeners
+from app.models.stock_ledger import StockLedger, TransactionType
+from app.models.reorder_point import ReorderPoint
+
+INSERT_BATCH_SIZE = 10000
+
+# (lower, upper] bounds on product_id; None leaves that side open
+ProductRange = Tuple[Optional[str], Optional[str]]
+
+def _in_range(column, product_range: ProductRange):
+    lower, upper = product_range
+    conditions = []
+    if lower is not None:
+        conditions.append(column > lower)
+    if upper is not None:
+        conditions.append(column <= upper)
+    return and_(true(), *conditions)
+
+def _delivery_filter(start: datetime, days: int):
+    return and_(
+        StockLedger.transaction_type == TransactionType.DELIVERY,
+        StockLedger.created_at >= start,
+        StockLedger.created_at < start + timedelta(days=days)
+    )
+
+def product_ranges(db: Session, start: datetime, days: int, count: int) -> List[ProductRange]:
+    """
+    Split the products with delivery history into about `count` ranges of similar size.
+    The first and last ranges are open-ended, so together they cover every product id
+    and a range's delete also clears reorder points of products without history.
+    """
+    products = select(StockLedger.product_id).where(_delivery_filter(start, days)).distinct().subquery()
+    buckets = select(
+        products.c.product_id,
+        func.ntile(count).over(order_by=products.c.product_id).label("bucket")
+    ).subquery()
+    upper_bounds = db.scalars(
+        select(func.max(buckets.c.product_id)).group_by(buckets.c.bucket).order_by(func.max(buckets.c.product_id))
+    ).all()
+    bounds = [None, *upper_bounds[:-1], None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def load_demand_matrix(db: Session, start: datetime, days: int, product_range: ProductRange = (None, None)):
+    """
+    Load daily delivered quantities since `start` as a dense matrix.
+    Returns (keys, matrix) where keys[i] is (product_id, location_id, warehouse_id)
+    and matrix[i, d] is the demand of that series on day d.
+    One row comes back per series, with its days and demands as arrays, so Python only
+    loops over series and each row is placed into the matrix in one numpy assignment.
+    """
+    day = (cast(StockLedger.created_at, Date) - start.date()).label("day")
+    daily = select(
+        StockLedger.product_id,
+        StockLedger.location_id,
+        StockLedger.warehouse_id,
+        day,
+        func.sum(-StockLedger.quantity).label("demand")
+    ).where(
+        _delivery_filter(start, days),
+        _in_range(StockLedger.product_id, product_range)
+    ).group_by(
+        StockLedger.product_id,
+        StockLedger.location_id,
+        StockLedger.warehouse_id,
+        day
+    ).subquery()
+    demand_query = select(
+        daily.c.product_id,
+        daily.c.location_id,
+        daily.c.warehouse_id,
+        func.array_agg(daily.c.day).label("days"),
+        func.array_agg(daily.c.demand).label("demand")
+    ).group_by(
+        daily.c.product_id,
+        daily.c.location_id,
+        daily.c.warehouse_id
+    ).order_by(
+        daily.c.product_id,
+        daily.c.location_id
+    )
+    
+    series = db.execute(demand_query).all()
+    keys = [(row.product_id, row.location_id, row.warehouse_id) for row in series]
+    matrix = np.zeros((len(keys), days), dtype=np.float64)
+    for i, row in enumerate(series):
+        matrix[i, row.days] = np.asarray(row.demand, dtype=np.float64)
+    return keys, matrix
+
+def compute_forecasts(demand: np.ndarray, method: str, sma_window: int, ema_alpha: float,
+                      lead_time_days: float, service_level_z: float):
+    """
+    Vectorized forecast for every row of a (series x days) demand matrix.
+    Returns (forecast, demand_std, safety_stock, reorder_point) arrays.
+    """
+    days = demand.shape[1]
+    
+    if method == "sma":
+        window = min(max(sma_window, 1), days)
+        forecast = demand[:, -window:].mean(axis=1)
+    else:
+        # Exponential smoothing unrolled into a single weighted sum:
+        # s_n = sum_t alpha * (1 - alpha)^(n - 1 - t) * x_t, seeded with x_0
+        exponents = np.arange(days - 1, -1, -1, dtype=np.float64)
+        weights = ema_alpha * np.power(1 - ema_alpha, exponents)
+        weights[0] = np.power(1 - ema_alpha, days - 1)
+        forecast = demand @ weights
+    
+    demand_std = demand.std(axis=1, ddof=1) if days > 1 else np.zeros(demand.shape[0])
+    safety_stock = service_level_z * demand_std * math.sqrt(lead_time_days)
+    reorder_point = forecast * lead_time_days + safety_stock
+    return forecast, demand_std, safety_stock, reorder_point
+
+def forecast_range(db: Session, product_range: ProductRange, start: datetime, method: str) -> int:
+    """Recompute and replace the reorder points of one product range in one transaction. Returns the row count."""
+    history_days = settings.FORECAST_HISTORY_DAYS
+    lead_time_days = settings.REORDER_LEAD_TIME_DAYS
+    keys, matrix = load_demand_matrix(db, start, history_days, product_range)
+    forecast, demand_std, safety_stock, reorder_point = compute_forecasts(
+        matrix, method, settings.FORECAST_SMA_WINDOW_DAYS, settings.FORECAST_EMA_ALPHA,
+        lead_time_days, settings.REORDER_SERVICE_LEVEL_Z
+    )
+    
+    computed_at = datetime.utcnow()
+    rows = [
+        {
+            "product_id": product_id,
+            "warehouse_id": warehouse_id,
+            "location_id": location_id,
+            "method": method,
+            "history_days": history_days,
+            "forecast_daily_demand": float(forecast[i]),
+            "demand_std": float(demand_std[i]),
+            "lead_time_days": lead_time_days,
+            "safety_stock": float(safety_stock[i]),
+            "reorder_point": float(reorder_point[i]),
+            "computed_at": computed_at,
+        }
+        for i, (product_id, location_id, warehouse_id) in enumerate(keys)
+    ]
+    
+    # Replace the range atomically so readers never see a product with a partial set
+    db.execute(delete(ReorderPoint).where(_in_range(ReorderPoint.product_id, product_range)))
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.execute(insert(ReorderPoint), rows[i:i + INSERT_BATCH_SIZE])
+    db.commit()
+    return len(rows)
+
+def _init_worker():
+    # Connections pooled before the fork belong to the parent; open fresh ones here
+    engine.dispose(close=False)
+
+def _forecast_range_task(args) -> int:
+    """Worker entry point - must be module level so it can be pickled"""
+    product_range, start, method = args
+    db = SessionLocal()
+    try:
+        return forecast_range(db, product_range, start, method)
+    finally:
+        db.close()
+
+def run_forecast(db: Session, workers: int = None, method: str = None) -> int:
+    """Compute reorder points for every (product, location) with delivery history. Returns the row count."""
+    method = method or settings.FORECAST_METHOD
+    workers = workers or settings.FORECAST_WORKERS or os.cpu_count() or 1
+    history_days = settings.FORECAST_HISTORY_DAYS
+    
+    today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = today_start - timedelta(days=history_days)
+    
+    # At least one range per worker, and no more than FORECAST_CHUNK_SIZE products per range
+    product_count = db.scalar(
+        select(func.count(func.distinct(StockLedger.product_id))).where(_delivery_filter(start, history_days))
+    )
+    chunk_size = max(settings.FORECAST_CHUNK_SIZE, 1)
+    ranges = product_ranges(db, start, history_days, max(workers, math.ceil(product_count / chunk_size), 1))
+    db.commit()
+    tasks = [(product_range, start, method) for product_range in ranges]
+    
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_init_worker) as executor:
+            return sum(executor.map(_forecast_range_task, tasks))
+    return sum(forecast_range(db, product_range, start, method) for product_range in ranges)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute demand forecasts and reorder points")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per core)")
+    parser.add_argument("--method", choices=["ema", "sma"], default=None, help="Forecast method")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        count = run_forecast(db, workers=args.workers, method=args.method)
+        print(f"Computed {count} reorder points in {time.perf_counter() - started:.2f}s")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,42 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 from app.core.config import settings
+from app.core.db_metrics import DbMetricsMiddleware
+from app.core.idempotency import IdempotencyMiddleware, run_sweeper
+from app.core.read_routing import ReadAfterWriteMiddleware
+from app.core.reference_cache import warm_reference_cache
 from app.api.v1.api import api_router
 from app.websocket.handlers import sio_app
+from app.websocket.outbox import coalescer, run_outbox_relay, run_outbox_sweeper
 
 app = FastAPI(
     title="StockMaster IMS API",
     description="Inventory Management System API",
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse
 )
 
-# CORS middleware
+# Idempotency-Key replay for create / validate / stock adjust endpoints
+app.add_middleware(IdempotencyMiddleware)
+
+# Sends a client's reads to the primary for a while after it writes (only with DATABASE_READ_URL)
+app.add_middleware(ReadAfterWriteMiddleware)
+
+# Statement count / DB time / pool wait per sampled request (outside idempotency to include its queries)
+app.add_middleware(DbMetricsMiddleware)
+
+# CORS middleware (added last so it is outermost and also wraps replayed responses)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Idempotent-Replayed", "X-Next-Cursor", "X-Total-Count", "X-Total-Count-Type", "Server-Timing"],
 )
 
 # Include API routes
@@ -27,6 +45,24 @@ app.include_router(api_router, prefix="/api/v1")
 # Mount Socket.IO app
 app.mount("/socket.io", sio_app)
 
+background_tasks = set()
+
+@app.on_event("startup")
+async def start_background_tasks():
+    background_tasks.add(asyncio.create_task(run_sweeper()))
+    background_tasks.add(asyncio.create_task(run_outbox_relay()))
+    background_tasks.add(asyncio.create_task(run_outbox_sweeper()))
+    try:
+        await asyncio.to_thread(warm_reference_cache)
+    except Exception as e:
+        # Not fatal: the cache loads on first use instead
+        print(f"Reference cache warm-up error: {e}")
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    for task in background_tasks:
+        task.cancel()
+
 @app.get("/")
 def root():
     return {
@@ -39,6 +75,11 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics/realtime")
+def realtime_metrics():
+    """stock:updated coalescing in this worker: updates in versus frames out"""
+    return coalescer.get_metrics()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
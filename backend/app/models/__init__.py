@@ -5,6 +5,12 @@ from app.models.receipt import Receipt, ReceiptItem
 from app.models.delivery import Delivery, DeliveryItem
 from app.models.transfer import Transfer, TransferItem
 from app.models.stock_ledger import StockLedger
+from app.models.reorder_point import ReorderPoint
+from app.models.data_version import DataVersion
+from app.models.reference_counter import ReferenceCounter
+from app.models.idempotency_key import IdempotencyKey
+from app.models.event_outbox import EventOutbox
+from app.models.product_import import ProductImport
 
 __all__ = [
     "User",
@@ -19,5 +25,11 @@ __all__ = [
     "Transfer",
     "TransferItem",
     "StockLedger",
+    "ReorderPoint",
+    "DataVersion",
+    "ReferenceCounter",
+    "IdempotencyKey",
+    "EventOutbox",
+    "ProductImport",
 ]
 
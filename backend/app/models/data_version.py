@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, BigInteger, DateTime
+from datetime import datetime
+from app.core.database import Base
+
+class DataVersion(Base):
+    """Monotonic version per data scope (table, or table:warehouse_id), bumped on every write"""
+    __tablename__ = "data_versions"
+    
+    scope = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
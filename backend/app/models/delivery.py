@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -11,6 +11,8 @@ class DeliveryStatus(str, enum.Enum):
     READY = "Ready"
     DONE = "Done"
 
+PENDING_DELIVERY_STATUSES = (DeliveryStatus.DRAFT, DeliveryStatus.WAITING, DeliveryStatus.READY)
+
 class Delivery(Base):
     __tablename__ = "deliveries"
     
@@ -48,3 +50,24 @@ class DeliveryItem(Base):
     delivery = relationship("Delivery", back_populates="items")
     product = relationship("Product", back_populates="delivery_items")
 
+# Partial indexes backing the pending-operations feed (keyset ordered by schedule_date, id)
+Index(
+    "ix_deliveries_pending_schedule",
+    Delivery.schedule_date,
+    Delivery.id,
+    postgresql_where=Delivery.status.in_(PENDING_DELIVERY_STATUSES)
+)
+Index(
+    "ix_deliveries_pending_warehouse_schedule",
+    Delivery.warehouse_id,
+    Delivery.schedule_date,
+    Delivery.id,
+    postgresql_where=Delivery.status.in_(PENDING_DELIVERY_STATUSES)
+)
+
+# Keyset pagination of the list endpoint, newest first by (created_at, id)
+Index(
+    "ix_deliveries_created_id",
+    Delivery.created_at,
+    Delivery.id
+)
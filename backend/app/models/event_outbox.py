@@ -0,0 +1,17 @@
+from sqlalchemy import Column, String, BigInteger, DateTime, JSON, Index, text
+from datetime import datetime
+from app.core.database import Base
+
+class EventOutbox(Base):
+    """Socket.IO frame written in the same transaction as the change it announces"""
+    __tablename__ = "event_outbox"
+    
+    # Relay order; event_outbox_next_id() assigns the transaction's xid before the id (see outbox.py)
+    id = Column(BigInteger, primary_key=True, autoincrement=True, server_default=text("event_outbox_next_id()"))
+    event = Column(String, nullable=False)
+    room = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+# Catch-up reads: a room's events after a given seq
+Index("ix_event_outbox_room_id", EventOutbox.room, EventOutbox.id)
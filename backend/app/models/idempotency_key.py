@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Integer, LargeBinary, DateTime
+from datetime import datetime
+from app.core.database import Base
+
+class IdempotencyKey(Base):
+    """Stored response for a client-supplied Idempotency-Key, replayed on retries"""
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)  # Hash of method, path and body
+    status = Column(String, nullable=False, default="in_progress")  # "in_progress" or "completed"
+    response_status = Column(Integer, nullable=True)
+    response_content_type = Column(String, nullable=True)
+    response_body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -34,3 +34,9 @@ class Product(Base):
     delivery_items = relationship("DeliveryItem", back_populates="product")
     transfer_items = relationship("TransferItem", back_populates="product")
 
+# Keyset pagination of the product list, ordered by (name, id)
+Index(
+    "ix_products_name_id",
+    Product.name,
+    Product.id
+)
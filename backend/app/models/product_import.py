@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, Float, Text, DateTime
+from datetime import datetime
+import uuid
+from app.core.database import Base
+
+class ProductImport(Base):
+    """Outcome of a POST /products/bulk catalog upload, with its downloadable error report"""
+    __tablename__ = "product_imports"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    format = Column(String, nullable=False)  # "csv" or "ndjson"
+    total_rows = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    updated = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    elapsed_seconds = Column(Float, nullable=False, default=0)
+    error_report = Column(Text, nullable=True)  # CSV: row,sku,error
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -10,6 +10,8 @@ class ReceiptStatus(str, enum.Enum):
     READY = "Ready"
     DONE = "Done"
 
+PENDING_RECEIPT_STATUSES = (ReceiptStatus.DRAFT, ReceiptStatus.READY)
+
 class Receipt(Base):
     __tablename__ = "receipts"
     
@@ -47,3 +49,24 @@ class ReceiptItem(Base):
     receipt = relationship("Receipt", back_populates="items")
     product = relationship("Product", back_populates="receipt_items")
 
+# Partial indexes backing the pending-operations feed (keyset ordered by schedule_date, id)
+Index(
+    "ix_receipts_pending_schedule",
+    Receipt.schedule_date,
+    Receipt.id,
+    postgresql_where=Receipt.status.in_(PENDING_RECEIPT_STATUSES)
+)
+Index(
+    "ix_receipts_pending_warehouse_schedule",
+    Receipt.warehouse_id,
+    Receipt.schedule_date,
+    Receipt.id,
+    postgresql_where=Receipt.status.in_(PENDING_RECEIPT_STATUSES)
+)
+
+# Keyset pagination of the list endpoint, newest first by (created_at, id)
+Index(
+    "ix_receipts_created_id",
+    Receipt.created_at,
+    Receipt.id
+)
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, BigInteger
+from app.core.database import Base
+
+class ReferenceCounter(Base):
+    """Last allocated document number per (warehouse code, document type), e.g. ("WH", "IN")"""
+    __tablename__ = "reference_counters"
+    
+    warehouse_code = Column(String, primary_key=True)
+    doc_type = Column(String, primary_key=True)  # "IN", "OUT" or "TR"
+    last_value = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, String, Float, Integer, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+import uuid
+from app.core.database import Base
+
+class ReorderPoint(Base):
+    """Nightly demand forecast and suggested reorder point per product and location"""
+    __tablename__ = "reorder_points"
+    __table_args__ = (
+        UniqueConstraint("product_id", "location_id", name="uq_reorder_points_product_location"),
+    )
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    product_id = Column(String, ForeignKey("products.id"), nullable=False)
+    warehouse_id = Column(String, ForeignKey("warehouses.id"), nullable=False)
+    location_id = Column(String, ForeignKey("locations.id"), nullable=False)
+    method = Column(String, nullable=False)  # "sma" or "ema"
+    history_days = Column(Integer, nullable=False)
+    forecast_daily_demand = Column(Float, nullable=False)
+    demand_std = Column(Float, nullable=False)  # Std deviation of daily demand
+    lead_time_days = Column(Float, nullable=False)
+    safety_stock = Column(Float, nullable=False)
+    reorder_point = Column(Float, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    product = relationship("Product")
+    warehouse = relationship("Warehouse")
+    location = relationship("Location")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -28,3 +28,10 @@ class StockLedger(Base):
     warehouse = relationship("Warehouse")
     location = relationship("Location", back_populates="stock_entries")
 
+# Covering index for on-hand lookups per (product, location) - sums run as index-only scans
+Index(
+    "ix_stock_ledger_product_location",
+    StockLedger.product_id,
+    StockLedger.location_id,
+    postgresql_include=["quantity"]
+)
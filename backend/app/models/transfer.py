@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Enum
+from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import uuid
@@ -10,6 +10,8 @@ class TransferStatus(str, enum.Enum):
     READY = "Ready"
     DONE = "Done"
 
+PENDING_TRANSFER_STATUSES = (TransferStatus.DRAFT, TransferStatus.READY)
+
 class Transfer(Base):
     __tablename__ = "transfers"
     
@@ -50,3 +52,31 @@ class TransferItem(Base):
     transfer = relationship("Transfer", back_populates="items")
     product = relationship("Product", back_populates="transfer_items")
 
+# Partial indexes backing the pending-operations feed (keyset ordered by schedule_date, id)
+Index(
+    "ix_transfers_pending_schedule",
+    Transfer.schedule_date,
+    Transfer.id,
+    postgresql_where=Transfer.status.in_(PENDING_TRANSFER_STATUSES)
+)
+Index(
+    "ix_transfers_pending_from_wh_schedule",
+    Transfer.from_warehouse_id,
+    Transfer.schedule_date,
+    Transfer.id,
+    postgresql_where=Transfer.status.in_(PENDING_TRANSFER_STATUSES)
+)
+Index(
+    "ix_transfers_pending_to_wh_schedule",
+    Transfer.to_warehouse_id,
+    Transfer.schedule_date,
+    Transfer.id,
+    postgresql_where=Transfer.status.in_(PENDING_TRANSFER_STATUSES)
+)
+
+# Keyset pagination of the list endpoint, newest first by (created_at, id)
+Index(
+    "ix_transfers_created_id",
+    Transfer.created_at,
+    Transfer.id
+)
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Dict, List, Literal, Optional
+from app.core.config import settings
+
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = None  # Echoed back to match responses to requests
+    method: Literal["GET"] = "GET"
+    url: str  # Relative to /api/v1, with query string, e.g. "/stock?warehouse_id=..."
+    headers: Dict[str, str] = {}  # e.g. If-None-Match
+
+    @field_validator("url")
+    @classmethod
+    def check_url(cls, v):
+        if not v.startswith("/") or v.startswith("//"):
+            raise ValueError("url must be a path relative to /api/v1, starting with /")
+        if v.split("?")[0].rstrip("/") == "/batch":
+            raise ValueError("batches cannot be nested")
+        return v
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_length=1, max_length=settings.BATCH_MAX_REQUESTS)
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str]
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]  # In request order
@@ -0,0 +1,34 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import enum
+
+class BulkDocumentResult(BaseModel):
+    index: int  # Position of the document in the request
+    success: bool
+    id: Optional[str] = None
+    reference: Optional[str] = None
+    errors: List[str] = []
+
+class BulkCreateResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkDocumentResult]
+
+class BatchFailureMode(str, enum.Enum):
+    PARTIAL = "partial"  # Commit the documents that pass, report the others
+    ALL_OR_NOTHING = "all_or_nothing"  # Commit nothing if any document fails
+
+class BatchValidateRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=1000)
+    mode: BatchFailureMode = BatchFailureMode.PARTIAL
+
+class BatchValidateResult(BaseModel):
+    id: str
+    success: bool
+    reference: Optional[str] = None
+    errors: List[str] = []
+
+class BatchValidateResponse(BaseModel):
+    validated: int
+    failed: int
+    results: List[BatchValidateResult]
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
 from datetime import datetime
 
 class ProductBase(BaseModel):
@@ -26,3 +26,29 @@ class ProductResponse(ProductBase):
     class Config:
         from_attributes = True
 
+
+class ProductImportResponse(BaseModel):
+    id: str
+    format: str
+    total_rows: int
+    inserted: int
+    updated: int
+    failed: int
+    elapsed_seconds: float
+    rows_per_second: float
+    error_report_url: Optional[str] = None
+
+class ProductLookupRequest(BaseModel):
+    ids: List[str] = Field(default_factory=list, max_length=1000)
+    skus: List[str] = Field(default_factory=list, max_length=1000)
+
+    @model_validator(mode="after")
+    def check_not_empty(self):
+        if not self.ids and not self.skus:
+            raise ValueError("Provide ids or skus")
+        return self
+
+class ProductLookupResponse(BaseModel):
+    products: List[ProductResponse]  # Requested ids first, then skus, in request order
+    missing_ids: List[str] = []
+    missing_skus: List[str] = []
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Union, Any
-from datetime import datetime, date
+from datetime import datetime, date, timezone
 from app.models.transfer import TransferStatus
 
 class TransferItemCreate(BaseModel):
@@ -38,6 +38,15 @@ class TransferCreate(BaseModel):
             return datetime.combine(v, datetime.min.time())
         raise ValueError(f"Cannot convert {type(v)} to datetime")
 
+    @field_validator('schedule_date')
+    @classmethod
+    def to_naive_utc(cls, v: datetime) -> datetime:
+        # The column is TIMESTAMP WITHOUT TIME ZONE, which asyncpg only accepts naive values for
+        return v.astimezone(timezone.utc).replace(tzinfo=None) if v.tzinfo else v
+
+class TransferBulkCreate(BaseModel):
+    documents: List[TransferCreate] = Field(..., min_length=1, max_length=1000)
+
 class TransferItemResponse(BaseModel):
     id: str
     product_id: str
@@ -0,0 +1,93 @@
+from collections import defaultdict
+from typing import Callable, Iterable, List
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.product import Product
+from app.models.warehouse import Location, Warehouse
+from app.schemas.bulk import BatchFailureMode
+from app.utils.reference_generator import reserve_references
+
+class BulkReferenceData:
+    """Warehouses, locations and product names referenced by a bulk request, loaded in three queries"""
+    
+    def __init__(self, db: Session, warehouse_ids: Iterable[str], location_ids: Iterable[str], product_ids: Iterable[str]):
+        warehouse_ids, location_ids, product_ids = set(warehouse_ids), set(location_ids), set(product_ids)
+        self.warehouses = {
+            wh.id: wh for wh in db.scalars(select(Warehouse).where(Warehouse.id.in_(warehouse_ids)))
+        } if warehouse_ids else {}
+        self.locations = {
+            loc.id: loc for loc in db.scalars(select(Location).where(Location.id.in_(location_ids)))
+        } if location_ids else {}
+        self.product_names = dict(
+            db.execute(select(Product.id, Product.name).where(Product.id.in_(product_ids))).all()
+        ) if product_ids else {}
+    
+    def errors(self, warehouse_ids: Iterable[str] = (), location_ids: Iterable[str] = (), product_ids: Iterable[str] = ()) -> List[str]:
+        """Validation errors for one document's references"""
+        errors = [f"Warehouse {wh_id} not found" for wh_id in warehouse_ids if wh_id not in self.warehouses]
+        errors += [f"Location {loc_id} not found" for loc_id in location_ids if loc_id not in self.locations]
+        errors += [
+            f"Product {product_id} not found"
+            for product_id in dict.fromkeys(product_ids)
+            if product_id not in self.product_names
+        ]
+        return errors
+
+def insufficient_stock_errors(requested: dict, stock_levels: dict, product_names: dict) -> List[str]:
+    """Errors for every (product_id, location_id) whose requested quantity exceeds stock"""
+    errors = []
+    for (product_id, location_id), quantity in requested.items():
+        available = stock_levels.get((product_id, location_id), 0)
+        if available < quantity:
+            errors.append(
+                f"{product_names.get(product_id, 'Unknown')}: Available {available}, Requested {quantity}"
+            )
+    return errors
+
+def assign_references(db: Session, valid: list, doc_type: str, warehouse_code_of: Callable) -> list:
+    """
+    Reserve one block of references per warehouse code for the (doc, result) pairs in `valid`.
+    Returns (doc, result, reference) triples in the original order. Codes are reserved in
+    sorted order, so concurrent bulk creates lock the counter rows in the same order.
+    """
+    by_code = defaultdict(list)
+    for position, (doc, result) in enumerate(valid):
+        by_code[warehouse_code_of(doc)].append(position)
+    
+    references = [None] * len(valid)
+    for warehouse_code, positions in sorted(by_code.items()):
+        for position, reference in zip(positions, reserve_references(db, warehouse_code, doc_type, len(positions))):
+            references[position] = reference
+    return [(doc, result, reference) for (doc, result), reference in zip(valid, references)]
+
+def bulk_response(results: list) -> dict:
+    created = sum(1 for result in results if result["success"])
+    return {
+        "created": created,
+        "failed": len(results) - created,
+        "results": results,
+    }
+
+def batch_validate_response(results: list, mode: BatchFailureMode) -> dict:
+    """
+    Summarize batch validation results. In all-or-nothing mode a single failure
+    means nothing was written, so every successful document is reported as failed too.
+    """
+    if mode == BatchFailureMode.ALL_OR_NOTHING and not all(result["success"] for result in results):
+        for result in results:
+            if result["success"]:
+                result["success"] = False
+                result["errors"] = ["Not validated: another document in the batch failed"]
+    
+    validated = sum(1 for result in results if result["success"])
+    return {
+        "validated": validated,
+        "failed": len(results) - validated,
+        "results": results,
+    }
+
+def batch_should_commit(results: list, mode: BatchFailureMode) -> bool:
+    succeeded = [result["success"] for result in results]
+    if mode == BatchFailureMode.ALL_OR_NOTHING:
+        return all(succeeded)
+    return any(succeeded)
@@ -0,0 +1,104 @@
+"""
+Sparse fieldsets for document endpoints (?fields= and ?include=items).
+
+Each document type describes its response fields as SQL columns, plus display names
+resolved through the reference cache from a foreign key column, so a page is one SELECT
+of just the requested columns. Items come from one extra query, and only when asked
+for. Without either parameter the full response (every field plus items) is returned.
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from app.core.reference_cache import ReferenceCache
+
+INCLUDE_ITEMS = "items"
+
+class CachedName:
+    """A field selected as its foreign key and replaced by the cached row's attribute"""
+    def __init__(self, scope: str, attribute: str, foreign_key):
+        self.scope = scope
+        self.attribute = attribute
+        self.foreign_key = foreign_key
+
+    def label(self, name: str):
+        return self.foreign_key.label(name)
+
+def name_of(scope: str, foreign_key, attribute: str = "name") -> CachedName:
+    return CachedName(scope, attribute, foreign_key)
+
+def resolve_names(db, refs: ReferenceCache, rows: List[dict], available: Dict[str, object]):
+    """Replace the foreign keys selected for CachedName fields with their display values"""
+    if not rows:
+        return
+    for name, field in available.items():
+        if isinstance(field, CachedName) and name in rows[0]:
+            refs.resolve(db, field.scope, {row[name] for row in rows})
+            for row in rows:
+                row[name] = refs.lookup(field.scope, row[name], field.attribute)
+
+def parse_csv(value: Optional[str]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+def requested_fields(fields: Optional[str], available: Dict[str, object]) -> List[str]:
+    """Field names to select (`id` is always included); raises 400 on unknown names"""
+    names = parse_csv(fields)
+    if names is None:
+        return list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}"
+        )
+    return ["id"] + [name for name in dict.fromkeys(names) if name != "id"]
+
+def includes_items(fields: Optional[str], include: Optional[str]) -> bool:
+    """Items are loaded for ?include=items, or by default when neither parameter is given"""
+    includes = parse_csv(include)
+    if includes is None:
+        return fields is None
+    unknown = [name for name in includes if name != INCLUDE_ITEMS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown include: {', '.join(unknown)}. Available: {INCLUDE_ITEMS}"
+        )
+    return INCLUDE_ITEMS in includes
+
+def only_fields(documents: List[dict], names: List[str]) -> List[dict]:
+    """Drop header fields selected only for paging (e.g. the sort key) that were not requested"""
+    if documents:
+        extra = set(documents[0]) - set(names) - {INCLUDE_ITEMS}
+        for document in documents:
+            for name in extra:
+                del document[name]
+    return documents
+
+def header_query(available: Dict[str, object], names: List[str]):
+    return select(*[available[name].label(name) for name in names])
+
+def fetch_documents(
+    db, refs: ReferenceCache, query, available: Dict[str, object], available_items: Dict[str, object],
+    parent_key, with_items: bool, order_by=None
+) -> List[dict]:
+    """Header rows as dicts, with `items` from one query over all of them when requested"""
+    documents = [dict(row._mapping) for row in db.execute(query)]
+    resolve_names(db, refs, documents, available)
+    if not with_items:
+        return documents
+    by_parent = defaultdict(list)
+    if documents:
+        items = [dict(item_row._mapping) for item_row in db.execute(
+            select(parent_key.label("parent_id"), *[column.label(name) for name, column in available_items.items()])
+            .where(parent_key.in_([document["id"] for document in documents]))
+            .order_by(order_by)
+        )]
+        resolve_names(db, refs, items, available_items)
+        for item in items:
+            by_parent[item.pop("parent_id")].append(item)
+    for document in documents:
+        document["items"] = by_parent[document["id"]]
+    return documents
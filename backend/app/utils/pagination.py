@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response, status
+from sqlalchemy import DateTime, func, select, tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_COUNT_TYPE_HEADER = "X-Total-Count-Type"
+# ?total= values: planner estimate (constant time) or count(*) over the filtered rows
+TOTAL_COUNT_PATTERN = "^(estimate|exact)$"
+
+def encode_cursor(*values) -> str:
+    """Encode keyset values (datetimes, strings, numbers) as an opaque cursor"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Decode a cursor produced by encode_cursor; raises 400 if it is malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("wrong cursor size")
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def decode_datetime(value: str) -> datetime:
+    """Parse a datetime stored in a cursor"""
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def keyset_page(query, sort_columns: Sequence, cursor: Optional[str], skip: int, limit: int, descending: bool = False):
+    """
+    Order `query` by sort_columns (unique together, e.g. (created_at, id)) and fetch
+    limit + 1 rows so split_page can tell whether there is a next page. With a cursor the
+    page starts right after it, an index range scan however deep the page; without one
+    `skip` is still applied as an offset for older clients.
+    """
+    if cursor:
+        values = [
+            decode_datetime(value) if isinstance(column.type, DateTime) else value
+            for column, value in zip(sort_columns, decode_cursor(cursor, len(sort_columns)))
+        ]
+        after = tuple_(*sort_columns) < tuple_(*values) if descending else tuple_(*sort_columns) > tuple_(*values)
+        query = query.where(after)
+    elif skip:
+        query = query.offset(skip)
+    return query.order_by(*[column.desc() if descending else column for column in sort_columns]).limit(limit + 1)
+
+def split_page(rows: List, limit: int, sort_key: Callable[..., Tuple], response: Response) -> List:
+    """Trim the extra row fetched by keyset_page and set X-Next-Cursor when there is one"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*sort_key(rows[-1]))
+    return rows
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a statement, keeping its bound parameters"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+def set_total_count(response: Response, db, query, mode: str):
+    """
+    Set X-Total-Count for the rows `query` (filtered, not yet ordered or paged) matches.
+    "estimate" reads the planner's row estimate - no rows are touched, so it costs the
+    same on any table size but is only as accurate as the table statistics (ANALYZE).
+    "exact" runs count(*).
+    """
+    if mode == "exact":
+        total = db.scalar(select(func.count()).select_from(query.subquery()))
+    else:
+        plan = db.execute(Explain(query)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        total = int(plan[0]["Plan"]["Plan Rows"])
+    response.headers[TOTAL_COUNT_HEADER] = str(total)
+    response.headers[TOTAL_COUNT_TYPE_HEADER] = mode
@@ -0,0 +1,261 @@
+"""
+Bulk product import for POST /products/bulk.
+
+The uploaded file (CSV with a header line, or NDJSON with one object per line) is
+streamed into a temporary staging table with COPY, validated there with set-based
+UPDATEs (required fields, numeric unit_cost, category by id or name through one join,
+duplicate SKUs within the file: the last row wins), and the valid rows are upserted into
+products on sku in a single INSERT ... ON CONFLICT. Nothing is parsed or validated row
+by row in Python except re-encoding NDJSON lines as CSV for COPY.
+
+Rows with errors are skipped and listed in an error report (row, sku, error) stored on
+the ProductImport record. Columns missing from the file keep their current values on
+updated products; an empty cell clears the category and sets unit_cost to 0.
+"""
+import csv
+import io
+import time
+from datetime import datetime
+from typing import BinaryIO, Dict, List, Optional
+import orjson
+import psycopg2
+from fastapi import HTTPException, status
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.data_version import touch_scopes
+from app.models.product_import import ProductImport
+
+CSV_FORMAT, NDJSON_FORMAT = "csv", "ndjson"
+CONTENT_TYPES = {
+    "text/csv": CSV_FORMAT,
+    "application/csv": CSV_FORMAT,
+    "application/x-ndjson": NDJSON_FORMAT,
+    "application/ndjson": NDJSON_FORMAT,
+    "application/jsonl": NDJSON_FORMAT,
+}
+
+# Field name in the file -> staging column ("category" takes a category id or name)
+IMPORT_FIELDS = {
+    "sku": "sku",
+    "name": "name",
+    "category": "category",
+    "category_id": "category",
+    "unit_of_measure": "unit_of_measure",
+    "unit_cost": "unit_cost",
+}
+REQUIRED_FIELDS = ("sku", "name", "unit_of_measure")
+# Columns updated on existing products when present in the file
+UPDATABLE_COLUMNS = {
+    "name": "name",
+    "unit_of_measure": "unit_of_measure",
+    "unit_cost": "unit_cost",
+    "category": "category_id",
+}
+
+STAGING_TABLE = "product_import"
+NDJSON_COPY_COLUMNS = ("row_number", "sku", "name", "category", "unit_of_measure", "unit_cost", "error")
+
+CREATE_STAGING = f"""
+CREATE TEMPORARY TABLE {STAGING_TABLE} (
+    row_number bigserial,
+    sku text,
+    name text,
+    category text,
+    unit_of_measure text,
+    unit_cost text,
+    category_id text,
+    error text
+) ON COMMIT DROP
+"""
+
+# Category ids and names in one keyed set, so the join can hash both at once
+RESOLVE_CATEGORIES = f"""
+UPDATE {STAGING_TABLE} AS s SET category_id = c.id
+FROM (
+    SELECT id AS key, id FROM product_categories
+    UNION ALL
+    SELECT name, id FROM product_categories
+) AS c
+WHERE s.category IS NOT NULL AND c.key = trim(s.category)
+"""
+
+FLAG_INVALID_ROWS = rf"""
+UPDATE {STAGING_TABLE} SET error = nullif(concat_ws('; ',
+    CASE WHEN nullif(trim(sku), '') IS NULL THEN 'sku is required' END,
+    CASE WHEN nullif(trim(name), '') IS NULL THEN 'name is required' END,
+    CASE WHEN nullif(trim(unit_of_measure), '') IS NULL THEN 'unit_of_measure is required' END,
+    CASE WHEN nullif(trim(unit_cost), '') !~ '^[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?$'
+        THEN 'unit_cost is not a number' END,
+    CASE WHEN nullif(trim(category), '') IS NOT NULL AND category_id IS NULL
+        THEN 'category ' || trim(category) || ' not found' END
+), '')
+WHERE error IS NULL
+"""
+
+FLAG_DUPLICATE_SKUS = f"""
+UPDATE {STAGING_TABLE} AS s SET error = 'sku repeated in row ' || d.last_row
+FROM (
+    SELECT trim(sku) AS sku, max(row_number) AS last_row
+    FROM {STAGING_TABLE}
+    WHERE error IS NULL
+    GROUP BY trim(sku)
+    HAVING count(*) > 1
+) AS d
+WHERE s.error IS NULL AND trim(s.sku) = d.sku AND s.row_number < d.last_row
+"""
+
+# xmax is 0 only on freshly inserted tuples, so RETURNING tells inserts from updates
+UPSERT_PRODUCTS = f"""
+WITH upserted AS (
+    INSERT INTO products (id, sku, name, category_id, unit_of_measure, unit_cost, created_at, updated_at)
+    SELECT gen_random_uuid()::text, trim(sku), trim(name), category_id, trim(unit_of_measure),
+           coalesce(nullif(trim(unit_cost), '')::double precision, 0), :now, :now
+    FROM {STAGING_TABLE}
+    WHERE error IS NULL
+    ON CONFLICT (sku) DO UPDATE SET {{updates}}
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT
+    (SELECT count(*) FROM {STAGING_TABLE}) AS total,
+    count(*) FILTER (WHERE inserted) AS inserted,
+    count(*) FILTER (WHERE NOT inserted) AS updated
+FROM upserted
+"""
+
+SELECT_ERRORS = f"SELECT row_number, sku, error FROM {STAGING_TABLE} WHERE error IS NOT NULL ORDER BY row_number"
+
+def import_format(content_type: Optional[str]) -> str:
+    """csv or ndjson from the request's Content-Type; raises 415 otherwise"""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type not in CONTENT_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Content-Type must be one of: {', '.join(CONTENT_TYPES)}"
+        )
+    return CONTENT_TYPES[media_type]
+
+def _bad_request(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+def _staging_columns(header: List[str]) -> List[str]:
+    """Staging columns for a CSV header; raises 400 on unknown, repeated or missing fields"""
+    fields = [name.strip().lower() for name in header]
+    unknown = [name for name in fields if name not in IMPORT_FIELDS]
+    if unknown:
+        raise _bad_request(f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(IMPORT_FIELDS)}")
+    columns = [IMPORT_FIELDS[name] for name in fields]
+    if len(set(columns)) != len(columns):
+        raise _bad_request("Each column may appear only once (category and category_id are the same column)")
+    missing = [name for name in REQUIRED_FIELDS if name not in columns]
+    if missing:
+        raise _bad_request(f"Missing required columns: {', '.join(missing)}")
+    return columns
+
+class NdjsonAsCsv:
+    """Readable file object that re-encodes NDJSON lines as CSV rows for COPY"""
+
+    def __init__(self, source: BinaryIO):
+        self.lines = enumerate(source, start=1)
+        self.buffer = b""
+
+    @staticmethod
+    def _row(line_number: int, line: bytes) -> Optional[list]:
+        if not line.strip():
+            return None
+        try:
+            record = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            return [line_number, None, None, None, None, None, "invalid JSON"]
+        if not isinstance(record, dict):
+            return [line_number, None, None, None, None, None, "not a JSON object"]
+        values: Dict[str, Optional[str]] = {}
+        unknown = []
+        for key, value in record.items():
+            column = IMPORT_FIELDS.get(key)
+            if column is None:
+                unknown.append(key)
+            elif value is not None:
+                values[column] = value if isinstance(value, str) else orjson.dumps(value).decode()
+        error = f"unknown fields: {', '.join(unknown)}" if unknown else None
+        return [line_number, *(values.get(column) for column in NDJSON_COPY_COLUMNS[1:-1]), error]
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or len(self.buffer) < size:
+            text_buffer = io.StringIO()
+            writer = csv.writer(text_buffer, lineterminator="\n")
+            for line_number, line in self.lines:
+                row = self._row(line_number, line)
+                if row is not None:
+                    writer.writerow(row)
+                if size >= 0 and len(self.buffer) + text_buffer.tell() >= size:
+                    break
+            self.buffer += text_buffer.getvalue().encode()
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+def _copy_into_staging(db: Session, source: BinaryIO, file_format: str) -> List[str]:
+    """COPY the file into the staging table; returns the product columns it provided"""
+    if file_format == CSV_FORMAT:
+        header = next(csv.reader([source.readline().decode("utf-8-sig")]), None)
+        if not header:
+            raise _bad_request("The CSV file needs a header line")
+        columns = _staging_columns(header)
+        copy_columns, reader = columns, source
+    else:
+        columns = list(dict.fromkeys(IMPORT_FIELDS.values()))
+        copy_columns, reader = NDJSON_COPY_COLUMNS, NdjsonAsCsv(source)
+
+    cursor = db.connection().connection.cursor()  # psycopg2 cursor on the session's transaction
+    try:
+        cursor.copy_expert(
+            f"COPY {STAGING_TABLE} ({', '.join(copy_columns)}) FROM STDIN WITH (FORMAT csv, ENCODING 'UTF8')",
+            reader
+        )
+    except psycopg2.DataError as exc:
+        raise _bad_request(f"Could not read the file: {(exc.pgerror or str(exc)).strip()}")
+    finally:
+        cursor.close()
+    return columns
+
+def _error_report(rows) -> Optional[str]:
+    report = io.StringIO()
+    writer = csv.writer(report, lineterminator="\n")
+    writer.writerow(["row", "sku", "error"])
+    writer.writerows(rows)
+    return report.getvalue() if rows else None
+
+def import_products(db: Session, source: BinaryIO, file_format: str) -> ProductImport:
+    """Run one import in a single transaction and return its committed ProductImport"""
+    started = time.perf_counter()
+    db.execute(text(CREATE_STAGING))
+    columns = _copy_into_staging(db, source, file_format)
+    if "category" in columns:
+        db.execute(text(RESOLVE_CATEGORIES))
+    db.execute(text(FLAG_INVALID_ROWS))
+    db.execute(text(FLAG_DUPLICATE_SKUS))
+
+    updates = [
+        f"{target} = excluded.{target}" for column, target in UPDATABLE_COLUMNS.items() if column in columns
+    ] + ["updated_at = excluded.updated_at"]
+    now = datetime.utcnow()
+    counts = db.execute(text(UPSERT_PRODUCTS.format(updates=", ".join(updates))), {"now": now}).one()
+    errors = db.execute(text(SELECT_ERRORS)).all()
+    # Raw SQL bypasses the ORM events that collect data version scopes
+    touch_scopes(db, "products")
+
+    record = ProductImport(
+        format=file_format,
+        total_rows=counts.total,
+        inserted=counts.inserted,
+        updated=counts.updated,
+        failed=len(errors),
+        error_report=_error_report(errors),
+        created_at=now,
+    )
+    record.elapsed_seconds = time.perf_counter() - started
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    return record
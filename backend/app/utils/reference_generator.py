@@ -1,56 +1,49 @@
+"""
+Document reference numbers like WH/IN/0001, allocated per (warehouse code, document type).
+
+Numbers come from the reference_counters table with a single atomic
+INSERT ... ON CONFLICT DO UPDATE ... RETURNING, with no read-modify-write of the last
+reference. The upsert runs on the caller's session, in the transaction that inserts
+the documents, so a create uses a single pooled connection. The counter row stays
+locked until that transaction ends: concurrent creates for the same warehouse and
+document type wait for each other's COMMIT, and callers reserve right before their
+inserts to keep that short. A rollback also rolls back the counter, so numbers are
+not skipped. A request that reserves for several warehouses must do so in sorted
+code order (see assign_references in app/utils/bulk.py) to keep lock order stable.
+"""
+from typing import List
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.receipt import Receipt
-from app.models.delivery import Delivery
-from app.models.transfer import Transfer
+from app.models.reference_counter import ReferenceCounter
+
+RECEIPT_DOC_TYPE = "IN"
+DELIVERY_DOC_TYPE = "OUT"
+TRANSFER_DOC_TYPE = "TR"
 
-def generate_receipt_reference(warehouse_code: str = "WH", db: Session = None) -> str:
-    """Generate receipt reference like WH/IN/0001"""
-    if db:
-        last_receipt = db.query(Receipt).order_by(Receipt.reference.desc()).first()
-        if last_receipt and last_receipt.reference.startswith(f"{warehouse_code}/IN/"):
-            try:
-                last_number = int(last_receipt.reference.split("/")[-1])
-                next_number = last_number + 1
-            except (ValueError, IndexError):
-                next_number = 1
-        else:
-            next_number = 1
-    else:
-        next_number = 1
-    
-    return f"{warehouse_code}/IN/{str(next_number).zfill(4)}"
+def _counter_upsert(warehouse_code: str, doc_type: str, count: int):
+    """Statement that advances the counter by `count` and returns the new last value"""
+    return pg_insert(ReferenceCounter).values(
+        warehouse_code=warehouse_code,
+        doc_type=doc_type,
+        last_value=count
+    ).on_conflict_do_update(
+        index_elements=[ReferenceCounter.warehouse_code, ReferenceCounter.doc_type],
+        set_={"last_value": ReferenceCounter.last_value + count}
+    ).returning(ReferenceCounter.last_value)
 
-def generate_delivery_reference(warehouse_code: str = "WH", db: Session = None) -> str:
-    """Generate delivery reference like WH/OUT/0001"""
-    if db:
-        last_delivery = db.query(Delivery).order_by(Delivery.reference.desc()).first()
-        if last_delivery and last_delivery.reference.startswith(f"{warehouse_code}/OUT/"):
-            try:
-                last_number = int(last_delivery.reference.split("/")[-1])
-                next_number = last_number + 1
-            except (ValueError, IndexError):
-                next_number = 1
-        else:
-            next_number = 1
-    else:
-        next_number = 1
-    
-    return f"{warehouse_code}/OUT/{str(next_number).zfill(4)}"
+def _format_references(warehouse_code: str, doc_type: str, last_value: int, count: int) -> List[str]:
+    return [
+        f"{warehouse_code}/{doc_type}/{str(number).zfill(4)}"
+        for number in range(last_value - count + 1, last_value + 1)
+    ]
 
-def generate_transfer_reference(warehouse_code: str = "WH", db: Session = None) -> str:
-    """Generate transfer reference like WH/TR/0001"""
-    if db:
-        last_transfer = db.query(Transfer).order_by(Transfer.reference.desc()).first()
-        if last_transfer and last_transfer.reference.startswith(f"{warehouse_code}/TR/"):
-            try:
-                last_number = int(last_transfer.reference.split("/")[-1])
-                next_number = last_number + 1
-            except (ValueError, IndexError):
-                next_number = 1
-        else:
-            next_number = 1
-    else:
-        next_number = 1
-    
-    return f"{warehouse_code}/TR/{str(next_number).zfill(4)}"
+def reserve_references(db: Session, warehouse_code: str, doc_type: str, count: int = 1) -> List[str]:
+    """Atomically reserve `count` consecutive references for a warehouse and document type"""
+    last_value = db.execute(_counter_upsert(warehouse_code, doc_type, count)).scalar_one()
+    return _format_references(warehouse_code, doc_type, last_value, count)
 
+async def reserve_references_async(db: AsyncSession, warehouse_code: str, doc_type: str, count: int = 1) -> List[str]:
+    """reserve_references for the async endpoints"""
+    last_value = (await db.execute(_counter_upsert(warehouse_code, doc_type, count))).scalar_one()
+    return _format_references(warehouse_code, doc_type, last_value, count)
@@ -0,0 +1,13 @@
+from typing import Any
+from fastapi import Response, status
+from fastapi.responses import ORJSONResponse
+
+def orjson_response(content: Any, response: Response = None, status_code: int = status.HTTP_200_OK) -> ORJSONResponse:
+    """
+    Encode already-mapped content with orjson and return it as is. Returning a Response
+    skips the route's response_model validation and jsonable_encoder, so `content` must
+    already match the documented schema (see the explicit *_to_dict mappers).
+    Headers set on the injected `response` (e.g. ETag from conditional_get) are kept.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
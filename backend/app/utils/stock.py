@@ -0,0 +1,99 @@
+from sqlalchemy import select, func, and_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.stock_ledger import StockLedger
+from app.models.reorder_point import ReorderPoint
+
+def low_stock_threshold():
+    """Per-row threshold: the computed reorder point, or the configured fallback"""
+    return func.coalesce(ReorderPoint.reorder_point, settings.LOW_STOCK_THRESHOLD)
+
+def low_stock_query(warehouse_id: str = None):
+    """
+    Stock per (product, location) that is below its reorder point.
+    Pairs without a computed reorder point use LOW_STOCK_THRESHOLD.
+    """
+    stock_query = select(
+        StockLedger.product_id,
+        StockLedger.location_id,
+        StockLedger.warehouse_id,
+        func.sum(StockLedger.quantity).label('quantity')
+    ).group_by(
+        StockLedger.product_id,
+        StockLedger.location_id,
+        StockLedger.warehouse_id
+    )
+    if warehouse_id:
+        stock_query = stock_query.where(StockLedger.warehouse_id == warehouse_id)
+    stock = stock_query.subquery()
+    
+    threshold = low_stock_threshold()
+    return select(
+        stock.c.product_id,
+        stock.c.location_id,
+        stock.c.warehouse_id,
+        stock.c.quantity,
+        ReorderPoint.reorder_point,
+        threshold.label('threshold')
+    ).outerjoin(
+        ReorderPoint,
+        and_(
+            ReorderPoint.product_id == stock.c.product_id,
+            ReorderPoint.location_id == stock.c.location_id
+        )
+    ).where(stock.c.quantity < threshold)
+
+def stock_levels_query(pairs):
+    """On-hand quantity for a set of (product_id, location_id) pairs in one grouped query"""
+    return select(
+        StockLedger.product_id,
+        StockLedger.location_id,
+        func.sum(StockLedger.quantity).label('quantity')
+    ).where(
+        tuple_(StockLedger.product_id, StockLedger.location_id).in_(list(pairs))
+    ).group_by(
+        StockLedger.product_id,
+        StockLedger.location_id
+    )
+
+def _stock_levels(pairs, rows) -> dict:
+    levels = {pair: 0 for pair in pairs}
+    for row in rows:
+        levels[(row.product_id, row.location_id)] = row.quantity or 0
+    return levels
+
+def get_stock_levels(db: Session, pairs) -> dict:
+    """Map every (product_id, location_id) pair to its on-hand quantity (0 when it has no ledger rows)"""
+    pairs = set(pairs)
+    rows = db.execute(stock_levels_query(pairs)) if pairs else []
+    return _stock_levels(pairs, rows)
+
+async def get_stock_levels_async(db: AsyncSession, pairs) -> dict:
+    """get_stock_levels for the async endpoints"""
+    pairs = set(pairs)
+    rows = await db.execute(stock_levels_query(pairs)) if pairs else []
+    return _stock_levels(pairs, rows)
+
+def low_stock_thresholds_query(pairs):
+    return select(ReorderPoint.product_id, ReorderPoint.location_id, ReorderPoint.reorder_point).where(
+        tuple_(ReorderPoint.product_id, ReorderPoint.location_id).in_(list(pairs))
+    )
+
+def _low_stock_thresholds(pairs, rows) -> dict:
+    thresholds = {pair: settings.LOW_STOCK_THRESHOLD for pair in pairs}
+    for row in rows:
+        thresholds[(row.product_id, row.location_id)] = row.reorder_point
+    return thresholds
+
+def get_low_stock_thresholds(db: Session, pairs) -> dict:
+    """Map every (product_id, location_id) pair to its reorder point, falling back to LOW_STOCK_THRESHOLD"""
+    pairs = set(pairs)
+    rows = db.execute(low_stock_thresholds_query(pairs)) if pairs else []
+    return _low_stock_thresholds(pairs, rows)
+
+async def get_low_stock_thresholds_async(db: AsyncSession, pairs) -> dict:
+    """get_low_stock_thresholds for the async endpoints"""
+    pairs = set(pairs)
+    rows = await db.execute(low_stock_thresholds_query(pairs)) if pairs else []
+    return _low_stock_thresholds(pairs, rows)
@@ -0,0 +1,127 @@
+"""
+Per-room coalescing of stock:updated events.
+
+A big putaway can commit thousands of ledger lines a second into one warehouse room.
+Instead of a frame per transaction, updates are buffered per room and merged by
+(product_id, location_id) into one net delta, then sent as a single
+`{"warehouse_id", "updates": [...]}` frame every STOCK_UPDATE_FLUSH_INTERVAL_MS or as
+soon as STOCK_UPDATE_FLUSH_MAX_EVENTS updates are buffered. Other events for a room
+flush its buffer first, so clients still see a room's events in order. A merged frame's
+`seq` is that of the newest outbox row it includes. A buffer whose emit fails is put
+back (ahead of anything added meanwhile) and retried by the next flush, so
+sent_through() never passes an update that was not emitted.
+"""
+import asyncio
+from typing import Awaitable, Callable, Optional
+from app.core.config import settings
+
+STOCK_UPDATED_EVENT = "stock:updated"
+
+class _RoomBuffer:
+    def __init__(self, first_id: Optional[int]):
+        self.first_id = first_id  # Lowest outbox id not yet sent
+        self.last_id = first_id
+        self.deltas = {}
+        self.events = 0
+        self.timer = None
+
+class StockUpdateCoalescer:
+    def __init__(self, emit: Callable[..., Awaitable], interval_ms: int = None, max_events: int = None):
+        self.emit = emit
+        self.interval_ms = settings.STOCK_UPDATE_FLUSH_INTERVAL_MS if interval_ms is None else interval_ms
+        self.max_events = settings.STOCK_UPDATE_FLUSH_MAX_EVENTS if max_events is None else max_events
+        self.buffers = {}
+        self.metrics = {
+            "events_in": 0,  # Individual stock updates received
+            "frames_in": 0,  # stock:updated frames received from the outbox
+            "frames_out": 0,  # stock:updated frames emitted
+            "updates_out": 0,  # Net (product, location) deltas emitted
+            "flushes_by_size": 0,
+            "flushes_by_interval": 0,
+        }
+
+    async def add(self, room: str, payload: dict, outbox_id: int = None):
+        """Buffer a stock:updated payload for `room`"""
+        self.metrics["frames_in"] += 1
+        self.metrics["events_in"] += len(payload["updates"])
+        if self.interval_ms <= 0:
+            await self._send(room, payload["warehouse_id"], payload["updates"], outbox_id)
+            return
+
+        buffer = self.buffers.get(room)
+        if buffer is None:
+            buffer = self.buffers[room] = _RoomBuffer(outbox_id)
+            buffer.timer = asyncio.create_task(self._flush_later(room, buffer))
+        for update in payload["updates"]:
+            key = (update["product_id"], update["location_id"])
+            merged = buffer.deltas.get(key)
+            if merged is None:
+                buffer.deltas[key] = dict(update)
+            else:
+                merged["quantity"] += update["quantity"]
+        buffer.events += len(payload["updates"])
+        buffer.last_id = outbox_id
+
+        if buffer.events >= self.max_events:
+            self.metrics["flushes_by_size"] += 1
+            await self.flush(room)
+
+    async def _flush_later(self, room: str, buffer: _RoomBuffer):
+        await asyncio.sleep(self.interval_ms / 1000)
+        if self.buffers.get(room) is buffer:
+            self.metrics["flushes_by_interval"] += 1
+            buffer.timer = None  # Don't cancel ourselves
+            await self.flush(room)
+
+    async def flush(self, room: str):
+        buffer = self.buffers.pop(room, None)
+        if buffer is None:
+            return
+        if buffer.timer is not None:
+            buffer.timer.cancel()
+        updates = [update for update in buffer.deltas.values() if update["quantity"] != 0]
+        if updates:
+            try:
+                await self._send(room, updates[0]["warehouse_id"], updates, buffer.last_id)
+            except Exception:
+                self._restore(room, buffer)
+                raise
+
+    def _restore(self, room: str, failed: _RoomBuffer):
+        """Put back a buffer whose emit failed, merged with updates added since, and re-arm its timer"""
+        current = self.buffers.get(room)
+        if current is not None:
+            if current.timer is not None:
+                current.timer.cancel()
+            for key, update in current.deltas.items():
+                merged = failed.deltas.get(key)
+                if merged is None:
+                    failed.deltas[key] = update
+                else:
+                    merged["quantity"] += update["quantity"]
+            failed.events += current.events
+            failed.last_id = current.last_id
+        self.buffers[room] = failed
+        failed.timer = asyncio.create_task(self._flush_later(room, failed)) if self.interval_ms > 0 else None
+
+    async def flush_all(self):
+        for room in list(self.buffers):
+            await self.flush(room)
+
+    async def _send(self, room: str, warehouse_id: str, updates: list, seq: int = None):
+        await self.emit(STOCK_UPDATED_EVENT, {"warehouse_id": warehouse_id, "updates": updates, "seq": seq}, room=room)
+        self.metrics["frames_out"] += 1
+        self.metrics["updates_out"] += len(updates)
+
+    def sent_through(self, last_id: int) -> int:
+        """Highest outbox id up to which everything has been emitted (safe relay cursor)"""
+        pending = [buffer.first_id for buffer in self.buffers.values() if buffer.first_id is not None]
+        return min(pending) - 1 if pending else last_id
+
+    def get_metrics(self) -> dict:
+        frames_out = self.metrics["frames_out"]
+        return {
+            **self.metrics,
+            "buffered_rooms": len(self.buffers),
+            "events_per_frame": round(self.metrics["events_in"] / frames_out, 2) if frames_out else None,
+        }
@@ -0,0 +1,84 @@
+"""
+Real-time events collected on the database session and published through the outbox.
+
+Endpoints record stock changes and document events with record_* while they work.
+Just before the transaction commits they are written to event_outbox in that same
+transaction, so an event exists exactly when its change does, and a rollback discards
+them. The outbox relay in every worker (app/websocket/outbox.py) then emits them to its
+own sockets, so transaction time does not depend on socket fan-out and clients on any
+worker get every event. Stock changes are batched into a single `stock:updated` frame
+per warehouse room:
+
+    {"warehouse_id": ..., "updates": [{"product_id", "location_id", "warehouse_id", "quantity"}, ...]}
+
+Works for both Session and AsyncSession (AsyncSession.info is the sync session's info).
+"""
+from collections import defaultdict
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+from app.models.event_outbox import EventOutbox
+from app.websocket.coalescer import STOCK_UPDATED_EVENT
+from app.websocket.handlers import warehouse_room
+from app.websocket.outbox import wake_relay
+
+_PENDING_EVENTS_KEY = "pending_socket_events"
+_OUTBOX_WRITTEN_KEY = "socket_events_in_outbox"
+
+def _pending(db) -> list:
+    return db.info.setdefault(_PENDING_EVENTS_KEY, [])
+
+def record_event(db, event_name: str, data: dict, warehouse_id: str):
+    """Queue a Socket.IO event for the warehouse room, sent once `db` commits"""
+    _pending(db).append((event_name, data, warehouse_id))
+
+def record_stock_update(db, product_id: str, location_id: str, warehouse_id: str, quantity: float):
+    record_event(db, STOCK_UPDATED_EVENT, {
+        "product_id": product_id,
+        "location_id": location_id,
+        "warehouse_id": warehouse_id,
+        "quantity": quantity
+    }, warehouse_id)
+
+def record_low_stock_alert(db, product_id: str, warehouse_id: str, current_stock: float):
+    record_event(db, "low_stock:alert", {
+        "product_id": product_id,
+        "warehouse_id": warehouse_id,
+        "current_stock": current_stock
+    }, warehouse_id)
+
+def batch_events(events: list) -> list:
+    """(event, payload, room) outbox frames: one stock:updated per warehouse, other events as recorded"""
+    stock_updates = defaultdict(list)
+    frames = []
+    for event_name, data, warehouse_id in events:
+        if event_name == STOCK_UPDATED_EVENT:
+            stock_updates[warehouse_id].append(data)
+        else:
+            frames.append((event_name, data, warehouse_room(warehouse_id)))
+    for warehouse_id, updates in stock_updates.items():
+        frames.append((
+            STOCK_UPDATED_EVENT,
+            {"warehouse_id": warehouse_id, "updates": updates},
+            warehouse_room(warehouse_id)
+        ))
+    return frames
+
+@event.listens_for(Session, "before_commit")
+def _write_outbox(session):
+    events = session.info.pop(_PENDING_EVENTS_KEY, None)
+    if events:
+        session.connection().execute(insert(EventOutbox), [
+            {"event": event_name, "payload": payload, "room": room}
+            for event_name, payload, room in batch_events(events)
+        ])
+        session.info[_OUTBOX_WRITTEN_KEY] = True
+
+@event.listens_for(Session, "after_commit")
+def _wake_relay_on_commit(session):
+    if session.info.pop(_OUTBOX_WRITTEN_KEY, False):
+        wake_relay()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session):
+    session.info.pop(_PENDING_EVENTS_KEY, None)
+    session.info.pop(_OUTBOX_WRITTEN_KEY, None)
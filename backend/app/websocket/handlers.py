@@ -1,14 +1,55 @@
 import socketio
+from app.core.config import settings
 from app.core.database import SessionLocal
 
+class ReplayRecording:
+    """
+    Mixin for the message queue managers. Every emit is handled here on every worker,
+    locally on the one that sent it and from the broker on the others, so each frame
+    with a `seq` is passed to record_frame (set by replay.py to fill its ring buffer).
+    """
+    record_frame = None
+
+    async def _handle_emit(self, message):
+        data = message.get('data')
+        if self.record_frame is not None and message.get('room') and isinstance(data, dict) and 'seq' in data:
+            self.record_frame(message['room'], data['seq'], message['event'], data)
+        await super()._handle_emit(message)
+
+class RedisManager(ReplayRecording, socketio.AsyncRedisManager):
+    pass
+
+class AioPikaManager(ReplayRecording, socketio.AsyncAioPikaManager):
+    pass
+
+def create_client_manager():
+    """
+    Client manager selected by SOCKETIO_MANAGER. The message queue managers share rooms
+    and emits between workers through the broker at SOCKETIO_MESSAGE_QUEUE.
+    """
+    if settings.SOCKETIO_MANAGER == "memory":
+        return None  # socketio's default in-process manager
+    if settings.SOCKETIO_MANAGER == "redis":
+        return RedisManager(settings.SOCKETIO_MESSAGE_QUEUE, channel=settings.SOCKETIO_CHANNEL)
+    if settings.SOCKETIO_MANAGER == "aiopika":
+        return AioPikaManager(settings.SOCKETIO_MESSAGE_QUEUE, channel=settings.SOCKETIO_CHANNEL)
+    raise ValueError(f"Unknown SOCKETIO_MANAGER: {settings.SOCKETIO_MANAGER}")
+
+def uses_message_queue() -> bool:
+    return settings.SOCKETIO_MANAGER != "memory"
+
 # Create Socket.IO server
 sio = socketio.AsyncServer(
     cors_allowed_origins="*",
-    async_mode='asgi'
+    async_mode='asgi',
+    client_manager=create_client_manager()
 )
 
 sio_app = socketio.ASGIApp(sio)
 
+def warehouse_room(warehouse_id: str) -> str:
+    return f"warehouse:{warehouse_id}"
+
 @sio.event
 async def connect(sid, environ):
     print(f"Client connected: {sid}")
@@ -22,7 +63,7 @@ async def join_warehouse(sid, data):
     """Join a warehouse room for real-time updates"""
     warehouse_id = data.get('warehouse_id')
     if warehouse_id:
-        sio.enter_room(sid, f"warehouse:{warehouse_id}")
+        sio.enter_room(sid, warehouse_room(warehouse_id))
         await sio.emit('joined_warehouse', {'warehouse_id': warehouse_id}, room=sid)
 
 @sio.event
@@ -30,34 +71,4 @@ async def leave_warehouse(sid, data):
     """Leave a warehouse room"""
     warehouse_id = data.get('warehouse_id')
     if warehouse_id:
-        sio.leave_room(sid, f"warehouse:{warehouse_id}")
-
-async def emit_stock_update(product_id: str, location_id: str, warehouse_id: str, quantity: float):
-    """Emit stock update to all clients in the warehouse room"""
-    await sio.emit('stock:updated', {
-        'product_id': product_id,
-        'location_id': location_id,
-        'warehouse_id': warehouse_id,
-        'quantity': quantity
-    }, room=f"warehouse:{warehouse_id}")
-
-async def emit_receipt_created(receipt_data: dict, warehouse_id: str):
-    """Emit receipt creation event"""
-    await sio.emit('receipt:created', receipt_data, room=f"warehouse:{warehouse_id}")
-
-async def emit_delivery_created(delivery_data: dict, warehouse_id: str):
-    """Emit delivery creation event"""
-    await sio.emit('delivery:created', delivery_data, room=f"warehouse:{warehouse_id}")
-
-async def emit_transfer_created(transfer_data: dict, warehouse_id: str):
-    """Emit transfer creation event"""
-    await sio.emit('transfer:created', transfer_data, room=f"warehouse:{warehouse_id}")
-
-async def emit_low_stock_alert(product_id: str, warehouse_id: str, current_stock: float):
-    """Emit low stock alert"""
-    await sio.emit('low_stock:alert', {
-        'product_id': product_id,
-        'warehouse_id': warehouse_id,
-        'current_stock': current_stock
-    }, room=f"warehouse:{warehouse_id}")
-
+        sio.leave_room(sid, warehouse_room(warehouse_id))
@@ -0,0 +1,223 @@
+"""
+Outbox relay: publishes event_outbox rows to Socket.IO clients.
+
+With the in-memory client manager every worker runs its own relay, tailing event_outbox
+by id from where it started, so an event committed by any worker reaches sockets
+connected to every worker. With a message queue manager (SOCKETIO_MANAGER) emits already
+reach every worker, so only one relay runs: the worker holding a Postgres advisory lock.
+Its cursor is stored in data_versions, so a worker taking over after it resumes where it
+stopped. In-memory relays store their position there too (the highest one wins); outbox
+catch-up returns nothing past it (replay.py). A worker is woken right after its own
+commits and polls every OUTBOX_POLL_INTERVAL_SECONDS for the others'. Rows are emitted
+in id order and the cursor only moves past a row once it has been emitted, so a failed
+emit is retried (at-least-once). stock:updated rows go through a per-room coalescer
+(coalescer.py); the stored cursor never moves past a row still waiting in its buffer,
+and a buffer whose emit fails is kept for the next flush. Every frame is sent with its `seq` and kept in
+the replay buffer for reconnecting clients (replay.py). If an in-memory worker dies with
+updates still buffered, its clients reconnect and resume from their last `seq`, which
+replays the missed rows from the outbox.
+
+Ids are allocated when a row is inserted but become visible when its transaction
+commits, so a lower id can show up after a higher one. A rolled back insert leaves a
+permanent gap. event_outbox_next_id() gives the inserting transaction an xid before
+allocating the id. So when a higher id is visible, the missing one belongs to a
+transaction below that snapshot's xmax. The relay reads each batch in one REPEATABLE READ
+snapshot, together with the snapshot's xmin and xmax. It skips a gap once every
+transaction below the xmax seen with the gap has ended (xmin has reached it). At that
+point the missing row is either in the snapshot or rolled back. With no other writers in
+flight, that is immediate. OUTBOX_GAP_TIMEOUT_SECONDS only caps the wait while an
+unrelated long transaction is open. A relay starting from the newest row treats its start
+the same way and stores no position until the transactions below its starting xmax have
+ended, so the stored position never passes a lower id that can still commit. Rows older
+than OUTBOX_RETENTION_HOURS are deleted by the sweeper.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.core.config import settings
+from app.core.database import async_engine
+from app.models.data_version import DataVersion
+from app.models.event_outbox import EventOutbox
+from app.websocket.coalescer import STOCK_UPDATED_EVENT, StockUpdateCoalescer
+from app.websocket.handlers import sio, uses_message_queue
+from app.websocket.replay import RELAY_CURSOR_SCOPE, relay_cursor_query, replay_buffer
+
+SWEEP_BATCH_SIZE = 10000
+RELAY_LEADER_LOCK_ID = 7_302_115_001  # pg_advisory_lock key held by the relay leader
+# xid8 has no asyncpg codec; transaction ids fit a bigint
+SNAPSHOT_BOUNDS = text(
+    "SELECT pg_snapshot_xmin(s)::text::bigint AS xmin, pg_snapshot_xmax(s)::text::bigint AS xmax"
+    " FROM pg_current_snapshot() AS s"
+)
+
+_loop = None
+_wakeup = None
+
+async def publish(event: str, payload: dict, room: str):
+    if not uses_message_queue():  # The message queue manager records every worker's emits
+        replay_buffer.append(room, payload["seq"], event, payload)
+    await sio.emit(event, payload, room=room)
+
+coalescer = StockUpdateCoalescer(publish)
+
+def wake_relay():
+    """Wake this worker's relay now; safe to call from any thread"""
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+class OutboxRelay:
+    def __init__(self, persist_cursor: bool = False):
+        self.last_id = None
+        self.gap_xmax = None
+        self.gap_seen_at = None
+        self.start_xmax = None  # Set while the starting position may still be above an uncommitted id
+        self.started_at = None
+        self.saved_through = None
+        self.persist_cursor = persist_cursor
+
+    async def start(self):
+        """Resume from the stored cursor, else start from the newest row (clients load current state when they connect)"""
+        async with async_engine.connect() as connection:
+            await connection.execution_options(isolation_level="REPEATABLE READ")
+            if self.persist_cursor:
+                self.last_id = (await connection.execute(relay_cursor_query())).scalar_one_or_none()
+            if self.last_id is None:
+                self.start_xmax = (await connection.execute(SNAPSHOT_BOUNDS)).one().xmax
+                self.started_at = time.monotonic()
+                self.last_id = (await connection.execute(
+                    select(func.coalesce(func.max(EventOutbox.id), 0))
+                )).scalar_one()
+        replay_buffer.start(self.last_id, self.sent_through)
+
+    def sent_through(self):
+        """Outbox id through which every row has been emitted, or None while the start is unsettled"""
+        if self.start_xmax is not None:
+            return None
+        return coalescer.sent_through(self.last_id)
+
+    async def save_cursor(self):
+        through = self.sent_through()
+        async with async_engine.begin() as connection:
+            stmt = pg_insert(DataVersion).values(
+                scope=RELAY_CURSOR_SCOPE, version=through, updated_at=datetime.utcnow()
+            )
+            # In-memory relays each store theirs; none moves it back
+            version = stmt.excluded.version
+            if not self.persist_cursor:
+                version = func.greatest(DataVersion.version, version)
+            await connection.execute(stmt.on_conflict_do_update(
+                index_elements=[DataVersion.scope],
+                set_={"version": version, "updated_at": stmt.excluded.updated_at}
+            ))
+        self.saved_through = through
+
+    def _gap_settled(self, xmin: int, xmax: int) -> bool:
+        """True once no transaction that could still commit a missing id is running"""
+        if self.gap_xmax is None:
+            self.gap_xmax, self.gap_seen_at = xmax, time.monotonic()
+        return xmin >= self.gap_xmax or time.monotonic() - self.gap_seen_at >= settings.OUTBOX_GAP_TIMEOUT_SECONDS
+
+    async def relay_batch(self) -> bool:
+        """Emit the next batch of rows. Returns True when more rows are ready right away."""
+        async with async_engine.connect() as connection:
+            # One snapshot for the bounds and the rows, so a settled gap is final in `rows`
+            await connection.execution_options(isolation_level="REPEATABLE READ")
+            xmin, xmax = (await connection.execute(SNAPSHOT_BOUNDS)).one()
+            if self.start_xmax is not None and (
+                xmin >= self.start_xmax
+                or time.monotonic() - self.started_at >= settings.OUTBOX_GAP_TIMEOUT_SECONDS
+            ):
+                self.start_xmax = None
+            rows = (await connection.execute(
+                select(EventOutbox.id, EventOutbox.event, EventOutbox.room, EventOutbox.payload)
+                .where(EventOutbox.id > self.last_id)
+                .order_by(EventOutbox.id)
+                .limit(settings.OUTBOX_BATCH_SIZE)
+            )).all()
+
+        more = len(rows) == settings.OUTBOX_BATCH_SIZE
+        try:
+            for row in rows:
+                if row.id != self.last_id + 1 and not self._gap_settled(xmin, xmax):
+                    more = False
+                    break
+                self.gap_xmax = self.gap_seen_at = None
+                if row.event == STOCK_UPDATED_EVENT:
+                    await coalescer.add(row.room, row.payload, row.id)
+                else:
+                    await coalescer.flush(row.room)
+                    await publish(row.event, {**row.payload, "seq": row.id}, room=row.room)
+                self.last_id = row.id
+        finally:
+            # Also picks up buffers the coalescer flushed since the last batch
+            if self.sent_through() not in (None, self.saved_through):
+                await self.save_cursor()
+        return more
+
+async def run_outbox_relay():
+    """Background task: relay outbox rows, from every worker or from the elected leader"""
+    global _loop, _wakeup
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    if not uses_message_queue():
+        await _relay_forever(OutboxRelay())
+    while True:
+        try:
+            async with async_engine.connect() as lock_connection:
+                is_leader = (await lock_connection.execute(
+                    select(func.pg_try_advisory_lock(RELAY_LEADER_LOCK_ID))
+                )).scalar_one()
+                await lock_connection.commit()  # The session-level lock outlives the transaction
+                if is_leader:
+                    # Held until this connection closes, e.g. when the worker exits
+                    await _relay_forever(OutboxRelay(persist_cursor=True), lock_connection)
+        except Exception as e:
+            print(f"Outbox relay leader election error: {e}")
+        await asyncio.sleep(settings.OUTBOX_POLL_INTERVAL_SECONDS)
+
+async def _relay_forever(relay: OutboxRelay, lock_connection=None):
+    try:
+        while True:
+            if lock_connection is not None:
+                # Stop relaying (and re-elect) if the connection holding the leader lock is gone
+                await lock_connection.execute(select(1))
+                await lock_connection.commit()
+            try:
+                if relay.last_id is None:
+                    await relay.start()
+                while await relay.relay_batch():
+                    pass
+            except Exception as e:
+                print(f"Outbox relay error: {e}")
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.OUTBOX_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+    finally:
+        replay_buffer.stop()  # Catch-up falls back to the stored position of the new leader
+
+async def sweep_outbox() -> int:
+    """Delete rows past retention in batches. Returns the number of rows removed."""
+    cutoff = datetime.utcnow() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+    removed = 0
+    while True:
+        async with async_engine.begin() as connection:
+            expired = select(EventOutbox.id).where(
+                EventOutbox.created_at < cutoff
+            ).limit(SWEEP_BATCH_SIZE).scalar_subquery()
+            result = await connection.execute(delete(EventOutbox).where(EventOutbox.id.in_(expired)))
+        removed += result.rowcount
+        if result.rowcount < SWEEP_BATCH_SIZE:
+            return removed
+
+async def run_outbox_sweeper():
+    """Background task: sweep old outbox rows every OUTBOX_SWEEP_INTERVAL_SECONDS"""
+    while True:
+        try:
+            await sweep_outbox()
+        except Exception as e:
+            print(f"Outbox sweeper error: {e}")
+        await asyncio.sleep(settings.OUTBOX_SWEEP_INTERVAL_SECONDS)
@@ -0,0 +1,140 @@
+"""
+Catch-up for clients that reconnect after missing events.
+
+Every relayed frame carries `seq`, the id of the last event_outbox row it includes.
+Within a warehouse room seqs only increase, and they are the same on every worker, so
+a client keeps the last seq it saw per warehouse and on reconnect sends
+
+    resume {"warehouse_id": ..., "last_seq": ...}
+
+It is put back in the room and sent the frames it missed, from this worker's bounded
+in-memory ring buffer (REPLAY_BUFFER_SIZE frames per room) or, when the ring does not
+reach back that far, from the outbox table. Only when the outbox does not either (rows
+swept, or more than REPLAY_BUFFER_SIZE missed frames) does it get `resync` and should
+reload /stock. GET /api/v1/stock/changes serves the same catch-up over HTTP.
+
+Catch-up from the outbox stops at the relay's sent position: the id through which the
+relay has emitted every row (outbox.py). Reading the table past it could return a row
+while a lower id is still uncommitted. The client would then move last_seq past that id
+and drop the lower row when the relay sends it. It could also return a stock:updated
+row still waiting in a coalescer buffer, and the merged frame would apply it twice.
+`resume` uses this worker's own relay position when it relays. Otherwise, and for the
+HTTP endpoint, it uses the position the relays store in data_versions.
+
+With the in-memory manager the worker's own relay fills the ring. With a message queue
+manager only the leader relays, so every worker fills it from the emits it handles, its
+own or the broker's (handlers.py). A worker that was not subscribed yet when a room's
+earlier frames went out keeps that room from the first frame it receives.
+"""
+from collections import deque
+from typing import Callable, Optional
+from sqlalchemy import func, select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.data_version import DataVersion
+from app.models.event_outbox import EventOutbox
+from app.websocket.handlers import sio, uses_message_queue, warehouse_room
+
+RELAY_CURSOR_SCOPE = "event_outbox:relayed"  # data_versions row holding the relays' sent position
+
+class ReplayBuffer:
+    def __init__(self, size: int = None):
+        self.size = size or settings.REPLAY_BUFFER_SIZE
+        self.frames = {}
+        self.dropped_through = {}  # Highest seq evicted per room
+        self.started_after = None  # Relay cursor when this worker started relaying
+        self.relay_position = None  # This worker's relay sent position, while it relays
+
+    def start(self, cursor: int, relay_position: Callable[[], Optional[int]]):
+        self.started_after = cursor
+        self.relay_position = relay_position
+
+    def stop(self):
+        """This worker no longer relays (it lost the leader lock)"""
+        self.relay_position = None
+
+    def sent_through(self) -> Optional[int]:
+        """Outbox id through which this worker's relay has emitted every row, if it relays"""
+        return self.relay_position() if self.relay_position is not None else None
+
+    def append(self, room: str, seq: int, event: str, payload: dict):
+        if self.started_after is None:
+            # Recording another worker's relay: within a room seqs only increase, so
+            # every later frame of this room is kept from here on
+            self.dropped_through.setdefault(room, seq - 1)
+        frames = self.frames.setdefault(room, deque())
+        frames.append((seq, event, payload))
+        if len(frames) > self.size:
+            self.dropped_through[room] = frames.popleft()[0]
+
+    def since(self, room: str, last_seq: int) -> Optional[list]:
+        """Frames after last_seq, or None when this buffer does not reach back that far"""
+        kept_after = self.dropped_through.get(room, self.started_after)
+        if kept_after is None or last_seq < kept_after:
+            return None
+        return [frame for frame in self.frames.get(room, ()) if frame[0] > last_seq]
+
+replay_buffer = ReplayBuffer()
+if uses_message_queue():
+    sio.manager.record_frame = replay_buffer.append
+
+def relay_cursor_query():
+    return select(DataVersion.version).where(DataVersion.scope == RELAY_CURSOR_SCOPE)
+
+def outbox_changes_query(room: str, since: int, through: int, limit: int):
+    """Rows of `room` after `since`, up to the relay's sent position `through`"""
+    return select(EventOutbox.id, EventOutbox.event, EventOutbox.payload).where(
+        EventOutbox.room == room,
+        EventOutbox.id > since,
+        EventOutbox.id <= through
+    ).order_by(EventOutbox.id).limit(limit)
+
+def oldest_outbox_id_query():
+    return select(func.min(EventOutbox.id))
+
+def is_covered(oldest_id: Optional[int], since: int) -> bool:
+    """Whether the outbox still holds every row after `since`"""
+    return oldest_id is None or since >= oldest_id - 1
+
+def outbox_frame(row) -> tuple:
+    return (row.id, row.event, {**row.payload, "seq": row.id})
+
+async def outbox_changes(room: str, since: int) -> Optional[list]:
+    """Missed frames from the outbox, or None when they are no longer all there"""
+    limit = settings.REPLAY_BUFFER_SIZE
+    async with AsyncSessionLocal() as db:
+        oldest_id = await db.scalar(oldest_outbox_id_query())
+        if not is_covered(oldest_id, since):
+            return None
+        through = replay_buffer.sent_through()
+        if through is None:
+            through = await db.scalar(relay_cursor_query())
+        if through is None or through <= since:
+            return []
+        rows = (await db.execute(outbox_changes_query(room, since, through, limit + 1))).all()
+    if len(rows) > limit:
+        return None
+    return [outbox_frame(row) for row in rows]
+
+@sio.event
+async def resume(sid, data):
+    """Rejoin a warehouse room and replay what was missed since last_seq"""
+    warehouse_id = data.get('warehouse_id')
+    last_seq = data.get('last_seq')
+    if not warehouse_id:
+        return
+    if last_seq is not None and (not isinstance(last_seq, int) or isinstance(last_seq, bool)):
+        return {'error': 'last_seq must be an integer'}
+    room = warehouse_room(warehouse_id)
+    # Join first so nothing falls between the replay and live frames (duplicates have seq <= last seen)
+    sio.enter_room(sid, room)
+
+    frames = replay_buffer.since(room, last_seq) if last_seq is not None else None
+    if frames is None and last_seq is not None:
+        frames = await outbox_changes(room, last_seq)
+    if frames is None:
+        await sio.emit('resync', {'warehouse_id': warehouse_id}, room=sid)
+        return
+    for seq, event, payload in frames:
+        await sio.emit(event, payload, room=sid)
+    await sio.emit('resumed', {'warehouse_id': warehouse_id, 'replayed': len(frames)}, room=sid)
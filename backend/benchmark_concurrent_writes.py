@@ -0,0 +1,127 @@
+"""
+Benchmark concurrent create / validate latency against a running backend.
+
+Fires REQUESTS transfer creates and then REQUESTS transfer validations with CONCURRENCY
+requests in flight, while a probe polls the Socket.IO endpoint (served directly on the
+event loop) every PROBE_INTERVAL seconds. When the write endpoints block the event loop,
+the probe latency climbs to the duration of a whole validation; with the async session
+it stays flat.
+
+Usage (server running on http://localhost:8000, with at least one warehouse, two
+locations and a few products):
+    python benchmark_concurrent_writes.py [requests] [concurrency] [items_per_transfer]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import aiohttp
+
+BASE_URL = "http://localhost:8000"
+API_URL = f"{BASE_URL}/api/v1"
+PROBE_URL = f"{BASE_URL}/socket.io/?EIO=4&transport=polling"
+PROBE_INTERVAL = 0.01
+
+def summarize(name, latencies, elapsed=None):
+    if not latencies:
+        print(f"{name:<22} no samples")
+        return
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) >= 20 else latencies[-1]
+    line = (
+        f"{name:<22} n={len(latencies):<5} p50={statistics.median(latencies) * 1000:8.1f}ms "
+        f"p95={p95 * 1000:8.1f}ms max={latencies[-1] * 1000:8.1f}ms"
+    )
+    if elapsed:
+        line += f"  {len(latencies) / elapsed:7.1f} req/s"
+    print(line)
+
+async def timed(session, method, url, **kwargs):
+    start = time.perf_counter()
+    async with session.request(method, url, **kwargs) as response:
+        body = await response.json(content_type=None)
+        if response.status >= 400:
+            raise RuntimeError(f"{method} {url} -> {response.status}: {body}")
+    return time.perf_counter() - start, body
+
+async def probe(session, stop, latencies):
+    while not stop.is_set():
+        try:
+            latency, _ = await timed(session, "GET", PROBE_URL)
+            latencies.append(latency)
+        except Exception:
+            pass
+        await asyncio.sleep(PROBE_INTERVAL)
+
+async def run_phase(session, name, requests, concurrency):
+    """Run (method, url, json) requests with `concurrency` in flight; returns the response bodies"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, probe_latencies = [], []
+
+    async def one(method, url, payload):
+        async with semaphore:
+            latency, body = await timed(session, method, url, json=payload)
+            latencies.append(latency)
+            return body
+
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(session, stop, probe_latencies))
+    start = time.perf_counter()
+    bodies = await asyncio.gather(*(one(*request) for request in requests))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await prober
+
+    summarize(name, latencies, elapsed)
+    summarize("  event loop probe", probe_latencies)
+    return bodies
+
+async def main(total, concurrency, items_per_transfer):
+    async with aiohttp.ClientSession() as session:
+        _, locations = await timed(session, "GET", f"{API_URL}/locations")
+        _, products = await timed(session, "GET", f"{API_URL}/products")
+        if len(locations) < 2 or not products:
+            print("Need at least two locations and one product")
+            return
+        source, destination = locations[0], locations[1]
+        products = products[:items_per_transfer]
+
+        # Enough stock at the source that no transfer fails validation
+        for product in products:
+            await timed(
+                session, "PUT", f"{API_URL}/stock/{product['id']}/{source['id']}",
+                json={"quantity": 1_000_000_000, "reason": "benchmark"}
+            )
+
+        print(f"{total} transfers x {len(products)} items, {concurrency} concurrent\n")
+        idle_probe = []
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe(session, stop, idle_probe))
+        await asyncio.sleep(1)
+        stop.set()
+        await prober
+        summarize("idle event loop probe", idle_probe)
+
+        payload = {
+            "from_warehouse_id": source["warehouse_id"],
+            "from_location_id": source["id"],
+            "to_warehouse_id": destination["warehouse_id"],
+            "to_location_id": destination["id"],
+            "schedule_date": datetime.utcnow().isoformat(),
+            "products": [{"product_id": product["id"], "quantity": 1} for product in products],
+        }
+        created = await run_phase(
+            session, "POST /transfers", [("POST", f"{API_URL}/transfers", payload)] * total, concurrency
+        )
+        await run_phase(
+            session, "POST /transfers/{id}/validate",
+            [("POST", f"{API_URL}/transfers/{transfer['id']}/validate", None) for transfer in created],
+            concurrency
+        )
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    total, concurrency, items_per_transfer = args + [200, 20, 10][len(args):]
+    asyncio.run(main(total, concurrency, items_per_transfer))
@@ -0,0 +1,78 @@
+"""
+Benchmark the bulk product import (POST /products/bulk, app/utils/product_import.py).
+
+Generates a synthetic catalog, imports it twice in-process against DATABASE_URL (the
+first run inserts every product, the second updates them all) in CSV and then NDJSON,
+and prints rows per second for each run. Every product it creates has a BENCH- SKU and
+is deleted at the end.
+
+    python benchmark_product_import.py [rows]
+"""
+import csv
+import io
+import random
+import sys
+
+import orjson
+
+from app.core.database import SessionLocal
+from app.models.product import Product
+from app.utils.product_import import CSV_FORMAT, NDJSON_FORMAT, import_products
+
+SKU_PREFIX = "BENCH-"
+COLUMNS = ["sku", "name", "unit_of_measure", "unit_cost"]
+
+def synthetic_rows(count, seed):
+    rng = random.Random(seed)
+    return [
+        {
+            "sku": f"{SKU_PREFIX}{i:08d}",
+            "name": f"Benchmark product {i} rev {seed}",
+            "unit_of_measure": rng.choice(["pcs", "kg", "m", "box"]),
+            "unit_cost": round(rng.uniform(0.1, 500), 2),
+        }
+        for i in range(count)
+    ]
+
+def as_csv(rows) -> bytes:
+    text = io.StringIO()
+    writer = csv.DictWriter(text, COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    return text.getvalue().encode()
+
+def as_ndjson(rows) -> bytes:
+    return b"".join(orjson.dumps(row) + b"\n" for row in rows)
+
+def run(label, body, file_format):
+    db = SessionLocal()
+    try:
+        result = import_products(db, io.BytesIO(body), file_format)
+        print(
+            f"{label:<22} {result.total_rows:>9,} rows  {result.elapsed_seconds:7.2f}s  "
+            f"{result.total_rows / result.elapsed_seconds:>10,.0f} rows/s  "
+            f"(inserted {result.inserted:,}, updated {result.updated:,}, failed {result.failed:,})"
+        )
+    finally:
+        db.close()
+
+def cleanup():
+    db = SessionLocal()
+    try:
+        db.query(Product).filter(Product.sku.startswith(SKU_PREFIX)).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def main(count):
+    cleanup()
+    try:
+        for file_format, encode in ((CSV_FORMAT, as_csv), (NDJSON_FORMAT, as_ndjson)):
+            run(f"{file_format} insert", encode(synthetic_rows(count, 1)), file_format)
+            run(f"{file_format} update", encode(synthetic_rows(count, 2)), file_format)
+            cleanup()
+    finally:
+        cleanup()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,111 @@
+"""
+Benchmark the in-memory product search index (app/core/product_search.py).
+
+Builds the index over a synthetic catalog (default 500,000 products), then times
+lookups for SKU prefixes, name word prefixes and substrings, plus incremental updates.
+No database needed.
+
+    python benchmark_product_search.py [products] [queries_per_kind]
+
+With --db it also times the `ilike '%q%'` query /products/search used to run, against
+the products table in DATABASE_URL.
+"""
+import random
+import statistics
+import string
+import sys
+import time
+from types import SimpleNamespace
+
+from app.core.product_search import ProductSearchIndex, SEARCH_LIMIT
+
+WORDS = [
+    "steel", "bolt", "nut", "washer", "screw", "hex", "socket", "bracket", "hinge", "valve",
+    "pipe", "elbow", "flange", "gasket", "bearing", "shaft", "pulley", "belt", "chain", "sprocket",
+    "copper", "brass", "zinc", "plated", "galvanized", "stainless", "nylon", "rubber", "seal", "ring",
+    "cable", "tie", "clamp", "hose", "fitting", "coupling", "adapter", "reducer", "tee", "cap",
+    "small", "medium", "large", "heavy", "duty", "mini", "metric", "imperial", "black", "white",
+]
+
+def synthetic_catalog(count, seed=7):
+    rng = random.Random(seed)
+    products = []
+    for i in range(count):
+        name = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))) + f" {rng.randint(1, 500)}mm"
+        sku = "".join(rng.choice(string.ascii_uppercase) for _ in range(3)) + f"-{i:07d}"
+        products.append(SimpleNamespace(id=f"p{i}", name=name.title(), sku=sku))
+    return products
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (
+        statistics.median(samples) * 1000,
+        samples[int(len(samples) * 0.99) - 1] * 1000,
+        samples[-1] * 1000,
+    )
+
+def time_queries(index, label, queries):
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        index.search(q, SEARCH_LIMIT)
+        samples.append(time.perf_counter() - start)
+    p50, p99, worst = percentiles(samples)
+    print(f"{label:<28} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  max {worst:7.3f} ms")
+
+def time_db(queries):
+    from app.core.database import SessionLocal
+    from app.models.product import Product
+    db = SessionLocal()
+    try:
+        samples = []
+        for q in queries:
+            start = time.perf_counter()
+            db.query(Product).filter(
+                (Product.name.ilike(f"%{q}%")) | (Product.sku.ilike(f"%{q}%"))
+            ).limit(SEARCH_LIMIT).all()
+            samples.append(time.perf_counter() - start)
+        p50, p99, worst = percentiles(samples)
+        print(f"{'database ilike':<28} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  max {worst:7.3f} ms")
+    finally:
+        db.close()
+
+def main(count, rounds, with_db):
+    rng = random.Random(11)
+    catalog = synthetic_catalog(count)
+
+    index = ProductSearchIndex()
+    start = time.perf_counter()
+    index.rebuild(catalog)
+    print(f"Built index over {len(index):,} products in {time.perf_counter() - start:.2f}s")
+
+    samples = rng.sample(catalog, rounds)
+    sku_prefixes = [product.sku[:rng.randint(3, 6)].lower() for product in samples]
+    word_prefixes = [rng.choice(WORDS)[:rng.randint(2, 5)] for _ in range(rounds)]
+    substrings = [product.name.lower()[2:rng.randint(6, 10)] for product in samples]
+    short = [rng.choice(string.ascii_lowercase) for _ in range(rounds)]
+
+    time_queries(index, "SKU prefix (3-6 chars)", sku_prefixes)
+    time_queries(index, "name word prefix (2-5)", word_prefixes)
+    time_queries(index, "substring (4-8 chars)", substrings)
+    time_queries(index, "single character", short)
+
+    updates = []
+    for product in rng.sample(catalog, min(rounds, 1000)):
+        renamed = SimpleNamespace(id=product.id, name=product.name + " Rev B", sku=product.sku)
+        start = time.perf_counter()
+        index.upsert([renamed])
+        updates.append(time.perf_counter() - start)
+    p50, p99, worst = percentiles(updates)
+    print(f"{'update (rename)':<28} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  max {worst:7.3f} ms")
+
+    if with_db:
+        time_db(sku_prefixes[:100] + word_prefixes[:100] + substrings[:100])
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--db"]
+    main(
+        int(args[0]) if args else 500_000,
+        int(args[1]) if len(args) > 1 else 1000,
+        "--db" in sys.argv
+    )
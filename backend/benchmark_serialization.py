@@ -0,0 +1,114 @@
+"""
+Benchmark response serialization for /transfers, /deliveries, /receipts and /stock.
+
+Default (in-process, against DATABASE_URL): loads one page of each document type once,
+then times the previous path - `{**obj.__dict__, ...}` dicts, response_model validation
+and serialization through pydantic, stdlib json - against the explicit mappers plus
+orjson used by the endpoints now. For /stock it compares jsonable_encoder + json with
+orjson on the same rows.
+
+    python benchmark_serialization.py [rounds]
+
+With --http it measures end-to-end requests per second against a running server
+instead, e.g. to compare two checkouts:
+
+    python benchmark_serialization.py --http [requests]
+"""
+import json
+import sys
+import time
+from typing import List
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core.database import SessionLocal
+from app.models.delivery import Delivery
+from app.models.receipt import Receipt
+from app.models.transfer import Transfer
+from app.schemas.delivery import DeliveryResponse
+from app.schemas.receipt import ReceiptResponse
+from app.schemas.transfer import TransferResponse
+from app.api.v1.endpoints.deliveries import DELIVERY_LOAD_OPTIONS, _delivery_to_dict
+from app.api.v1.endpoints.receipts import RECEIPT_LOAD_OPTIONS, _receipt_to_dict
+from app.api.v1.endpoints.transfers import TRANSFER_LOAD_OPTIONS, _transfer_to_dict
+
+BASE_URL = "http://localhost:8000/api/v1"
+PAGE_SIZE = 100
+
+def legacy_dict(doc, names: dict) -> dict:
+    """The `**obj.__dict__` spreading the endpoints used to do"""
+    return {
+        **doc.__dict__,
+        **{key: getattr(doc, relation).name if getattr(doc, relation) else None for key, relation in names.items()},
+        "responsible_name": doc.responsible_user.full_name if doc.responsible_user else None,
+        "items": [
+            {**item.__dict__, "product_name": item.product.name if item.product else None}
+            for item in doc.items
+        ]
+    }
+
+DOCUMENTS = [
+    ("/transfers", Transfer, TRANSFER_LOAD_OPTIONS, TransferResponse, _transfer_to_dict, {
+        "from_warehouse_name": "from_warehouse", "from_location_name": "from_location",
+        "to_warehouse_name": "to_warehouse", "to_location_name": "to_location",
+    }),
+    ("/deliveries", Delivery, DELIVERY_LOAD_OPTIONS, DeliveryResponse, _delivery_to_dict, {
+        "warehouse_name": "warehouse", "location_name": "location",
+    }),
+    ("/receipts", Receipt, RECEIPT_LOAD_OPTIONS, ReceiptResponse, _receipt_to_dict, {
+        "warehouse_name": "warehouse", "location_name": "location",
+    }),
+]
+
+def timed(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+def report(path, count, before, after):
+    print(
+        f"{path:<12} {count:>4} rows  before {before * 1000:8.2f} ms  after {after * 1000:8.2f} ms  "
+        f"({before / after:4.1f}x)"
+    )
+
+def run_in_process(rounds):
+    db = SessionLocal()
+    try:
+        for path, model, load_options, schema, mapper, names in DOCUMENTS:
+            docs = db.query(model).options(*load_options).order_by(model.created_at.desc()).limit(PAGE_SIZE).all()
+            adapter = TypeAdapter(List[schema])
+            before = timed(lambda: json.dumps(
+                adapter.dump_python(adapter.validate_python([legacy_dict(doc, names) for doc in docs]), mode="json")
+            ).encode(), rounds)
+            after = timed(lambda: orjson.dumps([mapper(doc) for doc in docs]), rounds)
+            report(path, len(docs), before, after)
+
+        from fastapi.testclient import TestClient
+        from app.main import app
+        rows = TestClient(app).get("/api/v1/stock").json()
+        before = timed(lambda: json.dumps(jsonable_encoder(rows)).encode(), rounds)
+        after = timed(lambda: orjson.dumps(rows), rounds)
+        report("/stock", len(rows), before, after)
+    finally:
+        db.close()
+
+def run_http(total):
+    import requests
+    session = requests.Session()
+    for path in ("/transfers", "/deliveries", "/receipts", "/stock"):
+        start = time.perf_counter()
+        for _ in range(total):
+            response = session.get(f"{BASE_URL}{path}")
+            response.raise_for_status()
+        elapsed = time.perf_counter() - start
+        print(f"GET {path:<12} {total / elapsed:8.1f} req/s  ({elapsed / total * 1000:.2f} ms/request)")
+
+if __name__ == "__main__":
+    if "--http" in sys.argv:
+        args = [arg for arg in sys.argv[1:] if arg != "--http"]
+        run_http(int(args[0]) if args else 200)
+    else:
+        run_in_process(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,109 @@
+"""
+Socket.IO broadcast load test across several workers sharing a message queue.
+
+Starts 1..MAX_WORKERS uvicorn processes (one port each) with SOCKETIO_MANAGER=redis,
+connects CLIENTS_PER_WORKER socket clients to every worker and has them join one
+warehouse room, then publishes MESSAGES events to that room through a write-only
+manager on the same queue. Prints deliveries per second for each worker count.
+
+Needs the database from .env and a broker; a local Redis stands in for production:
+    docker run --rm -p 6379:6379 redis:7
+    python loadtest_socketio_broadcast.py [max_workers] [clients_per_worker] [messages]
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import aiohttp
+import socketio
+
+MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE", "redis://localhost:6379/0")
+CHANNEL = os.environ.get("SOCKETIO_CHANNEL", "stockmaster-socketio")
+BASE_PORT = 8100
+ROOM_WAREHOUSE_ID = "loadtest"
+
+def start_worker(port):
+    env = dict(os.environ, SOCKETIO_MANAGER="redis", SOCKETIO_MESSAGE_QUEUE=MESSAGE_QUEUE, SOCKETIO_CHANNEL=CHANNEL)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+
+async def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"http://localhost:{port}/health") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Worker on port {port} did not start")
+
+async def connect_client(port, received):
+    client = socketio.AsyncClient()
+    joined = asyncio.Event()
+
+    @client.on("stock:updated")
+    async def on_stock_updated(data):
+        received[0] += 1
+
+    @client.on("joined_warehouse")
+    async def on_joined(data):
+        joined.set()
+
+    await client.connect(f"http://localhost:{port}", transports=["websocket"])
+    await client.emit("join_warehouse", {"warehouse_id": ROOM_WAREHOUSE_ID})
+    await asyncio.wait_for(joined.wait(), timeout=10)
+    return client
+
+async def run_round(ports, clients_per_worker, messages):
+    received = [0]
+    clients = [
+        await connect_client(port, received)
+        for port in ports
+        for _ in range(clients_per_worker)
+    ]
+    expected = len(clients) * messages
+    publisher = socketio.AsyncRedisManager(MESSAGE_QUEUE, channel=CHANNEL, write_only=True)
+    payload = {
+        "warehouse_id": ROOM_WAREHOUSE_ID,
+        "updates": [{"product_id": "p", "location_id": "l", "warehouse_id": ROOM_WAREHOUSE_ID, "quantity": 1}]
+    }
+
+    start = time.perf_counter()
+    for _ in range(messages):
+        await publisher.emit("stock:updated", payload, room=f"warehouse:{ROOM_WAREHOUSE_ID}")
+    while received[0] < expected and time.perf_counter() - start < 60:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{len(ports)} worker(s), {len(clients)} clients: {received[0]}/{expected} delivered "
+        f"in {elapsed:.2f}s -> {received[0] / elapsed:,.0f} deliveries/s"
+    )
+    for client in clients:
+        await client.disconnect()
+
+async def main(max_workers, clients_per_worker, messages):
+    workers = []
+    try:
+        for count in range(1, max_workers + 1):
+            port = BASE_PORT + count - 1
+            workers.append(start_worker(port))
+            await wait_until_up(port)
+            await run_round([BASE_PORT + i for i in range(count)], clients_per_worker, messages)
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:4]]
+    max_workers, clients_per_worker, messages = args + [4, 50, 1000][len(args):]
+    asyncio.run(main(max_workers, clients_per_worker, messages))
@@ -0,0 +1,90 @@
+"""Statement recording, N+1 detection and query budgets for request-level tests.
+
+record_statements() captures every SQL statement sent through the sync engine, the
+async engine and the read replica engine (when configured) while it is active. Reference
+cache loads (app/core/reference_cache.py) are amortized across requests and left out. Each statement is reduced to its shape: bind
+parameters become `?` and IN / VALUES lists collapse to a single entry. A query issued
+once per row then shows up as one shape executed many times, whatever its parameters.
+
+    with record_statements() as log:
+        client.get("/api/v1/receipts")
+    assert not budget_errors(log, budget=2)
+"""
+import re
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterable, List
+
+from sqlalchemy import event
+
+from app.core.database import async_engine, engine, read_engine
+
+# A shape executed this many times in one request is reported as an N+1
+N_PLUS_ONE_REPEATS = 3
+
+_PARAMETER = re.compile(r"%\(\w+\)s|%s|\$\d+|\?")
+_NUMBER = re.compile(r"\b\d+\b")
+_CAST = re.compile(r"\?::\w+(?:\[\])?")
+_PARAMETER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_LIST = re.compile(r"(\(\?\))(?:\s*,\s*\(\?\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """The statement with parameters, literals and list lengths taken out"""
+    shape = _PARAMETER.sub("?", statement)
+    shape = _NUMBER.sub("?", shape)
+    shape = _CAST.sub("?", shape)
+    shape = _PARAMETER_LIST.sub("(?)", shape)
+    shape = _VALUES_LIST.sub(r"\1", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+class StatementLog:
+    def __init__(self):
+        self.statements: List[str] = []
+
+    def __len__(self):
+        return len(self.statements)
+
+    def add(self, statement: str):
+        self.statements.append(statement)
+
+    def shapes(self) -> Counter:
+        return Counter(statement_shape(statement) for statement in self.statements)
+
+    def repeated(self, min_repeats: int = N_PLUS_ONE_REPEATS) -> dict:
+        """Shapes executed at least `min_repeats` times (likely N+1), with their counts"""
+        return {shape: count for shape, count in self.shapes().items() if count >= min_repeats}
+
+@contextmanager
+def record_statements():
+    log = StatementLog()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not context.execution_options.get("reference_cache"):
+            log.add(statement)
+
+    engines = {engine, async_engine.sync_engine, read_engine}
+    for target in engines:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield log
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+def budget_errors(log: StatementLog, budget: int, allow_repeats: bool = False) -> List[str]:
+    """Why a request's statements break its budget or look like an N+1 (empty when fine)"""
+    errors = []
+    if len(log) > budget:
+        errors.append(f"{len(log)} statements, budget {budget}")
+    if not allow_repeats:
+        errors += [
+            f"same statement {count} times (N+1?): {shape[:160]}"
+            for shape, count in log.repeated().items()
+        ]
+    return errors
+
+def describe(log: StatementLog) -> Iterable[str]:
+    """One line per distinct shape, most frequent first, for failure output"""
+    for shape, count in log.shapes().most_common():
+        yield f"    {count}x {shape[:200]}"
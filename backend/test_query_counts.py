@@ -0,0 +1,141 @@
+"""Check that document endpoints issue a constant number of SQL statements per page.
+
+Runs the app in-process against DATABASE_URL and counts the statements each request
+sends. Listing 5 documents and listing 50 must cost the same number of queries; a
+growing count means a relationship is being lazy-loaded per row (N+1). Reference cache
+loads (app/core/reference_cache.py) are amortized across requests and not counted.
+"""
+import sys
+
+from fastapi.testclient import TestClient
+from app.main import app
+from query_budget import record_statements
+
+client = TestClient(app)
+
+DOCUMENT_ENDPOINTS = ["/api/v1/receipts", "/api/v1/deliveries", "/api/v1/transfers"]
+# Header query + one SELECT ... IN for the items and their products
+MAX_STATEMENTS_PER_PAGE = 2
+MAX_STATEMENTS_PER_DOCUMENT = 2
+HEADER_FIELDS = "reference,status,schedule_date,responsible_name"
+
+def get_counted(url, **params):
+    with record_statements() as statements:
+        response = client.get(url, params=params)
+    assert response.status_code == 200, f"GET {url} returned {response.status_code}: {response.text}"
+    return response.json(), len(statements)
+
+def post_counted(url, body):
+    with record_statements() as statements:
+        response = client.post(url, json=body)
+    assert response.status_code == 200, f"POST {url} returned {response.status_code}: {response.text}"
+    return response.json(), len(statements)
+
+def test_list_query_count_is_constant():
+    """Small and large pages of every document list cost the same number of statements"""
+    for url in DOCUMENT_ENDPOINTS:
+        small_page, small_count = get_counted(url, limit=5)
+        large_page, large_count = get_counted(url, limit=100)
+        print(f"GET {url}: {len(small_page)} docs -> {small_count} statements, "
+              f"{len(large_page)} docs -> {large_count} statements")
+        assert small_count == large_count, f"{url} statement count grows with page size"
+        assert large_count <= MAX_STATEMENTS_PER_PAGE, f"{url} used {large_count} statements"
+
+def test_detail_query_count():
+    """Fetching one document with its items is a fixed, small number of statements"""
+    for url in DOCUMENT_ENDPOINTS:
+        documents, _ = get_counted(url, limit=1)
+        if not documents:
+            print(f"⚠️  Skipping GET {url}/{{id}} - no documents")
+            continue
+        _, count = get_counted(f"{url}/{documents[0]['id']}")
+        print(f"GET {url}/{{id}}: {count} statements")
+        assert count <= MAX_STATEMENTS_PER_DOCUMENT, f"{url}/{{id}} used {count} statements"
+
+def test_header_only_list_is_one_query():
+    """A header-only page (?fields= without include=items) is a single statement and has no items"""
+    for url in DOCUMENT_ENDPOINTS:
+        page, count = get_counted(url, limit=100, fields=HEADER_FIELDS)
+        print(f"GET {url}?fields=...: {len(page)} docs -> {count} statements")
+        assert count == 1, f"{url}?fields= used {count} statements"
+        for document in page:
+            assert set(document) == {"id", *HEADER_FIELDS.split(",")}, f"{url}?fields= returned {sorted(document)}"
+        _, count = get_counted(url, limit=100, fields=HEADER_FIELDS, include="items")
+        assert count <= MAX_STATEMENTS_PER_PAGE, f"{url}?fields=&include=items used {count} statements"
+
+def test_cursor_pages_follow_each_other():
+    """Following X-Next-Cursor walks the same rows as offset paging, without overlaps"""
+    for url in DOCUMENT_ENDPOINTS + ["/api/v1/products"]:
+        first = client.get(url, params={"limit": 5})
+        next_cursor = first.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            print(f"⚠️  Skipping {url} cursor check - fewer than 6 rows")
+            continue
+        second = client.get(url, params={"limit": 5, "cursor": next_cursor})
+        by_offset = client.get(url, params={"limit": 5, "skip": 5})
+        assert second.status_code == 200, f"{url}?cursor= returned {second.status_code}"
+        ids = [row["id"] for row in second.json()]
+        assert ids == [row["id"] for row in by_offset.json()], f"{url} cursor page differs from skip=5"
+        assert not set(ids) & {row["id"] for row in first.json()}, f"{url} pages overlap"
+
+def test_lookups_are_one_query():
+    """Batch lookups of products and stock pairs are one statement whatever their size"""
+    products = client.get("/api/v1/products", params={"limit": 100}).json()
+    locations = client.get("/api/v1/locations").json()
+    if not products or not locations:
+        print("⚠️  Skipping lookup checks - no products or locations")
+        return
+    for size in (1, len(products)):
+        sample = products[:size]
+        result, count = post_counted("/api/v1/products/lookup", {
+            "ids": [product["id"] for product in sample[::2]],
+            "skus": [product["sku"] for product in sample[1::2]],
+        })
+        print(f"POST /products/lookup: {size} products -> {count} statements")
+        assert count == 1, f"/products/lookup used {count} statements"
+        assert [product["id"] for product in result["products"]] == (
+            [product["id"] for product in sample[::2]] + [product["id"] for product in sample[1::2]]
+        ), "/products/lookup did not keep the request order"
+
+        pairs = [
+            {"product_id": product["id"], "location_id": location["id"]}
+            for product in sample for location in locations[:10]
+        ]
+        rows, count = post_counted("/api/v1/stock/lookup", {"pairs": pairs[:1000]})
+        print(f"POST /stock/lookup: {len(rows)} pairs -> {count} statements")
+        assert count == 1, f"/stock/lookup used {count} statements"
+
+def test_batch_costs_its_sub_requests():
+    """A /batch of GETs returns what each GET returns, for the same statements in total"""
+    urls = ["/dashboard/stats", "/dashboard/pending-operations?limit=10", "/locations", "/stock?search=a"]
+    expected, separate_count = [], 0
+    for url in urls:
+        body, count = get_counted(f"/api/v1{url}")
+        expected.append(body)
+        separate_count += count
+    result, batch_count = post_counted("/api/v1/batch", {"requests": [{"id": str(i), "url": url} for i, url in enumerate(urls)]})
+    print(f"POST /batch: {len(urls)} requests -> {batch_count} statements ({separate_count} one by one)")
+    for url, body, sub_response in zip(urls, expected, result["responses"]):
+        assert sub_response["status"] == 200, f"/batch {url} returned {sub_response['status']}"
+        assert sub_response["body"] == body, f"/batch {url} returned a different body"
+    assert batch_count == separate_count, f"/batch used {batch_count} statements, one by one {separate_count}"
+
+def main():
+    print("=" * 50)
+    print("SQL STATEMENTS PER REQUEST")
+    print("=" * 50)
+    failed = False
+    for check in (
+        test_list_query_count_is_constant, test_detail_query_count, test_header_only_list_is_one_query,
+        test_cursor_pages_follow_each_other, test_lookups_are_one_query, test_batch_costs_its_sub_requests
+    ):
+        try:
+            check()
+            print(f"✅ {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ {check.__doc__}: {e}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
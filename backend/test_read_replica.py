@@ -0,0 +1,139 @@
+"""Check read-replica routing and read-your-writes against two Postgres instances.
+
+Needs DATABASE_URL (primary) and DATABASE_READ_URL (replica), both migrated; see the
+README for a local setup. Runs the app in-process and records which engine serves
+each request's statements: reads from a fresh client go to the replica, a client that
+has just written reads its own change back from the primary, and X-Read-Primary forces
+the primary without a cookie. The ledger rows written by the stock adjustment are
+deleted at the end, which restores the stock level.
+"""
+import sys
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+from sqlalchemy import delete, event, select
+from app.core.database import SessionLocal, engine, read_engine
+from app.core.read_routing import PRIMARY_UNTIL_COOKIE, replica_configured
+from app.main import app
+from app.models.product import Product
+from app.models.stock_ledger import StockLedger
+from app.models.warehouse import Location
+
+READ_ENDPOINTS = ["/api/v1/movements", "/api/v1/stock", "/api/v1/dashboard/low-stock", "/api/v1/products"]
+ADJUSTMENT = 7
+
+@contextmanager
+def engines_used():
+    """Names of the engines ("primary", "replica") that ran statements inside the block;
+    reference cache loads always come from the primary and are left out"""
+    used = set()
+
+    def listener_for(name):
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if not context.execution_options.get("reference_cache"):
+                used.add(name)
+        return before_cursor_execute
+
+    listeners = [(engine, listener_for("primary")), (read_engine, listener_for("replica"))]
+    for target, listener in listeners:
+        event.listen(target, "before_cursor_execute", listener)
+    try:
+        yield used
+    finally:
+        for target, listener in listeners:
+            event.remove(target, "before_cursor_execute", listener)
+
+def stock_pair():
+    db = SessionLocal()
+    try:
+        product_id = db.scalar(select(Product.id).order_by(Product.sku).limit(1))
+        location_id = db.scalar(select(Location.id).order_by(Location.name).limit(1))
+    finally:
+        db.close()
+    assert product_id and location_id, "The primary needs at least one product and one location"
+    return product_id, location_id
+
+def ledger_ids(product_id, location_id) -> set:
+    db = SessionLocal()
+    try:
+        return set(db.scalars(select(StockLedger.id).where(
+            StockLedger.product_id == product_id, StockLedger.location_id == location_id
+        )))
+    finally:
+        db.close()
+
+def delete_ledger_rows(ids):
+    db = SessionLocal()
+    try:
+        db.execute(delete(StockLedger).where(StockLedger.id.in_(ids)))
+        db.commit()
+    finally:
+        db.close()
+
+def on_hand(client, product_id, location_id, **kwargs):
+    response = client.post(
+        "/api/v1/stock/lookup", json={"pairs": [{"product_id": product_id, "location_id": location_id}]}, **kwargs
+    )
+    assert response.status_code == 200, f"POST /stock/lookup returned {response.status_code}: {response.text}"
+    return response.json()[0]["onHand"]
+
+def test_reads_use_the_replica():
+    """A client that has not written reads from the replica"""
+    client = TestClient(app)
+    for url in READ_ENDPOINTS:
+        with engines_used() as used:
+            response = client.get(url)
+        assert response.status_code == 200, f"GET {url} returned {response.status_code}"
+        assert used == {"replica"}, f"GET {url} ran on {sorted(used)}"
+        assert PRIMARY_UNTIL_COOKIE not in response.cookies, f"GET {url} pinned the client to the primary"
+
+def test_writer_reads_its_writes():
+    """After a write the same client reads from the primary and sees its change"""
+    client = TestClient(app)
+    product_id, location_id = stock_pair()
+    before = on_hand(client, product_id, location_id, headers={"X-Read-Primary": "true"})
+    existing = ledger_ids(product_id, location_id)
+    try:
+        with engines_used() as used:
+            response = client.put(f"/api/v1/stock/{product_id}/{location_id}", json={"quantity": before + ADJUSTMENT})
+        assert response.status_code == 200, f"PUT /stock returned {response.status_code}: {response.text}"
+        assert used == {"primary"}, f"PUT /stock ran on {sorted(used)}"
+        assert PRIMARY_UNTIL_COOKIE in response.cookies, "The write did not set the read-after-write cookie"
+
+        with engines_used() as used:
+            after = on_hand(client, product_id, location_id)
+        assert used == {"primary"}, f"Read after write ran on {sorted(used)}"
+        assert after == before + ADJUSTMENT, f"Read after write saw {after}, expected {before + ADJUSTMENT}"
+
+        with engines_used() as used:
+            on_hand(TestClient(app), product_id, location_id)
+        assert used == {"replica"}, f"Another client's read ran on {sorted(used)}"
+    finally:
+        delete_ledger_rows(ledger_ids(product_id, location_id) - existing)
+
+def test_read_primary_header():
+    """X-Read-Primary: true reads from the primary without a cookie"""
+    with engines_used() as used:
+        response = TestClient(app).get("/api/v1/movements", headers={"X-Read-Primary": "true"})
+    assert response.status_code == 200, f"GET /movements returned {response.status_code}"
+    assert used == {"primary"}, f"GET /movements with X-Read-Primary ran on {sorted(used)}"
+
+def main():
+    print("=" * 50)
+    print("READ REPLICA ROUTING")
+    print("=" * 50)
+    if not replica_configured():
+        print("⚠️  DATABASE_READ_URL is not set - nothing to check")
+        sys.exit(1)
+    failed = False
+    for check in (test_reads_use_the_replica, test_writer_reads_its_writes, test_read_primary_header):
+        try:
+            check()
+            print(f"✅ {check.__doc__}")
+        except AssertionError as e:
+            failed = True
+            print(f"❌ {check.__doc__}: {e}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,12 @@ export const productService = {
     return response.data
   },
 
+  // Many products at once: { ids: [...], skus: [...] } -> { products, missing_ids, missing_skus }
+  lookupProducts: async ({ ids = [], skus = [] }) => {
+    const response = await api.post('/products/lookup', { ids, skus })
+    return response.data
+  },
+
   createProduct: async (data) => {
     const response = await api.post('/products', data)
     return response.data
@@ -6,6 +6,12 @@ export const stockService = {
     return response.data
   },
 
+  // On-hand stock for many [{ product_id, location_id }] pairs in one request
+  lookupStock: async (pairs) => {
+    const response = await api.post('/stock/lookup', { pairs })
+    return response.data
+  },
+
   updateStock: async (productId, locationId, quantity) => {
     const response = await api.put(`/stock/${productId}/${locationId}`, { quantity })
     return response.data
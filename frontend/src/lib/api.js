@@ -6,6 +6,8 @@ const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000
 // Create axios instance
 const api = axios.create({
   baseURL: `${API_BASE_URL}/api/v1`,
+  // Keeps the read-after-write cookie, so reads right after a change come from the primary
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json',
   },